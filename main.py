@@ -1,7 +1,7 @@
 # main.py
+import argparse
 import sys
 from pathlib import Path
-from core.exporter import Exporter
 
 # --- 1) Garanta que <raiz>/src esteja no sys.path ANTES dos imports do projeto ---
 ROOT = Path(__file__).resolve().parent
@@ -10,36 +10,179 @@ if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
 
 # --- 2) Imports do projeto ---
-from core.file_manager import FileManager
+from core import profiling
+from core.context import RunContext
 from core.csv_loader import CSVLoader
-from core.dataset_builder import DatasetBuilder
+from core.engine import ENGINES, get_engine
+from core.file_manager import FileManager
+from core.input_cache import InputCache
+from core.output_state import OutputState, format_summary
+from core.pipeline import RunPlanner
+from core.rss import total_memory
+from core.scheduler import (JobResult, RunSettings, Scheduler, default_part_workers, default_workers,
+                            format_report)
+from core.watcher import STABLE_SECONDS, Watcher
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Gera os outputs definidos em config/manifest.json.")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="não usa o cache Parquet dos inputs já validados")
+    ap.add_argument("--cache-max-mb", type=int, default=2048,
+                    help="tamanho máximo do cache de inputs (MB)")
+    ap.add_argument("--full-rebuild", action="store_true",
+                    help="ignora o estado incremental e refaz os outputs do zero (implica --force)")
+    ap.add_argument("--force", action="store_true",
+                    help="refaz todos os outputs, mesmo os que nada mudou desde a última geração")
+    ap.add_argument("--invalidate-cache", nargs="?", const="*", metavar="INPUT_ID",
+                    help="apaga o cache de um input (ou de todos) e sai")
+    ap.add_argument("--as-of", metavar="YYYY-MM-DD",
+                    help="data de referência da execução (padrão: hoje); fixa colunas como SITUACAO_SERIAL")
+    ap.add_argument("--workers", type=int, metavar="N",
+                    help="processos em paralelo (padrão: núcleos da máquina); com o cache de input ligado, "
+                         "os outputs de um mesmo input também rodam em paralelo, lendo o input do cache")
+    ap.add_argument("--max-memory-mb", type=float, metavar="MB",
+                    help="teto de memória somada dos jobs em execução (padrão: 75%% da memória física)")
+    ap.add_argument("--compact", action="store_true",
+                    help="guarda texto repetitivo como categoria e números no menor tipo (menos memória)")
+    ap.add_argument("--engine", choices=ENGINES, default="pandas",
+                    help="motor de leitura/escrita CSV: pandas (padrão) ou arrow (pyarrow, várias threads); "
+                         "o campo `engine` de um input tem precedência")
+    ap.add_argument("--watch", action="store_true",
+                    help="fica rodando e processa cada input quando seus arquivos chegam em data/incoming "
+                         "(config e processors carregados uma vez; --workers = jobs ao mesmo tempo, padrão 1)")
+    ap.add_argument("--stable-seconds", type=float, default=STABLE_SECONDS, metavar="S",
+                    help="com --watch: tempo sem mudança de tamanho/data para um arquivo contar como completo")
+    ap.add_argument("--profile", action="store_true",
+                    help="mede cada etapa e coluna computada e grava data/profile/<output_id>.profile.json")
+    ap.add_argument("--profile-dump", type=Path, metavar="PATH",
+                    help="grava também um profile da execução inteira (pyinstrument .html ou cProfile .prof); "
+                         "com mais de um worker, só cobre o processo principal")
+    return ap.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+
     # --- 3) Pastas do projeto ---
     config_dir = ROOT / "config"
     data_in = ROOT / "data" / "incoming"
     data_out = ROOT / "data" / "output"
+    data_cache = ROOT / "data" / "cache"
+    data_state = ROOT / "data" / "state"
+    data_profile = ROOT / "data" / "profile"
     data_out.mkdir(parents=True, exist_ok=True)
 
+    dump = profiling.SamplingDump(args.profile_dump) if args.profile_dump else None
+    if dump is not None:
+        if not dump.sampling:
+            print("[WARN] pyinstrument not installed: falling back to cProfile for --profile-dump")
+        dump.start()
+
+    cache = InputCache(data_cache, max_bytes=args.cache_max_mb * 1024 * 1024)
+    if args.invalidate_cache:
+        removed = cache.invalidate(None if args.invalidate_cache == "*" else args.invalidate_cache)
+        print(f"[CACHE] {removed} file(s) removed")
+        sys.exit(0)
+    use_cache = not args.no_cache
+    if use_cache and not InputCache.available():
+        print("[WARN] pyarrow not installed: input cache disabled")
+        use_cache = False
+    # o estado incremental também é gravado em Parquet
+    use_store = InputCache.available() and not args.full_rebuild
+
+    try:
+        get_engine(args.engine)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(2)
+
+    if args.watch:
+        if args.profile:
+            print("[WARN] --profile is ignored with --watch")
+        settings = RunSettings(
+            config_dir=config_dir, data_in=data_in, data_out=data_out, as_of="",
+            cache_dir=data_cache if use_cache else None, cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+            state_dir=data_state if use_store else None, compact=args.compact, engine=args.engine,
+            part_workers=default_part_workers(args.workers or 1),
+        )
+        try:
+            as_of = None if args.as_of is None else str(RunContext(args.as_of).as_of.date())
+        except ValueError:
+            print(f"[ERROR] Invalid --as-of date: {args.as_of!r} (expected YYYY-MM-DD)")
+            sys.exit(2)
+        state = OutputState(data_state / "outputs.json", digests=cache.digests)
+        Watcher(settings, workers=args.workers or 1, as_of=as_of, stable_seconds=args.stable_seconds,
+                state=state, force=args.force or args.full_rebuild).run()
+        sys.exit(0)
+
     # --- 4) Carrega definições ---
     fm = FileManager(config_dir=config_dir)
     inputs_map, outputs = fm.load_all()  # dict[input_id] -> InputDefinition, list[OutputDefinition]
 
-    # --- 5) Loader e cache de DataFrames por input_id ---
-    loader = CSVLoader(data_dir=data_in)
-    cache_df = {}
+    # --- 5) Plano: cada input é lido e validado uma vez para todos os seus outputs ---
+    plans = RunPlanner().plan(inputs_map, outputs)
+
+    # data de referência única para a execução inteira
+    try:
+        context = RunContext(args.as_of)
+    except ValueError:
+        print(f"[ERROR] Invalid --as-of date: {args.as_of!r} (expected YYYY-MM-DD)")
+        sys.exit(2)
+    print(f"[OK] As of {context.as_of.date()}")
 
-    exporter = Exporter()  # encoding default utf-8
+    settings = RunSettings(
+        config_dir=config_dir, data_in=data_in, data_out=data_out, as_of=str(context.as_of.date()),
+        cache_dir=data_cache if use_cache else None, cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        state_dir=data_state if use_store else None, profile_dir=data_profile if args.profile else None,
+        compact=args.compact, engine=args.engine,
+        # com vários workers o Scheduler lê as partes em sequência (ver Scheduler)
+        part_workers=default_part_workers(args.workers or 1),
+    )
+    # outputs sem mudança desde a última geração (input, definições, processor, data) são pulados;
+    # o hash dos inputs fica na memória do cache e o job não relê o CSV para achar a chave
+    state = OutputState(data_state / "outputs.json", digests=cache.digests)
+    loader = CSVLoader(data_dir=data_in)
+    skipped, fingerprints, todo = {}, {}, []
+    for plan in plans:
+        rest, skipped[plan.input_def.id], prints = state.split(plan, loader, data_out, settings.as_of,
+                                                               force=args.force or args.full_rebuild)
+        fingerprints.update(prints)
+        if rest.outputs:
+            todo.append(rest)
+    for res in (r for done in skipped.values() for r in done):
+        print(f"[SKIP] '{res.output_id}' unchanged -> {res.path}")
 
-    # --- 6) Processa cada OutputDefinition ---
-    for odef in outputs:
-        idef = inputs_map[odef.input_id]
+    memory_mb = args.max_memory_mb
+    if memory_mb is None and total_memory() is not None:
+        memory_mb = total_memory() / (1024 * 1024) * 0.75
+    # com o cache, cada output pode virar um job (ver Scheduler)
+    scheduler = Scheduler(settings, workers=args.workers or default_workers(sum(len(p.outputs) for p in todo)),
+                          memory_mb=memory_mb, history_path=data_state / "scheduler.json")
 
-        # cria o builder apenas com os parâmetros que ele realmente aceita
-        builder = DatasetBuilder(idef, odef)
-        df_out = builder.build()
+    # --- 6) Processa os inputs e os OutputDefinitions que dependem deles (em paralelo, ver Scheduler) ---
+    jobs = scheduler.jobs(todo)
+    if scheduler.workers > 1 and len(jobs) > 1:
+        print(f"[OK] {len(todo)} input(s) as {len(jobs)} job(s) on {scheduler.workers} workers"
+              + (f", memory budget {memory_mb:.0f} MB" if memory_mb else ""))
+    ran = {job.input_id: job for job in scheduler.run(jobs)}
+    state.record([res for job in ran.values() for res in job.outputs], fingerprints)
+    state.save()
+    results = []
+    for plan in plans:
+        job = ran.get(plan.input_def.id) or JobResult(plan.input_def.id)
+        order = {odef.id: i for i, odef in enumerate(plan.outputs)}
+        job.outputs = sorted(skipped[plan.input_def.id] + job.outputs, key=lambda res: order[res.output_id])
+        results.append(job)
 
-        out_path = data_out / odef.output_file_name
-        exporter.export(df_out, odef, idef, out_path)
-        print(f"[OK] Saved -> {out_path}")
+    if dump is not None:
+        print(f"[PROF] Run profile -> {dump.stop()}")
+    print()
+    print(format_report(results))
+    summary = format_summary([res for job in results for res in job.outputs])
+    if summary:
+        print(summary)
+    failed = [res.output_id for job in results for res in job.outputs if not res.ok]
+    if failed:
+        print(f"\n[ERROR] {len(failed)} output(s) failed: {', '.join(failed)}")
+        sys.exit(1)
     print("\nDone.")
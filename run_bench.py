@@ -0,0 +1,86 @@
+# run_bench.py
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# --- 1) Garanta que <raiz>/src esteja no sys.path ANTES dos imports do projeto ---
+ROOT = Path(__file__).resolve().parent
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+# --- 2) Imports do projeto ---
+from bench.generator import SyntheticGenerator
+from bench.harness import compare, environment, format_table, parse_rows, run_benchmark
+from core.file_manager import FileManager
+from core.fingerprint import definition_digest
+
+def parse_args():
+    ap = argparse.ArgumentParser(
+        description="Mede leitura, validação, montagem e exportação sobre dados sintéticos "
+                    "gerados a partir das definições em config/.")
+    ap.add_argument("--rows", default="100k,1M,10M",
+                    help="tamanhos a medir, separados por vírgula (ex.: 100k,1M,10M)")
+    ap.add_argument("--input", action="append", metavar="INPUT_ID",
+                    help="input a medir (repetível; padrão: todos os inputs com outputs ativos)")
+    ap.add_argument("--seed", type=int, default=42, help="semente do gerador")
+    ap.add_argument("--as-of", default="2025-01-01",
+                    help="data de referência fixa, para que os outputs sejam comparáveis entre execuções")
+    ap.add_argument("--work-dir", type=Path, default=ROOT / "data" / "bench",
+                    help="pasta dos arquivos gerados, outputs e resultados")
+    ap.add_argument("--regenerate", action="store_true",
+                    help="gera os arquivos de novo mesmo se já existirem")
+    ap.add_argument("--compact", action="store_true", help="mede com o modo compacto (main.py --compact)")
+    ap.add_argument("--output", type=Path, help="arquivo JSON de resultados (padrão: <work-dir>/results.json)")
+    ap.add_argument("--baseline", type=Path, help="resultado JSON anterior para comparar")
+    ap.add_argument("--max-time-regression", type=float, default=0.10,
+                    help="piora de tempo tolerada por etapa (fração; 0.10 = 10%%)")
+    ap.add_argument("--max-memory-regression", type=float, default=0.15,
+                    help="piora de memória tolerada por etapa (fração)")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sizes = [parse_rows(s) for s in args.rows.split(",") if s.strip()]
+
+    fm = FileManager(config_dir=ROOT / "config")
+    inputs_map, outputs = fm.load_all()
+    input_ids = args.input or list(dict.fromkeys(o.input_id for o in outputs))
+
+    results = []
+    for input_id in input_ids:
+        if input_id not in inputs_map:
+            print(f"[ERROR] Unknown or inactive input '{input_id}'")
+            sys.exit(2)
+        idef = inputs_map[input_id]
+        idef_outputs = [o for o in outputs if o.input_id == input_id]
+        for rows in sizes:
+            # arquivo gerado reaproveitado enquanto a definição e a semente não mudarem
+            data_file = (args.work_dir / "data" /
+                         f"{input_id}-{rows}-s{args.seed}-{definition_digest(idef)[:8]}.csv")
+            if args.regenerate or not data_file.exists():
+                print(f"[BENCH] generating {rows} rows for '{input_id}' -> {data_file}")
+                SyntheticGenerator(idef, seed=args.seed).write(data_file, rows)
+            print(f"[BENCH] '{input_id}' @ {rows} rows")
+            results.append(run_benchmark(idef, idef_outputs, data_file, args.work_dir / "output", args.as_of,
+                                         args.compact))
+
+    current = {"environment": environment(), "seed": args.seed, "as_of": args.as_of, "results": results}
+    out_path = args.output or args.work_dir / "results.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(current, indent=2), encoding="utf-8")
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    print()
+    print(format_table(results, baseline))
+    print(f"\n[OK] Results -> {out_path}")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.max_time_regression, args.max_memory_regression)
+        for r in regressions:
+            print(f"[REGRESSION] {r}")
+        if regressions:
+            sys.exit(1)
+        print("[OK] No regressions against baseline")
@@ -0,0 +1,143 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from models.column_definition import ColumnDefinition
+from models.input_definition import InputDefinition
+
+@dataclass(frozen=True)
+class ColumnProfile:
+    """
+    Como gerar os valores de uma coluna:
+      values       vocabulário fixo (senão, gerado a partir do nome da coluna)
+      cardinality  tamanho do vocabulário gerado (colunas não únicas)
+      digits       vocabulário gerado como códigos numéricos com esse número
+                   de dígitos (CNPJ/CPF, códigos), em vez de texto
+      null_rate    fração de vazios (só em colunas `nullable`)
+      skew         expoente da distribuição (0 = uniforme; >0 = poucos valores
+                   muito frequentes, como nos dados reais)
+    """
+    values: Optional[Tuple[str, ...]] = None
+    cardinality: int = 1000
+    null_rate: float = 0.05
+    skew: float = 1.0
+    digits: Optional[int] = None
+
+
+# Perfis com as cardinalidades observadas no serial_number_c4 de produção
+_DESCRICOES = tuple(
+    f"{produto}{sufixo}"
+    for produto in ("Clipp PRO", "CLIPP PRO", "Clipp MEI", "Clipp MEI CPF", "Clipp 360", "ClippFácil",
+                    "ZWeb Essencial", "ZWeb Premium", "ZWeb Standard", "Small Commerce", "Small Go",
+                    "Renovação PRO", "Licença avulsa")
+    for sufixo in ("", " Renovação", " Brinde", " Anual", " Mensal", " - Upgrade", " - Migração")
+)
+PROFILES: Dict[str, Dict[str, ColumnProfile]] = {
+    "serial_number_c4": {
+        "LINHA": ColumnProfile(values=("C4",), null_rate=0.0),
+        "CNPJ_CPF_USUARIO": ColumnProfile(cardinality=500_000, null_rate=0.01, skew=0.0, digits=11),
+        "RAZAO_SOCIAL_USUARIO": ColumnProfile(cardinality=500_000, null_rate=0.01, skew=0.0),
+        "CNPJ_CPF_REVENDA": ColumnProfile(cardinality=5_000, null_rate=0.35, digits=14),
+        "RAZAO_SOCIAL_REVENDA": ColumnProfile(cardinality=5_000, null_rate=0.35),
+        "CATEGORIA_REVENDA": ColumnProfile(
+            values=("Bronze", "Prata", "Ouro", "Ouro Duplo", "Diamante", "Black"), null_rate=0.35),
+        "CODIGO_DO_PRODUTO": ColumnProfile(cardinality=len(_DESCRICOES), null_rate=0.0, digits=4),
+        "DESCRICAO_DO_PRODUTO": ColumnProfile(values=_DESCRICOES, null_rate=0.01),
+        "PERIODICIDADE_DO_PRODUTO": ColumnProfile(values=("12", "1", "36"), null_rate=0.0),
+        "DATA_ATIVACAO_SERIAL": ColumnProfile(null_rate=0.2),
+        "CONSULTOR_REVENDA": ColumnProfile(cardinality=200, null_rate=0.4),
+        "STATUS_DA_REVENDA": ColumnProfile(values=("ATIVA", "INATIVA", "BLOQUEADA"), null_rate=0.35),
+    },
+}
+
+# intervalo das datas geradas
+_DATE_START = np.datetime64("2015-01-01")
+_DATE_DAYS = 16 * 365
+
+
+class SyntheticGenerator:
+    """
+    Gera arquivos que seguem uma InputDefinition (delimitador, encoding,
+    cabeçalho, tipos, separadores e formato de data), de forma determinística:
+    a mesma `seed`, número de linhas e `chunk_rows` produzem o mesmo arquivo.
+    Colunas `allow_duplicates: false` recebem valores únicos; as demais
+    seguem o ColumnProfile da coluna (PROFILES[input_id] ou o padrão).
+    """
+    def __init__(self, definition: InputDefinition, profiles: Optional[Dict[str, ColumnProfile]] = None,
+                 seed: int = 42):
+        self.definition = definition
+        self.profiles = profiles if profiles is not None else PROFILES.get(definition.id, {})
+        self.seed = seed
+        self._vocab: Dict[str, np.ndarray] = {}
+
+    def write(self, path: Path, rows: int, chunk_rows: int = 500_000) -> Path:
+        d = self.definition
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        for i, start in enumerate(range(0, max(rows, 1), chunk_rows)):
+            n = min(chunk_rows, rows - start)
+            chunk = self.frame(start, n, np.random.default_rng([self.seed, i]))
+            chunk.to_csv(tmp, sep=d.delimiter, encoding=d.encoding, index=False,
+                         header=d.has_headers and i == 0, mode="w" if i == 0 else "a")
+        tmp.replace(path)
+        return path
+
+    def frame(self, start: int, n: int, rng: np.random.Generator) -> pd.DataFrame:
+        """Linhas `start`..`start+n` como texto, já no formato do arquivo."""
+        return pd.DataFrame({c.name: self._column(c, start, n, rng) for c in self.definition.columns})
+
+    def _column(self, c: ColumnDefinition, start: int, n: int, rng: np.random.Generator) -> np.ndarray:
+        profile = self.profiles.get(c.name, ColumnProfile())
+        if not c.allow_duplicates:
+            ids = np.arange(start, start + n)
+            if c.type in ("integer", "numeric"):
+                values = ids.astype(str).astype(object)
+            elif c.type == "date":
+                raise ValueError(f"Cannot generate unique dates for column '{c.name}'.")
+            else:
+                values = np.char.add(f"{c.name[:2].upper()}", np.char.zfill(ids.astype(str), 10)).astype(object)
+        elif c.type == "date":
+            days = _DATE_START + rng.integers(0, _DATE_DAYS, n).astype("timedelta64[D]")
+            values = self._take_formatted(pd.DatetimeIndex(days), lambda u: u.strftime(self.definition.date_format))
+        elif c.type == "integer" and profile.values is None:
+            values = rng.integers(0, profile.cardinality, n).astype(str).astype(object)
+        elif c.type == "numeric" and profile.values is None:
+            cents = rng.integers(0, 1_000_000, n)
+            whole = np.char.add((cents // 100).astype(str), self.definition.decimal_separator or ".")
+            values = np.char.add(whole, np.char.zfill((cents % 100).astype(str), 2)).astype(object)
+        else:
+            vocab = self._vocabulary(c, profile)
+            values = vocab[self._choice(len(vocab), n, profile.skew, rng)]
+
+        if c.nullable and profile.null_rate > 0:
+            values[rng.random(n) < profile.null_rate] = ""
+        return values
+
+    def _vocabulary(self, c: ColumnDefinition, profile: ColumnProfile) -> np.ndarray:
+        if c.name not in self._vocab:
+            if profile.values is not None:
+                words = list(profile.values)
+            elif profile.digits:
+                # códigos distintos, espalhados pelo intervalo de `digits` dígitos
+                step = max(1, 10 ** profile.digits // max(profile.cardinality, 1) - 1)
+                words = [f"{(k * step + 7) % 10 ** profile.digits:0{profile.digits}d}"
+                         for k in range(profile.cardinality)]
+            else:
+                words = [f"{c.name.title().replace('_', ' ')} {k}" for k in range(profile.cardinality)]
+            self._vocab[c.name] = np.asarray(words, dtype=object)
+        return self._vocab[c.name]
+
+    @staticmethod
+    def _choice(size: int, n: int, skew: float, rng: np.random.Generator) -> np.ndarray:
+        if skew <= 0:
+            return rng.integers(0, size, n)
+        weights = 1.0 / np.arange(1, size + 1) ** skew
+        return rng.choice(size, n, p=weights / weights.sum())
+
+    @staticmethod
+    def _take_formatted(values: pd.Index, fmt) -> np.ndarray:
+        # formata cada valor distinto uma vez
+        codes, uniques = pd.factorize(values)
+        return np.asarray(fmt(uniques), dtype=object)[codes]
@@ -0,0 +1,146 @@
+from __future__ import annotations
+import dataclasses
+import platform
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from core.context import RunContext
+from core.csv_loader import CSVLoader
+from core.dataset_builder import DatasetBuilder
+from core.exporter import Exporter
+from core.pipeline import InputPlan, required_columns
+from core.rss import PeakRSS
+from core.validation import ValidationError
+from models.input_definition import InputDefinition
+from models.output_definition import OutputDefinition
+
+STAGES = ("load", "validate", "build", "export")
+
+
+def parse_rows(text: str) -> int:
+    """'100k' -> 100000, '1M' -> 1000000, '2500' -> 2500."""
+    text = text.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+
+@contextmanager
+def _stage(stages: Dict[str, Dict[str, Any]], name: str) -> Iterator[Dict[str, Any]]:
+    result: Dict[str, Any] = {}
+    with PeakRSS() as mem:
+        start = time.perf_counter()
+        yield result
+        result["seconds"] = round(time.perf_counter() - start, 4)
+    result["peak_rss_mb"] = mem.peak_mb
+    result["rss_delta_mb"] = mem.delta_mb
+    stages[name] = result
+
+
+def run_benchmark(idef: InputDefinition, outputs: List[OutputDefinition], data_file: Path,
+                  out_dir: Path, as_of: str, compact: bool = False) -> Dict[str, Any]:
+    """
+    Executa o caminho do main.py (sem cache nem modo incremental) sobre
+    `data_file`, medindo separadamente leitura+tipagem, validação, montagem
+    de todos os outputs e exportação: tempo e pico de memória de cada etapa.
+    `compact` liga o modo compacto no loader e nos builders.
+    """
+    idef = dataclasses.replace(idef, file_name=data_file.name)
+    plan = InputPlan(idef, list(outputs))
+    loader = CSVLoader(data_file.parent, compact=compact)
+    context = RunContext(as_of)
+    builders = [DatasetBuilder(odef, context=context, compact=compact) for odef in plan.outputs]
+    columns = required_columns(idef, builders)
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    with _stage(stages, "load") as st:
+        df, invalid = loader.read_typed(idef, plan.pushdown_filters, columns)
+        loader.apply_compact(df, idef)
+        st["rows"] = len(df)
+    with _stage(stages, "validate") as st:
+        report = loader.validator.validate(df, idef, invalid, engine=loader.engine_for(idef).name)
+        st["rows"] = report.rows_checked
+    if not report.ok:
+        raise ValidationError(report)
+    with _stage(stages, "build") as st:
+        built = [(odef, builder.build(df)) for odef, builder in zip(plan.outputs, builders)]
+        st["rows"] = sum(len(out) for _, out in built)
+    with _stage(stages, "export") as st:
+        exporter = Exporter()
+        for odef, out in built:
+            exporter.export(out, odef, idef, out_dir / odef.output_file_name)
+        st["rows"] = sum(len(out) for _, out in built)
+
+    return {
+        "input_id": idef.id,
+        "rows": len(df),
+        "compact": compact,
+        "outputs": [odef.id for odef in plan.outputs],
+        "stages": stages,
+        "total_seconds": round(sum(s["seconds"] for s in stages.values()), 4),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_time_regression: float = 0.10,
+            max_memory_regression: float = 0.15, min_seconds: float = 0.05,
+            min_mb: float = 16.0) -> List[str]:
+    """
+    Compara dois resultados (mesmo input e número de linhas) etapa a etapa.
+    Devolve as regressões acima dos limites (fração: 0.10 = 10% pior).
+    Etapas com menos de `min_seconds` (ou `min_mb` de memória) no baseline
+    não entram na comparação, para não acusar ruído.
+    """
+    base = {(r["input_id"], r["rows"]): r for r in baseline.get("results", [])}
+    regressions: List[str] = []
+    for run in current.get("results", []):
+        ref = base.get((run["input_id"], run["rows"]))
+        if ref is None:
+            continue
+        for stage, now in run["stages"].items():
+            before = ref["stages"].get(stage)
+            if before is None:
+                continue
+            label = f"{run['input_id']} @ {run['rows']} rows, {stage}"
+            if before["seconds"] >= min_seconds and now["seconds"] > before["seconds"] * (1 + max_time_regression):
+                regressions.append(f"{label}: {before['seconds']:.3f}s -> {now['seconds']:.3f}s "
+                                   f"(+{now['seconds'] / before['seconds'] - 1:.0%})")
+            mem_now, mem_before = now.get("rss_delta_mb"), before.get("rss_delta_mb")
+            if (mem_now is not None and mem_before is not None and mem_before >= min_mb
+                    and mem_now > mem_before * (1 + max_memory_regression)):
+                regressions.append(f"{label}: {mem_before:.1f} MB -> {mem_now:.1f} MB "
+                                   f"(+{mem_now / mem_before - 1:.0%})")
+    return regressions
+
+
+def format_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> str:
+    base = {(r["input_id"], r["rows"]): r for r in (baseline or {}).get("results", [])}
+    lines = [f"{'input':<20} {'rows':>10} {'stage':<9} {'seconds':>9} {'rows/s':>11} {'peak MB':>9} {'+MB':>8} {'vs base':>8}"]
+    for run in results:
+        ref = base.get((run["input_id"], run["rows"]))
+        for stage in STAGES:
+            st = run["stages"][stage]
+            rate = st["rows"] / st["seconds"] if st["seconds"] else 0
+            delta = ""
+            if ref and stage in ref["stages"] and ref["stages"][stage]["seconds"]:
+                delta = f"{st['seconds'] / ref['stages'][stage]['seconds'] - 1:+.0%}"
+            lines.append(f"{run['input_id']:<20} {run['rows']:>10} {stage:<9} {st['seconds']:>9.3f} {rate:>11,.0f} "
+                         f"{_mb(st['peak_rss_mb']):>9} {_mb(st['rss_delta_mb']):>8} {delta:>8}")
+    return "\n".join(lines)
+
+
+def _mb(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
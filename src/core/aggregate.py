@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from models.input_definition import InputDefinition
+from models.output_definition import Aggregate, Measure, OutputDefinition
+
+# chave constante de um resumo sem `group_by` (uma linha de totais)
+_ALL = "__all__"
+# como somar os parciais de cada bloco
+_COMBINE = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+class Aggregator:
+    """
+    Resumo de um output `aggregate`, alimentado bloco a bloco (`add`) com
+    as colunas montadas pelo builder: cada bloco vira parciais por grupo
+    (contagem, soma, mínimo, máximo), somados aos anteriores, então a
+    memória é proporcional ao número de grupos. `distinct_count` guarda os
+    pares (grupo, valor) distintos. Fora do modo streaming há um único bloco.
+
+    sum/min/max de colunas de texto (ex.: preço já formatado "859,80") usam
+    os separadores decimal/milhar do input; datas e números são usados como
+    estão. Grupos com chave nula são mantidos; `count` com `column` e
+    `distinct_count` ignoram valores nulos.
+    """
+    def __init__(self, aggregate: Aggregate, idef: InputDefinition):
+        self.aggregate = aggregate
+        self.idef = idef
+        self.keys = list(aggregate.group_by) or [_ALL]
+        self._partial: Optional[pd.DataFrame] = None
+        self._distinct: Dict[str, pd.DataFrame] = {}
+
+    @property
+    def _combined(self) -> List[Measure]:
+        return [m for m in self.aggregate.measures if m.function in _COMBINE]
+
+    def add(self, df: pd.DataFrame) -> None:
+        keys = df[list(self.aggregate.group_by)].copy() if self.aggregate.group_by else pd.DataFrame(
+            {_ALL: np.zeros(len(df), dtype=np.int8)}, index=df.index)
+        values = {}
+        for m in self._combined:
+            if m.column is None:
+                values[m.name] = np.ones(len(df), dtype=np.int64)
+            elif m.function == "count":
+                values[m.name] = df[m.column].notna().to_numpy(dtype=np.int64)
+            else:
+                values[m.name] = self._numeric(df[m.column], m)
+        frame = keys.assign(**values)
+        if self._combined:
+            part = self._group(frame, {m.name: _COMBINE[m.function] for m in self._combined})
+            if self._partial is not None:
+                part = self._group(pd.concat([self._partial, part], ignore_index=True),
+                                   {m.name: _COMBINE[m.function] for m in self._combined})
+            self._partial = part
+        elif self._partial is None or len(df):
+            # só distinct_count: os grupos vistos ainda precisam aparecer no resultado
+            seen = keys.drop_duplicates()
+            self._partial = seen if self._partial is None else pd.concat(
+                [self._partial, seen], ignore_index=True).drop_duplicates()
+        for m in self.aggregate.measures:
+            if m.function == "distinct_count":
+                pairs = keys.assign(**{m.name: df[m.column].to_numpy()}).dropna(subset=[m.name])
+                if m.name in self._distinct:
+                    pairs = pd.concat([self._distinct[m.name], pairs], ignore_index=True)
+                self._distinct[m.name] = pairs.drop_duplicates()
+
+    def result(self) -> pd.DataFrame:
+        """Uma linha por grupo, ordenada pelas chaves: chaves e medidas na ordem declarada."""
+        out = self._partial if self._partial is not None else pd.DataFrame(columns=self.keys)
+        out = out.reset_index(drop=True)
+        for m in self.aggregate.measures:
+            if m.function != "distinct_count":
+                continue
+            pairs = self._distinct.get(m.name)
+            if pairs is None or pairs.empty:
+                out[m.name] = 0
+                continue
+            counts = pairs.groupby(self.keys, dropna=False, observed=True, sort=False).size().rename(m.name)
+            out = out.merge(counts.reset_index(), on=self.keys, how="left")
+            out[m.name] = out[m.name].fillna(0).astype(np.int64)
+        for m in self.aggregate.measures:
+            if m.function == "count":
+                out[m.name] = out[m.name].astype(np.int64)
+        out = out.sort_values(self.keys, na_position="last", kind="stable", ignore_index=True)
+        return out[list(self.aggregate.group_by) + [m.name for m in self.aggregate.measures]]
+
+    def _group(self, frame: pd.DataFrame, how: Dict[str, str]) -> pd.DataFrame:
+        gb = frame.groupby(self.keys, dropna=False, observed=True, sort=False)
+        parts = []
+        for name, fn in how.items():
+            # soma de um grupo só com nulos fica nula (não 0)
+            parts.append(gb[name].sum(min_count=1) if fn == "sum" else gb[name].agg(fn))
+        return pd.concat(parts, axis=1).reset_index()
+
+    def _numeric(self, s: pd.Series, m: Measure) -> pd.Series:
+        if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            return s.to_numpy(dtype=np.float64, na_value=np.nan)
+        if pd.api.types.is_datetime64_any_dtype(s.dtype):
+            if m.function == "sum":
+                raise ValueError(f"Aggregate measure '{m.name}': cannot sum dates in column '{m.column}'.")
+            return s.to_numpy()
+        txt = s.astype("string").str.strip()
+        if self.idef.thousands_separator:
+            txt = txt.str.replace(self.idef.thousands_separator, "", regex=False)
+        if self.idef.decimal_separator and self.idef.decimal_separator != ".":
+            txt = txt.str.replace(self.idef.decimal_separator, ".", regex=False)
+        txt = txt.mask(txt == "")
+        num = pd.to_numeric(txt, errors="coerce")
+        bad = txt.notna() & num.isna()
+        if bad.any():
+            raise ValueError(f"Aggregate measure '{m.name}': column '{m.column}' has non-numeric value "
+                             f"'{s[bad].iloc[0]}'.")
+        return num.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def host_output(odef: OutputDefinition, outputs: List[OutputDefinition]) -> Optional[OutputDefinition]:
+    """
+    Output de detalhe do mesmo input cujo frame montado já tem as colunas do
+    resumo `odef`, com as mesmas definições, o mesmo processor e os mesmos
+    filtros: o resumo é calculado desse frame, sem montar as colunas de novo.
+    """
+    for other in outputs:
+        if other.aggregate is not None or other.id == odef.id:
+            continue
+        if (other.processor_module == odef.processor_module and other.filters == odef.filters
+                and set(odef.columns) <= set(other.columns)):
+            return other
+    return None
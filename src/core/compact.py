@@ -0,0 +1,110 @@
+from __future__ import annotations
+import importlib.util
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+# texto com até esta fração de valores distintos vira categoria
+CATEGORY_MAX_RATIO = 0.2
+_MB = 1024 * 1024
+_NULLABLE_INTS = ("Int8", "Int16", "Int32")
+
+
+@dataclass
+class ColumnFootprint:
+    column: str
+    before: int
+    after: int
+    dtype: str
+
+    def merge(self, other: "ColumnFootprint") -> None:
+        self.before += other.before
+        self.after += other.after
+        self.dtype = other.dtype
+
+    def describe(self) -> str:
+        return f"{self.column}: {_size(self.before)} -> {_size(self.after)} ({self.dtype})"
+
+
+def compact_frame(df: pd.DataFrame, columns: Optional[Iterable[str]] = None,
+                  max_ratio: float = CATEGORY_MAX_RATIO) -> List[ColumnFootprint]:
+    """
+    Modo compacto, no próprio frame: texto com poucos valores distintos vira
+    categoria (dicionário: um código por linha + cada valor uma vez), o resto
+    do texto em object vira string Arrow (quando o pyarrow está instalado),
+    inteiros vão para o menor tipo que comporta o intervalo e float64 vira
+    float32 só quando nenhum valor muda. Os valores não mudam: a saída
+    formatada é a mesma. Retorna o tamanho de cada coluna alterada.
+    """
+    footprints: List[ColumnFootprint] = []
+    for name in (df.columns if columns is None else columns):
+        if name not in df.columns:
+            continue
+        s = df[name]
+        compacted = _compact_series(s, max_ratio)
+        if compacted is None:
+            continue
+        before, after = s.memory_usage(index=False, deep=True), compacted.memory_usage(index=False, deep=True)
+        if after >= before:
+            continue
+        df[name] = compacted
+        footprints.append(ColumnFootprint(name, before, after, str(compacted.dtype)))
+    return footprints
+
+
+def _compact_series(s: pd.Series, max_ratio: float) -> Optional[pd.Series]:
+    if isinstance(s.dtype, pd.CategoricalDtype) or len(s) == 0:
+        return None
+    if pd.api.types.is_string_dtype(s.dtype) or s.dtype == object:
+        if s.nunique(dropna=True) <= max_ratio * len(s):
+            return s.astype("category")
+        if s.dtype == object and importlib.util.find_spec("pyarrow") is not None:
+            try:
+                return s.astype("string[pyarrow]")
+            except (TypeError, ValueError):
+                return None  # object com valores que não são texto
+        return None
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return None
+    if isinstance(s.dtype, pd.Int64Dtype):
+        if s.isna().all():
+            return s.astype("Int8")
+        lo, hi = s.min(), s.max()
+        for dtype in _NULLABLE_INTS:
+            info = np.iinfo(dtype.lower())
+            if info.min <= lo and hi <= info.max:
+                return s.astype(dtype)
+        return None
+    if s.dtype.kind in "iu":
+        out = pd.to_numeric(s, downcast="integer" if s.dtype.kind == "i" else "unsigned")
+        return out if out.dtype != s.dtype else None
+    if s.dtype == np.float64:
+        f32 = s.astype(np.float32)
+        same = (f32.astype(np.float64) == s) | s.isna()
+        return f32 if bool(same.all()) else None
+    return None
+
+
+def merge_footprints(total: Dict[str, ColumnFootprint], footprints: Iterable[ColumnFootprint]) -> None:
+    """Soma as medidas de vários blocos (modo streaming) por coluna."""
+    for fp in footprints:
+        if fp.column in total:
+            total[fp.column].merge(fp)
+        else:
+            total[fp.column] = ColumnFootprint(fp.column, fp.before, fp.after, fp.dtype)
+
+
+def log_footprints(label: str, footprints: Iterable[ColumnFootprint]) -> None:
+    footprints = list(footprints)
+    if not footprints:
+        return
+    for fp in footprints:
+        print(f"[COMPACT] '{label}' {fp.describe()}")
+    before = sum(fp.before for fp in footprints)
+    after = sum(fp.after for fp in footprints)
+    print(f"[COMPACT] '{label}' total: {_size(before)} -> {_size(after)} in {len(footprints)} column(s)")
+
+
+def _size(n: int) -> str:
+    return f"{n / _MB:.1f} MB" if n >= _MB else f"{n / 1024:.0f} KB"
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+def reads(*columns: str) -> Callable:
+    """
+    Declara as colunas do input que uma função compute (ou hook de filtro)
+    lê. Com isso o planner carrega só as colunas usadas pelos outputs ativos;
+    função sem declaração obriga a ler o input inteiro.
+    """
+    def deco(fn: Callable) -> Callable:
+        fn.reads = tuple(columns)
+        return fn
+    return deco
+
+
+def pure(*columns: str) -> Callable:
+    """
+    Como @reads, e declara também que a função compute (linha a linha) é
+    pura: o resultado depende só dessas colunas. O DatasetBuilder então chama
+    a função uma vez por combinação distinta de valores (ver MemoCache), em
+    vez de uma vez por linha.
+    """
+    def deco(fn: Callable) -> Callable:
+        fn.reads = tuple(columns)
+        fn.pure = True
+        return fn
+    return deco
+
+
+def uses_context(fn: Callable) -> Callable:
+    """
+    Marca a função compute que recebe o RunContext (data de referência e
+    colunas de data já convertidas) como segundo argumento: `fn(row, ctx)` ou,
+    na versão vetorizada, `fn_vec(df, ctx)`.
+    """
+    fn.context = True
+    return fn
+
+
+class MemoCache:
+    """
+    Resultados de uma função @pure por tupla de valores de entrada, com
+    limite de `maxsize` entradas (descarta a usada há mais tempo). Vive no
+    DatasetBuilder, então é reaproveitado entre blocos no modo streaming.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.rows = 0      # linhas calculadas
+        self.distinct = 0  # combinações distintas vistas (somando blocos)
+        self.hits = 0      # combinações já presentes no cache
+        self.calls = 0     # chamadas efetivas da função
+
+    def get(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        self.distinct += 1
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        value = compute()
+        self.calls += 1
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rows": self.rows,
+            "distinct": self.distinct,
+            "calls": self.calls,
+            "cache_hits": self.hits,
+            "hit_rate": 1.0 - self.calls / self.rows if self.rows else 0.0,
+        }
@@ -0,0 +1,43 @@
+from __future__ import annotations
+from datetime import date
+from typing import Dict, Optional, Union
+import pandas as pd
+
+class RunContext:
+    """
+    Contexto da execução entregue às funções compute marcadas com
+    @uses_context (ver core.compute):
+      as_of   data de referência da execução ("hoje"), fixada uma vez por
+              execução e sobrescrevível pela linha de comando (--as-of)
+      date()  coluna de data do frame em montagem como datetime64, convertida
+              no máximo uma vez e reaproveitada por todas as funções
+    O DatasetBuilder liga o contexto a cada frame com `bind(df)`.
+    """
+    def __init__(self, as_of: Optional[Union[str, date, pd.Timestamp]] = None):
+        self.as_of: pd.Timestamp = pd.Timestamp(as_of if as_of is not None else date.today()).normalize()
+        self._frame: Optional[pd.DataFrame] = None
+        self._dates: Dict[str, pd.Series] = {}
+
+    def bind(self, df: pd.DataFrame) -> "RunContext":
+        """Contexto com o mesmo as_of, ligado a `df` (cache de datas vazio)."""
+        ctx = RunContext(self.as_of)
+        ctx._frame = df
+        return ctx
+
+    def date(self, name: str) -> pd.Series:
+        """
+        Coluna `name` do frame como datetime64. Colunas `date` já chegam
+        tipadas do CSVLoader e são usadas como estão; texto é convertido uma
+        vez; coluna ausente vira tudo NaT.
+        """
+        if self._frame is None:
+            raise RuntimeError("RunContext is not bound to a frame.")
+        if name not in self._dates:
+            if name not in self._frame.columns:
+                s = pd.Series(pd.NaT, index=self._frame.index, dtype="datetime64[ns]")
+            else:
+                s = self._frame[name]
+                if not pd.api.types.is_datetime64_any_dtype(s):
+                    s = pd.to_datetime(s, errors="coerce")
+            self._dates[name] = s
+        return self._dates[name]
@@ -1,73 +1,322 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from models.input_definition import InputDefinition
+from typing import Collection, Dict, Iterator, List, Optional, Sequence, Tuple
+from models.input_definition import InputDefinition, is_glob
+from models.row_filter import RowFilter
+from core import profiling
+from core.compact import compact_frame, log_footprints
+from core.engine import get_engine, read_kwargs
+from core.row_filters import filter_mask
+from core.validation import ValidationError, ValidationReport, Validator
 
 class CSVLoader:
-    def __init__(self, data_dir: Path):
+    # linhas lidas por bloco quando há filtros aplicados na leitura
+    FILTER_CHUNK_ROWS = 200_000
+
+    def __init__(self, data_dir: Path, validator: Optional[Validator] = None,
+                 part_workers: int = 1, compact: bool = False, engine: str = "pandas"):
         self.data_dir = data_dir
+        self.validator = validator or Validator()
+        # processos para as partes de um input em vários arquivos (1 = em sequência, no próprio processo)
+        self.part_workers = part_workers
+        # modo compacto: texto repetitivo como categoria, números no menor tipo (ver core.compact)
+        self.compact = compact
+        # motor de leitura da execução ("pandas" | "arrow"); `InputDefinition.engine` tem precedência
+        self.engine = engine
+        get_engine(engine)  # nome inválido ou pyarrow ausente falham já aqui
+
+    def load_csv(self, definition: InputDefinition,
+                 filters: Optional[Sequence[RowFilter]] = None,
+                 columns: Optional[Collection[str]] = None) -> pd.DataFrame:
+        """
+        Lê e valida o CSV. Com `filters`, o arquivo é lido em blocos e só as
+        linhas que satisfazem os filtros são mantidas (a validação passa a
+        cobrir apenas essas linhas). O índice original das linhas é preservado.
+        Com `columns`, só essas colunas são lidas e validadas (o cabeçalho
+        continua sendo conferido inteiro).
+        Inputs em várias partes (glob ou lista em `file_name`) são lidos e
+        validados parte a parte (em `part_workers` processos, ou em sequência)
+        e concatenados, com a coluna `source_file_column`; a unicidade é
+        checada entre as partes.
+        Com `compact`, o frame é compactado logo depois de tipado (modo
+        streaming não: lá só um bloco fica em memória).
+        Levanta ValidationError com todas as violações encontradas.
+        """
+        if definition.is_multi_file:
+            return self._load_parts(definition, filters, columns)
+        df, invalid = self.read_typed(definition, filters, columns)
+        self.apply_compact(df, definition)
+        with profiling.stage("validate", input=definition.id, rows=len(df)):
+            report = self.validator.validate(df, definition, invalid, engine=self.engine_for(definition).name)
+        if not report.ok:
+            raise ValidationError(report)
+        return df
+
+    def read_typed(self, definition: InputDefinition,
+                   filters: Optional[Sequence[RowFilter]] = None,
+                   columns: Optional[Collection[str]] = None) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
+        """
+        Etapa de leitura do load_csv, sem a validação: o frame tipado e, por
+        coluna, os valores que não converteram (entrada do Validator).
+        Só para inputs de um arquivo.
+        """
+        csv_path = self.csv_path(definition)
+        self._check_structure(csv_path, definition)
+        return self._read_path(csv_path, definition, filters, columns)
+
+    def _read_path(self, csv_path: Path, definition: InputDefinition,
+                   filters: Optional[Sequence[RowFilter]],
+                   columns: Optional[Collection[str]]) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
+        if filters:
+            # _typed_chunks mede cada bloco
+            parts = list(self._typed_chunks(csv_path, definition, self.FILTER_CHUNK_ROWS, filters, columns))
+            df = pd.concat([p[0] for p in parts])
+            invalid = {
+                c.name: pd.concat([p[1][c.name] for p in parts if c.name in p[1]])
+                for c in definition.columns if any(c.name in p[1] for p in parts)
+            }
+        else:
+            with profiling.stage("read", input=definition.id) as st:
+                df = self.engine_for(definition).read_csv(csv_path, definition, columns)
+                st.rows = len(df)
+            with profiling.stage("types", input=definition.id, rows=len(df)):
+                invalid = self._apply_types(df, definition)
+        return df, invalid
+
+    def _load_parts(self, definition: InputDefinition, filters: Optional[Sequence[RowFilter]],
+                    columns: Optional[Collection[str]]) -> pd.DataFrame:
+        paths = self.csv_paths(definition)
+        names = [self._part_name(p) for p in paths]
+        with profiling.stage("read", input=definition.id) as st:
+            workers = min(len(paths), self.part_workers)
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    parts = list(pool.map(self._load_part, repeat(definition), paths, repeat(filters), repeat(columns)))
+            else:
+                parts = [self._load_part(definition, p, filters, columns) for p in paths]
+            report = ValidationReport(definition.id)
+            for name, (_, part_report) in zip(names, parts):
+                part_report.set_file(name)
+                report.merge(part_report)
+            line_offset = 2 if definition.has_headers else 1
+            lines = np.concatenate([part.index.to_numpy() + line_offset for part, _ in parts])
+            sizes = [len(part) for part, _ in parts]
+            df = pd.concat([part for part, _ in parts], ignore_index=True)
+            del parts
+            df[definition.source_file_column] = pd.Categorical.from_codes(
+                np.repeat(np.arange(len(names)), sizes), categories=names)
+            st.rows = len(df)
+        self.apply_compact(df, definition)
+        with profiling.stage("validate", input=definition.id, rows=len(df)):
+            report.merge(self.validator.validate_unique(df, definition, lines, df[definition.source_file_column]))
+        if not report.ok:
+            raise ValidationError(report)
+        return df
+
+    def apply_compact(self, df: pd.DataFrame, definition: InputDefinition) -> None:
+        if not self.compact:
+            return
+        with profiling.stage("compact", input=definition.id, rows=len(df)):
+            footprints = compact_frame(df)
+        log_footprints(definition.id, footprints)
+
+    def _load_part(self, definition: InputDefinition, csv_path: Path, filters: Optional[Sequence[RowFilter]],
+                   columns: Optional[Collection[str]]) -> Tuple[pd.DataFrame, ValidationReport]:
+        """Uma parte lida, tipada e validada (menos a unicidade, que é entre partes). Roda num worker."""
+        try:
+            self._check_structure(csv_path, definition)
+        except ValueError as e:
+            raise ValueError(f"{csv_path.name}: {e}") from None
+        df, invalid = self._read_path(csv_path, definition, filters, columns)
+        return df, self.validator.validate(df, definition, invalid, unique=False,
+                                           engine=self.engine_for(definition).name)
+
+    def iter_csv(self, definition: InputDefinition, chunk_rows: int,
+                 filters: Optional[Sequence[RowFilter]] = None,
+                 columns: Optional[Collection[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Modo streaming: lê o CSV em blocos de `chunk_rows` linhas e entrega
+        cada bloco tipado. Nulidade e tipos são checados bloco a bloco;
+        `allow_duplicates: false` é checado entre todos os blocos. Sempre
+        entrega ao menos um bloco (vazio, se o arquivo não tiver linhas).
+        As violações de todos os blocos são acumuladas e, se houver alguma,
+        ValidationError é levantado depois do último bloco, com o relatório
+        do arquivo inteiro. Inputs em várias partes são lidos parte a parte, em
+        sequência (a memória continua proporcional ao bloco), com a coluna
+        `source_file_column` e a unicidade checada entre todas as partes.
+        """
+        paths = self.csv_paths(definition)
+        names = [self._part_name(p) for p in paths]
+        unique = [c for c in definition.columns if not c.allow_duplicates and (columns is None or c.name in columns)]
+        indexes = {c.name: self.validator.unique_index() for c in unique}
+        report = ValidationReport(definition.id)
+        try:
+            for part, (name, csv_path) in enumerate(zip(names, paths)):
+                self._check_structure(csv_path, definition)
+                for chunk, invalid in self._typed_chunks(csv_path, definition, chunk_rows, filters, columns):
+                    with profiling.stage("validate", input=definition.id, rows=len(chunk)):
+                        chunk_report = self.validator.validate(chunk, definition, invalid, unique=False,
+                                                               engine=self.engine_for(definition).name)
+                        for col, index in indexes.items():
+                            index.add(chunk[col], rows=chunk.index.to_numpy(), part=part)
+                    if definition.is_multi_file:
+                        chunk_report.set_file(name)
+                        chunk[definition.source_file_column] = pd.Categorical(
+                            np.full(len(chunk), name, dtype=object), categories=names)
+                    report.merge(chunk_report)
+                    yield chunk
+            # unicidade entre todos os blocos e partes: só as linhas repetidas são relidas do disco
+            line_offset = 2 if definition.has_headers else 1
+            with profiling.stage("validate", input=definition.id):
+                for col_def in unique:
+                    violation = self.validator.unique_violation(
+                        col_def, indexes[col_def.name], self._key_reader(definition, paths, col_def.name),
+                        lambda parts, rows: (rows + line_offset,
+                                             [names[p] for p in parts] if definition.is_multi_file else None))
+                    if violation is not None:
+                        report.violations.append(violation)
+        finally:
+            for index in indexes.values():
+                index.close()
+        if not report.ok:
+            raise ValidationError(report)
 
-    def load_csv(self, definition: InputDefinition) -> pd.DataFrame:
+    def _key_reader(self, definition: InputDefinition, paths: List[Path], column: str):
+        """`fetch` do UniqueIndex no modo streaming: relê só `column` das partes com linhas candidatas."""
+        def fetch(parts: np.ndarray, rows: np.ndarray) -> list:
+            values = np.empty(len(rows), dtype=object)
+            for part in np.unique(parts):
+                at = parts == part
+                df = self.engine_for(definition).read_csv(paths[part], definition, [column])
+                self._apply_types(df, definition)
+                values[at] = df[column].loc[rows[at]].tolist()
+            return values.tolist()
+        return fetch
+
+    def _typed_chunks(self, csv_path: Path, definition: InputDefinition, chunk_rows: int,
+                      filters: Optional[Sequence[RowFilter]],
+                      columns: Optional[Collection[str]]) -> Iterator[Tuple[pd.DataFrame, Dict[str, pd.Series]]]:
+        """
+        Blocos já tipados (com os valores inválidos por coluna), filtrados se
+        houver filtros. Sempre entrega ao menos um bloco (vazio, se o arquivo
+        não tiver linhas).
+        """
+        if filters and columns is not None:
+            columns = set(columns) | {f.column for f in filters}
+        yielded = False
+        reader = self.engine_for(definition).iter_csv(csv_path, definition, chunk_rows, columns)
+        while True:
+            with profiling.stage("read", input=definition.id) as st:
+                chunk = next(reader, None)
+                st.rows = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+            with profiling.stage("types", input=definition.id, rows=len(chunk)):
+                invalid = self._apply_types(chunk, definition)
+                if filters:
+                    chunk = chunk[filter_mask(chunk, filters)]
+                    invalid = {name: bad[bad.index.isin(chunk.index)] for name, bad in invalid.items()}
+            yielded = True
+            yield chunk, invalid
+
+        if not yielded:
+            empty = pd.read_csv(csv_path, nrows=0, **read_kwargs(definition, columns))
+            yield empty, self._apply_types(empty, definition)
+
+    def engine_for(self, definition: InputDefinition):
+        return get_engine(definition.engine or self.engine)
+
+    def csv_path(self, definition: InputDefinition) -> Path:
+        if definition.is_multi_file:
+            raise ValueError(f"Input '{definition.id}' has several files; use csv_paths().")
         csv_path = self.data_dir / definition.file_name
         if not csv_path.exists():
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        return csv_path
+
+    def csv_paths(self, definition: InputDefinition) -> List[Path]:
+        """Arquivos do input, na ordem de `file_name` (cada padrão glob em ordem alfabética)."""
+        if not definition.is_multi_file:
+            return [self.csv_path(definition)]
+        paths: List[Path] = []
+        for pattern in definition.file_patterns:
+            if is_glob(pattern):
+                found = sorted(p for p in self.data_dir.glob(pattern) if p.is_file())
+                if not found:
+                    raise FileNotFoundError(f"No CSV file matches '{pattern}' in {self.data_dir}")
+            else:
+                found = [self.data_dir / pattern]
+                if not found[0].exists():
+                    raise FileNotFoundError(f"CSV file not found: {found[0]}")
+            paths.extend(p for p in found if p not in paths)
+        return paths
 
-        df = pd.read_csv(
+    def _part_name(self, csv_path: Path) -> str:
+        return csv_path.relative_to(self.data_dir).as_posix()
+
+    @staticmethod
+    def _check_structure(csv_path: Path, definition: InputDefinition) -> None:
+        """Confere quantidade e nomes das colunas lendo só o início do arquivo."""
+        probe = pd.read_csv(
             csv_path,
             delimiter=definition.delimiter,
             encoding=definition.encoding,
             header=0 if definition.has_headers else None,
-            decimal=definition.decimal_separator,
-            thousands=definition.thousands_separator or None
+            nrows=0 if definition.has_headers else 1,
+            dtype=str
         )
-
-        if not definition.has_headers:
-            df.columns = [c.name for c in definition.columns]
-
-        if df.shape[1] != len(definition.columns):
-            raise ValueError(f"CSV column count mismatch: expected {len(definition.columns)}, got {df.shape[1]}")
+        if probe.shape[1] != len(definition.columns):
+            raise ValueError(f"CSV column count mismatch: expected {len(definition.columns)}, got {probe.shape[1]}")
 
         if definition.has_headers:
             expected = [c.name for c in definition.columns]
-            found = list(df.columns)
+            found = list(probe.columns)
             if expected != found:
                 raise ValueError(f"Header names mismatch.\nExpected: {expected}\nFound: {found}")
 
-        self._validate_columns(df, definition)
-        return df
-
-    def _validate_columns(self, df: pd.DataFrame, definition: InputDefinition) -> None:
-        for col_def in definition.columns:
-            s = df.iloc[:, col_def.position - 1]
-
-            if not col_def.nullable and s.isna().any():
-                raise ValueError(f"Column '{col_def.name}' contains nulls but is not nullable.")
-
-            if not col_def.allow_duplicates:
-                dup = s[s.duplicated(keep=False)]
-                if not dup.empty:
-                    raise ValueError(f"Column '{col_def.name}' contains duplicates and does not allow them.")
-
-            if col_def.type == "integer":
-                try:
-                    _ = s.dropna().astype("Int64")
-                except Exception:
-                    raise ValueError(f"Column '{col_def.name}' must contain only integers.")
-            elif col_def.type == "numeric":
-                try:
-                    _ = pd.to_numeric(s.dropna(), errors="raise")
-                except Exception:
-                    raise ValueError(f"Column '{col_def.name}' must be numeric.")
-            elif col_def.type == "date":
-                try:
-                    _ = pd.to_datetime(s.dropna(), format=definition.date_format, errors="raise")
-                except Exception:
-                    raise ValueError(f"Column '{col_def.name}' must follow date format {definition.date_format}.")
-            elif col_def.type == "alphabetic":
-                # regra simples: letras e espaços
-                 nonnull = s.dropna().astype(str)
-                # se quiser estrito com acentos, podemos usar `regex` lib
-                # import re
-                #if not nonnull.apply(lambda x: re.fullmatch(r"[A-Za-zÀ-ÖØ-öø-ÿ ]+", x) is not None).all():
-                #    raise ValueError(f"Column '{col_def.name}' must be alphabetic (letters/spaces).")
+    @staticmethod
+    def _apply_types(df: pd.DataFrame, definition: InputDefinition) -> Dict[str, pd.Series]:
+        """
+        Leva cada coluna ao tipo final (integer -> Int64, numeric -> float64,
+        date -> datetime64) uma única vez, no próprio frame. Valores que não
+        convertem viram nulos; retorna, por coluna, esses valores brutos
+        (indexados pela linha) para o relatório de validação.
+        """
+        invalid: Dict[str, pd.Series] = {}
+        for c in definition.columns:
+            if c.name not in df.columns:
+                continue  # coluna fora da projeção
+            s = df[c.name]
+            if c.type in ("integer", "numeric"):
+                if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+                    num = s
+                else:
+                    # o parser só aplica decimal/milhar em colunas que inferiu como numéricas
+                    txt = s.astype("string")
+                    if definition.thousands_separator:
+                        txt = txt.str.replace(definition.thousands_separator, "", regex=False)
+                    if definition.decimal_separator and definition.decimal_separator != ".":
+                        txt = txt.str.replace(definition.decimal_separator, ".", regex=False)
+                    num = pd.to_numeric(txt, errors="coerce")
+                bad = s.notna() & num.isna()
+                if c.type == "integer":
+                    fractional = num.notna() & (num != np.floor(num))
+                    bad |= fractional
+                    df[c.name] = num.mask(fractional).astype("Int64")
+                else:
+                    df[c.name] = num.astype("float64")
+            elif c.type == "date":
+                if pd.api.types.is_datetime64_any_dtype(s):
+                    continue
+                ts = pd.to_datetime(s, format=definition.date_format, errors="coerce")
+                bad = s.notna() & ts.isna()
+                df[c.name] = ts
             else:
-                raise ValueError(f"Unknown column type '{col_def.type}' for column '{col_def.name}'.")
+                continue
+            if bad.any():
+                invalid[c.name] = s[bad]
+        return invalid
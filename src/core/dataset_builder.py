@@ -1,12 +1,41 @@
 from importlib import import_module
+from typing import Any, Callable, Dict, Optional, Set
+import numpy as np
 import pandas as pd
 from models.output_definition import OutputDefinition
+from core import profiling
+from core.compact import ColumnFootprint, compact_frame, merge_footprints
+from core.compute import MemoCache
+from core.context import RunContext
+from core.row_filters import filter_mask
+
+# Sufixo da versão vetorizada de uma função compute: `compute_x` -> `compute_x_vec`.
+# A versão vetorizada recebe o DataFrame inteiro e devolve uma Series/array
+# do mesmo comprimento; se não existir, cai no `compute_x(row)` linha a linha.
+VECTORIZED_SUFFIX = "_vec"
+
+# Máximo de combinações guardadas por função @pure
+MEMO_SIZE = 100_000
 
 class DatasetBuilder:
-    def __init__(self, output_def: OutputDefinition):
+    def __init__(self, output_def: OutputDefinition, memo_size: int = MEMO_SIZE,
+                 context: Optional[RunContext] = None, compact: bool = False):
         self.output_def = output_def
+        # data de referência da execução, compartilhada por todos os outputs
+        self.context = context or RunContext()
         self.proc = import_module(output_def.processor_module)
+        # `should_drop_rows(df)` devolve a máscara das linhas a descartar;
+        # `should_drop_row(row)` (linha a linha) fica como fallback
+        self.rows_filter = getattr(self.proc, "should_drop_rows", None)
         self.row_filter = getattr(self.proc, "should_drop_row", None)
+        # funções compute cujo resultado depende da data da execução (não só da linha)
+        self.time_dependent = set(getattr(self.proc, "TIME_DEPENDENT", ()))
+        # cache de resultado por função @pure (ver core.compute)
+        self.memo_size = memo_size
+        self.memo: Dict[str, MemoCache] = {}
+        # modo compacto: colunas computadas como categoria / tipos menores (ver core.compact)
+        self.compact = compact
+        self.compact_footprints: Dict[str, ColumnFootprint] = {}
 
         # pré-checar funções compute
         for oc in self.output_def.columns:
@@ -15,22 +44,153 @@ class DatasetBuilder:
                     f"Compute function '{oc.compute}' not found in module '{self.output_def.processor_module}'"
                 )
 
+    def required_columns(self) -> Optional[Set[str]]:
+        """
+        Colunas do input que este output lê: sources, colunas dos filtros e as
+        declaradas com @reads nas funções compute/hooks. None quando alguma
+        função não declara o que lê (aí o input precisa ser lido inteiro).
+        """
+        cols = {f.column for f in self.output_def.filters}
+        hooks = [h for h in (self.rows_filter or self.row_filter,) if h is not None]
+        fns = hooks + [
+            getattr(self.proc, oc.compute + VECTORIZED_SUFFIX, None) or getattr(self.proc, oc.compute)
+            for oc in self.output_def.columns if oc.compute
+        ]
+        for fn in fns:
+            declared = getattr(fn, "reads", None)
+            if declared is None and fn.__name__.endswith(VECTORIZED_SUFFIX):
+                # a declaração costuma ficar na versão linha a linha
+                declared = getattr(getattr(self.proc, fn.__name__[:-len(VECTORIZED_SUFFIX)], None), "reads", None)
+            if declared is None:
+                return None
+            cols.update(declared)
+        cols.update(oc.source for oc in self.output_def.columns if oc.source)
+        return cols
+
     def build(self, df_in: pd.DataFrame) -> pd.DataFrame:
-        df = df_in.copy()
+        # df_in não é alterado: o filtro gera um novo frame e as colunas de
+        # saída são montadas num dict, então não há cópia do input
         # 1) filtrar linhas (se houver)
-        if self.row_filter:
-            mask_drop = df.apply(lambda r: bool(self.row_filter(r)), axis=1)
-            df = df[~mask_drop].reset_index(drop=True)
-
+        df = self.filter_rows(df_in)
         # 2) montar colunas de saída
+        out = self.build_columns(df)
+        out.index = pd.RangeIndex(len(out))
+        return out
+
+    def filter_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Aplica filtros declarativos e hooks; preserva o índice das linhas mantidas."""
+        with profiling.stage("filter", output=self.output_def.id, rows=len(df)):
+            return self._filter_rows(df)
+
+    def _filter_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        keep = None
+        if self.output_def.filters:
+            keep = filter_mask(df, self.output_def.filters)
+        if self.rows_filter:
+            mask_drop = np.asarray(self.rows_filter(df), dtype=bool)
+            if len(mask_drop) != len(df):
+                raise ValueError(f"should_drop_rows returned {len(mask_drop)} values for {len(df)} rows.")
+            keep = ~mask_drop if keep is None else keep & ~mask_drop
+        elif self.row_filter:
+            mask_drop = df.apply(lambda r: bool(self.row_filter(r)), axis=1).to_numpy(dtype=bool)
+            keep = ~mask_drop if keep is None else keep & ~mask_drop
+        return df if keep is None else df[keep]
+
+    def build_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Monta as colunas de saída (mesmo índice de `df`), sem filtrar linhas.
+        As computadas seguem a ordem das dependências (`depends_on`): cada
+        uma é calculada uma vez e reaproveitada pelas que dependem dela.
+        """
+        odef_id = self.output_def.id
+        ctx = self.context.bind(df)
+        computed = {}
+        with profiling.stage("build", output=odef_id, rows=len(df)):
+            for oc in self.output_def.compute_order():
+                deps = {dep: computed[dep] for dep in oc.depends_on}
+                with profiling.stage("compute", output=odef_id, column=oc.name, function=oc.compute, rows=len(df)):
+                    computed[oc.name] = self.compute_column(df, oc.compute, deps, ctx)
+
         out = {}
         for oc in self.output_def.columns:
             if oc.source:
                 out[oc.name] = df[oc.source]
             elif oc.compute:
-                fn = getattr(self.proc, oc.compute)
-                out[oc.name] = df.apply(lambda r: fn(r), axis=1)
+                out[oc.name] = computed[oc.name]
             else:
                 raise ValueError("Output column must define `source` or `compute`.")
 
-        return pd.DataFrame(out)
+        result = pd.DataFrame(out, index=df.index)
+        if self.compact:
+            # as colunas de origem já chegam compactadas do CSVLoader
+            with profiling.stage("compact", output=odef_id, rows=len(result)):
+                merge_footprints(self.compact_footprints,
+                                 compact_frame(result, [oc.name for oc in self.output_def.columns if oc.compute]))
+        return result
+
+    def compute_column(self, df: pd.DataFrame, name: str,
+                       deps: Optional[Dict[str, Any]] = None,
+                       ctx: Optional[RunContext] = None) -> pd.Series:
+        """
+        Calcula a função compute `name` sobre `df`. `deps` (coluna do output ->
+        valores, na ordem das linhas de `df`) entra como colunas extras do
+        frame, visíveis para a função como `row.get(nome)` / `df[nome]`.
+        Funções @uses_context recebem também `ctx` (ligado a `df` se omitido).
+        """
+        if ctx is None:
+            ctx = self.context.bind(df)
+        if deps:
+            df = df.assign(**{dep: np.asarray(values, dtype=object) for dep, values in deps.items()})
+        vec = getattr(self.proc, name + VECTORIZED_SUFFIX, None)
+        if vec is None:
+            fn = getattr(self.proc, name)
+            if getattr(fn, "pure", False):
+                return self._compute_pure(df, name, fn)
+            if getattr(fn, "context", False):
+                return df.apply(lambda r: fn(r, ctx), axis=1)
+            return df.apply(lambda r: fn(r), axis=1)
+
+        res = vec(df, ctx) if getattr(vec, "context", False) else vec(df)
+        if len(res) != len(df):
+            raise ValueError(
+                f"Vectorized compute '{name}{VECTORIZED_SUFFIX}' returned {len(res)} values for {len(df)} rows."
+            )
+        if isinstance(res, pd.Series):
+            return pd.Series(res.to_numpy(), index=df.index, name=res.name)
+        return pd.Series(res, index=df.index)
+
+    def _compute_pure(self, df: pd.DataFrame, name: str, fn: Callable) -> pd.Series:
+        """
+        Função @pure: fatoriza o frame pelas colunas declaradas, chama `fn` uma
+        vez por combinação distinta (consultando o MemoCache) e espalha os
+        resultados de volta pelas linhas. `fn` recebe um dict com as colunas
+        declaradas presentes no frame (`row.get` funciona como numa Series).
+        """
+        memo = self.memo.setdefault(name, MemoCache(self.memo_size))
+        memo.rows += len(df)
+        cols = [c for c in fn.reads if c in df.columns]
+        if df.empty:
+            return pd.Series([], index=df.index, dtype=object)
+        if not cols:
+            value = memo.get((), lambda: fn({}))
+            return pd.Series([value] * len(df), index=df.index, dtype=object)
+
+        # NaN entra como um valor distinto (use_na_sentinel=False)
+        factorized = [pd.factorize(df[c], use_na_sentinel=False) for c in cols]
+        codes = factorized[0][0].astype(np.int64)
+        for col_codes, col_uniques in factorized[1:]:
+            # refatorizar a cada coluna mantém o código combinado < linhas²
+            codes, _ = pd.factorize(codes * len(col_uniques) + col_codes)
+        # primeira linha de cada combinação (em ordem de código)
+        _, first = np.unique(codes, return_index=True)
+
+        values = np.empty(len(first), dtype=object)
+        for i, pos in enumerate(first):
+            row = {c: uniques[col_codes[pos]] for c, (col_codes, uniques) in zip(cols, factorized)}
+            key = tuple(None if pd.isna(v) else v for v in row.values())
+            values[i] = memo.get(key, lambda: fn(row))
+        return pd.Series(values[codes], index=df.index)
+
+    def memo_stats(self) -> Dict[str, Dict[str, float]]:
+        """Linhas, combinações distintas, chamadas e acertos por função @pure."""
+        return {name: memo.stats() for name, memo in self.memo.items()}
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import importlib.util
+from pathlib import Path
+from typing import Collection, Dict, Iterator, Optional
+import pandas as pd
+from models.input_definition import InputDefinition
+
+# motores disponíveis; "pandas" é o padrão
+ENGINES = ("pandas", "arrow")
+
+# valores lidos como nulos pelo pd.read_csv (padrão do pandas): o motor Arrow usa a mesma lista
+PANDAS_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+
+def read_kwargs(definition: InputDefinition, columns: Optional[Collection[str]] = None) -> dict:
+    """
+    Argumentos do pd.read_csv derivados dos tipos declarados: texto fica texto
+    (sem perder zeros à esquerda), datas são convertidas com `date_format`
+    já na leitura e números usam os separadores do input. As colunas são
+    sempre nomeadas pela definição (o cabeçalho já foi conferido pelo
+    CSVLoader); com `columns`, só elas são lidas (`usecols`).
+    """
+    selected = [c for c in definition.columns if columns is None or c.name in columns]
+    return dict(
+        delimiter=definition.delimiter,
+        encoding=definition.encoding,
+        header=0 if definition.has_headers else None,
+        names=[c.name for c in definition.columns],
+        usecols=None if columns is None else [c.name for c in selected],
+        decimal=definition.decimal_separator,
+        thousands=definition.thousands_separator or None,
+        dtype={c.name: str for c in selected if c.type == "alphabetic"},
+        parse_dates=[c.name for c in selected if c.type == "date"],
+        date_format=definition.date_format
+    )
+
+
+class PandasEngine:
+    """Leitura com pd.read_csv (uma thread); a escrita fica no to_csv do Exporter."""
+    name = "pandas"
+
+    def read_csv(self, csv_path: Path, definition: InputDefinition,
+                 columns: Optional[Collection[str]] = None) -> pd.DataFrame:
+        return pd.read_csv(csv_path, **read_kwargs(definition, columns))
+
+    def iter_csv(self, csv_path: Path, definition: InputDefinition, chunk_rows: int,
+                 columns: Optional[Collection[str]] = None) -> Iterator[pd.DataFrame]:
+        return iter(pd.read_csv(csv_path, chunksize=chunk_rows, **read_kwargs(definition, columns)))
+
+
+class ArrowEngine:
+    """
+    Leitura com o parser CSV do pyarrow, em várias threads (a conversão de
+    encodings como LATIN1 é feita pelo próprio leitor). Todas as colunas são
+    lidas como texto, com os mesmos nulos do pandas, e entregues como string
+    Arrow; a tipagem (CSVLoader._apply_types) é a mesma do motor pandas.
+    Na validação, nulidade e a regra `alphabetic` das colunas de texto rodam
+    nos kernels do pyarrow.compute (ver Validator); o resultado é o mesmo.
+    Na escrita, o Exporter usa o writer CSV do Arrow (ver exporter._ArrowCSVWriter).
+    """
+    name = "arrow"
+    # bytes por bloco do leitor (cada bloco é convertido em paralelo)
+    BLOCK_SIZE = 16 * 1024 * 1024
+
+    def _options(self, definition: InputDefinition, columns: Optional[Collection[str]]):
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        selected = [c.name for c in definition.columns if columns is None or c.name in columns]
+        read = pacsv.ReadOptions(column_names=[c.name for c in definition.columns],
+                                 skip_rows=1 if definition.has_headers else 0,
+                                 encoding=definition.encoding, use_threads=True, block_size=self.BLOCK_SIZE)
+        parse = pacsv.ParseOptions(delimiter=definition.delimiter)
+        convert = pacsv.ConvertOptions(include_columns=selected,
+                                       column_types={name: pa.string() for name in selected},
+                                       null_values=PANDAS_NA_VALUES, strings_can_be_null=True,
+                                       quoted_strings_can_be_null=True)
+        return read, parse, convert
+
+    def read_csv(self, csv_path: Path, definition: InputDefinition,
+                 columns: Optional[Collection[str]] = None) -> pd.DataFrame:
+        import pyarrow.csv as pacsv
+        table = pacsv.read_csv(csv_path, *self._options(definition, columns))
+        return self._to_pandas(table)
+
+    def iter_csv(self, csv_path: Path, definition: InputDefinition, chunk_rows: int,
+                 columns: Optional[Collection[str]] = None) -> Iterator[pd.DataFrame]:
+        """Blocos de exatamente `chunk_rows` linhas (o último, o resto), com o índice contínuo do pandas."""
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        reader = pacsv.open_csv(csv_path, *self._options(definition, columns))
+        pending, buffered, start = [], 0, 0
+        for batch in reader:
+            pending.append(batch)
+            buffered += batch.num_rows
+            while buffered >= chunk_rows:
+                table = pa.Table.from_batches(pending)
+                chunk, rest = table.slice(0, chunk_rows), table.slice(chunk_rows)
+                yield self._to_pandas(chunk, start)
+                start += chunk_rows
+                pending, buffered = rest.to_batches(), rest.num_rows
+        if buffered:
+            yield self._to_pandas(pa.Table.from_batches(pending), start)
+
+    @staticmethod
+    def _to_pandas(table, start: int = 0) -> pd.DataFrame:
+        df = table.to_pandas()
+        if start:
+            df.index = pd.RangeIndex(start, start + len(df))
+        # texto no dtype `str` do pandas (o mesmo do motor pandas), apoiado em Arrow
+        return df.astype({name: "str" for name in df.columns if df[name].dtype != "str"})
+
+
+_ENGINES: Dict[str, object] = {}
+
+def get_engine(name: str):
+    """Motor pelo nome ("pandas" | "arrow"). ValueError se desconhecido ou sem o pyarrow."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}' (expected one of {', '.join(ENGINES)}).")
+    if name == "arrow" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Engine 'arrow' requires the pyarrow package.")
+    if name not in _ENGINES:
+        _ENGINES[name] = ArrowEngine() if name == "arrow" else PandasEngine()
+    return _ENGINES[name]
@@ -1,14 +1,26 @@
 from __future__ import annotations
+import gzip
+import importlib.util
+import io
+import os
+from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Optional
+import numpy as np
 import pandas as pd
 import math
+from core import profiling
+from core.engine import get_engine
 from models.input_definition import InputDefinition
 from models.output_definition import OutputDefinition
 
 class Exporter:
-    def __init__(self, delimiter: str = ",", encoding: str = "utf-8"):
+    def __init__(self, delimiter: str = ",", encoding: str = "utf-8", engine: str = "pandas"):
         self.delimiter = delimiter
         self.encoding = encoding
+        # motor de escrita CSV da execução ("pandas" | "arrow"); `InputDefinition.engine` tem precedência
+        self.engine = engine
+        get_engine(engine)
 
     def _col_type_from_input(self, idef: InputDefinition, col_name: str) -> str | None:
         for c in idef.columns:
@@ -16,74 +28,351 @@ class Exporter:
                 return c.type  # "alphabetic" | "integer" | "numeric" | "date"
         return None
 
-    def _fmt_series(self, s: pd.Series, col_type: str | None, idef: InputDefinition) -> pd.Series:
+    def _fmt_series(self, s: pd.Series, col_type: str | None, idef: InputDefinition,
+                    passthrough: bool = False) -> pd.Series:
+        """
+        Formata a coluna conforme o tipo do input. Os valores distintos são
+        formatados uma única vez (em bloco quando o dtype permite, senão pelas
+        regras escalares abaixo) e espalhados de volta pelas linhas com um
+        `take`; nulos (NaN, None, NA, NaT) viram "".
+        `passthrough`: texto (`alphabetic`) segue como string Arrow, com os
+        nulos mantidos (o writer CSV do Arrow os grava vazios).
+        """
         # Respect the source type (input JSON). If unknown, leave as-is.
+        if col_type == "alphabetic" and passthrough:
+            return s if s.dtype == "str" else s.astype("str")
         if col_type == "alphabetic":
             # Keep as readable text exactly as it came, no float/scientific.
             return s.astype("string[python]").fillna("")
+        if col_type not in ("integer", "numeric", "date"):
+            # Unknown: leave as-is
+            return s
+
+        codes, uniques = pd.factorize(s)
         if col_type == "integer":
-            # Format integers without .0 and no thousands; empty stays empty.
-            def _fmt(v):
-                if v is None or (isinstance(v, float) and math.isnan(v)): return ""
-                # if it looks like a float but is integral, print as int
-                try:
-                    fv = float(str(v).replace(",", "."))
-                    if fv.is_integer(): return str(int(fv))
-                except Exception:
-                    pass
-                # if it’s already an int-ish string
-                vs = str(v).strip()
-                if vs.endswith(".0"): vs = vs[:-2]
-                return vs
-            return s.map(_fmt).astype("string[python]")
-        if col_type == "numeric":
-            # Normalize to the input’s decimal separator (no thousands)
-            dec = idef.decimal_separator or "."
-            thou = (idef.thousands_separator or "")
-            def _fmt(v):
-                if v is None or (isinstance(v, float) and math.isnan(v)): return ""
-                vs = str(v).strip()
-                # strip thousands, then unify decimal to dot to parse, then back to desired decimal
-                if thou: vs = vs.replace(thou, "")
-                # tolerate inputs already with dot/comma
-                try:
-                    x = float(vs.replace(",", "."))
-                    out = f"{x:.2f}"
-                    if dec != ".": out = out.replace(".", dec)
-                    return out
-                except Exception:
-                    # fallback: pass through
-                    return vs
-            return s.map(_fmt).astype("string[python]")
-        if col_type == "date":
-            # Format using the input date_format
-            fmt = idef.date_format or "%Y-%m-%d"
-            def _fmt(v):
-                if v is None or str(v).strip() == "": return ""
-                ts = pd.to_datetime(v, errors="coerce")
-                return "" if pd.isna(ts) else ts.strftime(fmt)
-            return s.map(_fmt).astype("string[python]")
-        # Unknown: leave as-is
-        return s
+            formatted = _fmt_integer_block(uniques)
+        elif col_type == "numeric":
+            formatted = _fmt_numeric_block(uniques, idef.decimal_separator or ".", idef.thousands_separator or "")
+        else:
+            formatted = _fmt_date_block(uniques, idef.date_format or "%Y-%m-%d")
+        values = np.append(np.asarray(formatted, dtype=object), "")  # código -1 (nulo) -> ""
+        return pd.Series(values[codes], index=s.index, dtype="string[python]")
 
     def export(self, df_out: pd.DataFrame, odef: OutputDefinition, idef: InputDefinition, out_path: Path):
-        result = df_out.copy()
+        """Grava `df_out` inteiro em `out_path`, no formato do output (ver `open`)."""
+        writer = self.open(odef, idef, out_path)
+        try:
+            writer.write(df_out)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+
+    def open(self, odef: OutputDefinition, idef: InputDefinition, out_path: Path) -> "OutputWriter":
+        """
+        Escritor do output para gravar em blocos (modo streaming): cada `write`
+        acrescenta linhas, `close` publica o arquivo e `abort` o descarta.
+        Tudo vai para um arquivo temporário na mesma pasta, renomeado só no
+        `close`: quem lê `out_path` nunca vê um arquivo pela metade, e uma
+        falha no meio deixa o output anterior intacto.
+        """
+        if odef.is_text:
+            if (idef.engine or self.engine) == "arrow" and self.encoding.lower().replace("-", "") == "utf8":
+                return _ArrowCSVWriter(self, odef, idef, out_path)
+            return _TextWriter(self, odef, idef, out_path)
+        return _ArrowWriter(odef, out_path)
+
+    def format_frame(self, df_out: pd.DataFrame, odef: OutputDefinition, idef: InputDefinition,
+                     passthrough: bool = False) -> pd.DataFrame:
+        """
+        Colunas como texto, formatadas pelo tipo da coluna de origem no input
+        (formatos texto). `passthrough`: ver `_fmt_series`.
+        """
+        # cópia rasa: as colunas formatadas substituem as da cópia, não as de df_out
+        result = df_out.copy(deep=False)
 
         # For each output column that comes from a source, respect the source type
         for oc in odef.columns:
             if getattr(oc, "source", None) and oc.name in result.columns:
                 src_name = oc.source
                 src_type = self._col_type_from_input(idef, src_name)
-                result[oc.name] = self._fmt_series(result[oc.name], src_type, idef)
+                result[oc.name] = self._fmt_series(result[oc.name], src_type, idef, passthrough)
 
         # (optional) computed columns type hints
         export_types = getattr(odef, "export_types", None)  # e.g. {"PRECO":"numeric","MENSAL":"alphabetic"}
         if isinstance(export_types, dict):
             for col, t in export_types.items():
                 if col in result.columns:
-                    result[col] = self._fmt_series(result[col], t, idef)
+                    result[col] = self._fmt_series(result[col], t, idef, passthrough)
 
-        # write with the delimiter defined in the OutputDefinition (fallback to comma)
-        sep = getattr(odef, "delimiter", ",")
+        # outputs `aggregate`: as medidas (as chaves já foram formatadas acima, como colunas do output)
+        aggregate = getattr(odef, "aggregate", None)
+        if aggregate is not None:
+            for m in aggregate.measures:
+                if m.name not in result.columns:
+                    continue
+                t = self._measure_type(m, result[m.name], odef, idef)
+                if t == "numeric":
+                    # já é número: só o separador decimal do input (a regra de texto removeria o de milhar)
+                    codes, uniques = pd.factorize(result[m.name])
+                    values = np.append(_fmt_numeric_block(np.asarray(uniques, dtype=np.float64),
+                                                          idef.decimal_separator or ".", "").astype(object), "")
+                    result[m.name] = pd.Series(values[codes], index=result.index, dtype="string[python]")
+                else:
+                    result[m.name] = self._fmt_series(result[m.name], t, idef, passthrough)
+        return result
+
+    def _measure_type(self, m, s: pd.Series, odef: OutputDefinition, idef: InputDefinition) -> str:
+        """Contagens são inteiros; sum/min/max seguem a coluna de origem (inteiro, data) ou viram número."""
+        if m.function in ("count", "distinct_count"):
+            return "integer"
+        if pd.api.types.is_datetime64_any_dtype(s.dtype):
+            return "date"
+        source = next((oc.source for oc in odef.columns if oc.name == m.column and oc.source), None)
+        return "integer" if source and self._col_type_from_input(idef, source) == "integer" else "numeric"
+
+
+class OutputWriter(ABC):
+    # linhas por bloco de escrita (texto) ou por row group (Parquet/Arrow)
+    CHUNK_ROWS = 100_000
+
+    def __init__(self, odef: OutputDefinition, out_path: Path):
+        self.odef = odef
+        self.out_path = out_path
+        self.tmp_path = out_path.with_name(f".{out_path.name}.tmp")
+        self.rows = 0
         out_path.parent.mkdir(parents=True, exist_ok=True)
-        result.to_csv(out_path, index=False, encoding=self.encoding, sep=sep)
+
+    def write(self, df: pd.DataFrame) -> None:
+        for start in range(0, max(len(df), 1), self.CHUNK_ROWS):
+            self._write(df.iloc[start:start + self.CHUNK_ROWS])
+        self.rows += len(df)
+
+    @abstractmethod
+    def _write(self, chunk: pd.DataFrame) -> None:
+        """Grava um bloco no arquivo temporário."""
+
+    @abstractmethod
+    def _finish(self) -> None:
+        """Fecha o arquivo temporário (chamado por `close` e `abort`)."""
+
+    def close(self) -> Path:
+        self._finish()
+        os.replace(self.tmp_path, self.out_path)
+        return self.out_path
+
+    def abort(self) -> None:
+        try:
+            self._finish()
+        finally:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+def _open_text(odef: OutputDefinition, path: Path, mode: str, encoding: Optional[str]):
+    """Arquivo de saída dos formatos texto: csv, csv.gz ou csv.zst (`mode` "wt" ou "wb")."""
+    kwargs = dict(encoding=encoding, newline="") if mode == "wt" else {}
+    if odef.format == "csv.gz":
+        return gzip.open(path, mode, **kwargs)
+    if odef.format == "csv.zst":
+        if importlib.util.find_spec("zstandard") is None:
+            raise ValueError(f"Output '{odef.id}': format 'csv.zst' requires the zstandard package.")
+        import zstandard
+        return zstandard.open(path, mode, **kwargs)
+    return open(path, mode.replace("t", ""), **kwargs)
+
+
+class _TextWriter(OutputWriter):
+    """CSV formatado pelo tipo do input; csv.gz e csv.zst comprimem o mesmo texto."""
+    def __init__(self, exporter: Exporter, odef: OutputDefinition, idef: InputDefinition, out_path: Path):
+        super().__init__(odef, out_path)
+        self.exporter = exporter
+        self.idef = idef
+        # write with the delimiter defined in the OutputDefinition (fallback to comma)
+        self.sep = getattr(odef, "delimiter", ",")
+        self.header = True
+        self._fh = _open_text(odef, self.tmp_path, "wt", exporter.encoding)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        with profiling.stage("format", output=self.odef.id, rows=len(chunk)):
+            result = self.exporter.format_frame(chunk, self.odef, self.idef)
+        with profiling.stage("write", output=self.odef.id, rows=len(result)):
+            result.to_csv(self._fh, index=False, sep=self.sep, header=self.header)
+        self.header = False
+
+    def _finish(self) -> None:
+        self._fh.close()
+
+
+class _ArrowCSVWriter(OutputWriter):
+    """
+    Motor Arrow: o mesmo CSV do _TextWriter (byte a byte), gravado pelo
+    writer CSV do pyarrow. Texto de origem passa direto (sem virar str do
+    Python) e o bloco é serializado em C++. Os casos em que o resultado do
+    Arrow diferiria do to_csv do pandas usam o to_csv naquele bloco: coluna
+    que não é texto (números e datas sem `export_types` seguem a formatação
+    do pandas), valor que precisaria de aspas (separador, aspas ou quebra de
+    linha) e frame de uma coluna só (o pandas grava vazio como "").
+    """
+    def __init__(self, exporter: Exporter, odef: OutputDefinition, idef: InputDefinition, out_path: Path):
+        import pyarrow.csv as pacsv
+        super().__init__(odef, out_path)
+        self.exporter = exporter
+        self.idef = idef
+        self.sep = getattr(odef, "delimiter", ",")
+        self.header = True
+        self._options = pacsv.WriteOptions(include_header=False, delimiter=self.sep, eol=os.linesep,
+                                           quoting_style="none")
+        self._fh = _open_text(odef, self.tmp_path, "wb", None)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        with profiling.stage("format", output=self.odef.id, rows=len(chunk)):
+            result = self.exporter.format_frame(chunk, self.odef, self.idef, passthrough=True)
+        with profiling.stage("write", output=self.odef.id, rows=len(result)):
+            if self.header:
+                self._fh.write(self._pandas_csv(result.iloc[:0], header=True))
+                self.header = False
+            self._fh.write(self._arrow_csv(result) or self._pandas_csv(result, header=False))
+
+    def _arrow_csv(self, result: pd.DataFrame) -> Optional[bytes]:
+        """O bloco em CSV pelo Arrow, ou None quando só o to_csv dá o mesmo texto."""
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        if len(result.columns) < 2 or len(result) == 0:
+            return None
+        arrays = []
+        for name in result.columns:
+            s = result[name]
+            if not (s.dtype == "str" or isinstance(s.dtype, pd.StringDtype)):
+                return None
+            arrays.append(pa.array(s, from_pandas=True))
+        buf = io.BytesIO()
+        try:
+            pacsv.write_csv(pa.Table.from_arrays(arrays, names=[str(c) for c in result.columns]), buf, self._options)
+        except pa.ArrowInvalid:
+            return None  # valor com caractere estrutural: precisaria de aspas
+        return buf.getvalue()
+
+    def _pandas_csv(self, result: pd.DataFrame, header: bool) -> bytes:
+        return result.to_csv(None, index=False, sep=self.sep, header=header).encode(self.exporter.encoding)
+
+    def _finish(self) -> None:
+        self._fh.close()
+
+
+class _ArrowWriter(OutputWriter):
+    """
+    Parquet ou Arrow IPC com os tipos nativos das colunas (sem formatação de
+    texto), um row group / record batch por bloco. O schema vem do primeiro
+    bloco; colunas sem nenhum valor nele ficam como texto.
+    """
+    def __init__(self, odef: OutputDefinition, out_path: Path):
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ValueError(f"Output '{odef.id}': format '{odef.format}' requires the pyarrow package.")
+        super().__init__(odef, out_path)
+        self._writer = None
+        self._schema = None
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        import pyarrow as pa
+        with profiling.stage("write", output=self.odef.id, rows=len(chunk)):
+            if self._schema is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                self._schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                          for f in table.schema]).remove_metadata()
+                self._writer = self._new_writer(self._schema)
+            table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+            if self.odef.format == "parquet":
+                self._writer.write_table(table, row_group_size=self.CHUNK_ROWS)
+            else:
+                self._writer.write_table(table, max_chunksize=self.CHUNK_ROWS)
+
+    def _new_writer(self, schema):
+        if self.odef.format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.tmp_path, schema)
+        import pyarrow as pa
+        return pa.ipc.new_file(str(self.tmp_path), schema)
+
+    def _finish(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# -----------------------------------------------------------------------------
+# Regras de formatação por tipo. As funções *_value são as regras escalares
+# (referência); as *_block formatam um array de valores distintos de uma vez e
+# só recorrem à regra escalar onde o caminho vetorizado não é garantidamente igual.
+# -----------------------------------------------------------------------------
+_INT64_LIMIT = 2.0 ** 63
+# caracteres que podem aparecer em str(float): se o separador de milhar for um
+# deles, a regra escalar (que o remove do texto) não equivale a formatar o número
+_FLOAT_REPR_CHARS = set("0123456789.-+einfa")
+
+def _fmt_integer_value(v) -> str:
+    # Format integers without .0 and no thousands; empty stays empty.
+    if v is None or (isinstance(v, float) and math.isnan(v)): return ""
+    # if it looks like a float but is integral, print as int
+    try:
+        fv = float(str(v).replace(",", "."))
+        if fv.is_integer(): return str(int(fv))
+    except Exception:
+        pass
+    # if it’s already an int-ish string
+    vs = str(v).strip()
+    if vs.endswith(".0"): vs = vs[:-2]
+    return vs
+
+def _fmt_numeric_value(v, dec: str, thou: str) -> str:
+    # Normalize to the input’s decimal separator (no thousands)
+    if v is None or (isinstance(v, float) and math.isnan(v)): return ""
+    vs = str(v).strip()
+    # strip thousands, then unify decimal to dot to parse, then back to desired decimal
+    if thou: vs = vs.replace(thou, "")
+    # tolerate inputs already with dot/comma
+    try:
+        x = float(vs.replace(",", "."))
+        out = f"{x:.2f}"
+        if dec != ".": out = out.replace(".", dec)
+        return out
+    except Exception:
+        # fallback: pass through
+        return vs
+
+def _fmt_date_value(v, fmt: str) -> str:
+    # Format using the input date_format
+    if v is None or str(v).strip() == "": return ""
+    ts = pd.to_datetime(v, errors="coerce")
+    return "" if pd.isna(ts) else ts.strftime(fmt)
+
+def _scalar_block(values, fn, *args) -> np.ndarray:
+    return np.array([fn(v, *args) for v in values], dtype=object)
+
+def _fmt_integer_block(uniques) -> np.ndarray:
+    arr = np.asarray(uniques)
+    if arr.dtype.kind in "iu":
+        # str(int(float(v))): o float arredonda inteiros acima de 2**53
+        x = arr.astype(np.float64)
+        if np.all(np.abs(x) < _INT64_LIMIT):
+            return x.astype(np.int64).astype(str).astype(object)
+    elif arr.dtype.kind == "f":
+        out = np.empty(len(arr), dtype=object)
+        fast = np.isfinite(arr) & (np.abs(arr) < _INT64_LIMIT) & (arr == np.floor(arr))
+        out[fast] = arr[fast].astype(np.int64).astype(str)
+        out[~fast] = _scalar_block(arr[~fast], _fmt_integer_value)
+        return out
+    return _scalar_block(uniques, _fmt_integer_value)
+
+def _fmt_numeric_block(uniques, dec: str, thou: str) -> np.ndarray:
+    arr = np.asarray(uniques)
+    if arr.dtype.kind in "iuf" and not (set(thou) & _FLOAT_REPR_CHARS):
+        out = np.char.mod("%.2f", arr)
+        if dec != ".":
+            out = np.char.replace(out, ".", dec)
+        return out.astype(object)
+    return _scalar_block(uniques, _fmt_numeric_value, dec, thou)
+
+def _fmt_date_block(uniques, fmt: str) -> np.ndarray:
+    if isinstance(uniques, pd.DatetimeIndex):
+        return np.asarray(uniques.strftime(fmt), dtype=object)
+    return _scalar_block(uniques, _fmt_date_value, fmt)
@@ -1,15 +1,23 @@
 from pathlib import Path
 import json
 from typing import Dict, List
+from core import profiling
+from core.lookup import LookupTable, register
 from models.input_definition import InputDefinition
+from models.lookup_definition import LookupDefinition
 from models.output_definition import OutputDefinition
 
 class FileManager:
     def __init__(self, config_dir: Path):
         self.config_dir = config_dir
         self.manifest_path = self.config_dir / "manifest.json"
+        self.lookups: Dict[str, LookupTable] = {}
 
     def load_all(self) -> tuple[Dict[str, InputDefinition], List[OutputDefinition]]:
+        with profiling.stage("config"):
+            return self._load_all()
+
+    def _load_all(self) -> tuple[Dict[str, InputDefinition], List[OutputDefinition]]:
         if not self.manifest_path.exists():
             raise FileNotFoundError(f"Manifest file not found: {self.manifest_path}")
 
@@ -25,6 +33,15 @@ class FileManager:
             idef = InputDefinition.from_json_file(p)
             inputs[idef.id] = idef
 
+        # tabelas de consulta (opcional): indexadas uma vez e registradas para os processors
+        for item in data.get("lookups", []):
+            if not item.get("active", True):
+                continue
+            p = self.config_dir / item["description_file"]
+            table = LookupTable(LookupDefinition.from_json_file(p))
+            self.lookups[table.definition.id] = table
+            register(table)
+
         outputs: List[OutputDefinition] = []
         for item in data["outputs"]:
             if not item.get("active", True):
@@ -33,6 +50,16 @@ class FileManager:
             odef = OutputDefinition.from_json_file(p)
             if odef.input_id not in inputs:
                 raise ValueError(f"Output '{odef.id}' references unknown input_id '{odef.input_id}'.")
+            input_cols = {c.name for c in inputs[odef.input_id].columns}
+            if odef.incremental and inputs[odef.input_id].unique_key() is None:
+                raise ValueError(
+                    f"Output '{odef.id}' is incremental but input '{odef.input_id}' does not declare exactly "
+                    "one non-nullable column with `allow_duplicates: false` to use as key."
+                )
+            for f in odef.filters:
+                if f.column not in input_cols:
+                    raise ValueError(f"Output '{odef.id}' filters on unknown input column '{f.column}'.")
+            odef.compute_order()  # rejeita dependência desconhecida ou ciclo
             outputs.append(odef)
 
         return inputs, outputs
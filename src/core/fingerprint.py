@@ -0,0 +1,74 @@
+import dataclasses
+import hashlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_BLOCK = 1 << 20
+
+def file_digest(path: Path) -> str:
+    """sha256 do conteúdo do arquivo, lido em blocos de 1 MiB."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class FileDigests:
+    """
+    `file_digest` com memória por arquivo (caminho, tamanho e data de
+    modificação): um arquivo que não mudou não é relido só para o hash.
+    Com `path`, a memória fica num JSON compartilhado entre execuções e
+    processos (o main calcula para o OutputState e o job reaproveita no
+    InputCache). A gravação é atômica; uma atualização perdida entre dois
+    processos só custa recalcular.
+    """
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._seen: Dict[str, List] = self._read()
+
+    def digest(self, file: Path) -> str:
+        st = file.stat()
+        key, stamp = str(file.resolve()), [st.st_size, st.st_mtime_ns]
+        seen = self._seen.get(key)
+        if seen is None or seen[:2] != stamp:
+            # outro processo pode já ter calculado
+            seen = self._read().get(key)
+        if seen is not None and seen[:2] == stamp:
+            self._seen[key] = seen
+            return seen[2]
+        digest = file_digest(file)
+        self._seen[key] = stamp + [digest]
+        self._save()
+        return digest
+
+    def _read(self) -> Dict[str, List]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except ValueError:
+            return {}  # arquivo corrompido: recalcula
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        seen = {**self._read(), **self._seen}
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(seen, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+def definition_digest(definition: Any) -> str:
+    """sha256 de uma definição (dataclass) serializada em JSON canônico."""
+    payload = json.dumps(dataclasses.asdict(definition), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def module_digest(module_name: str) -> str:
+    """sha256 do código-fonte de um módulo (ex.: o processor de um output)."""
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin:
+        raise ModuleNotFoundError(f"Module '{module_name}' not found")
+    return file_digest(Path(spec.origin))
@@ -0,0 +1,134 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from core.dataset_builder import DatasetBuilder
+from core.fingerprint import definition_digest, module_digest
+from core.lookup import tables_digest
+from core.unique_index import UniqueIndex
+from models.input_definition import InputDefinition
+from models.output_definition import OutputDefinition
+
+KEY_COL = "__key__"
+HASH_COL = "__row_hash__"
+
+
+class IncrementalStore:
+    """
+    Estado do modo incremental de cada output, em `state_dir`:
+      <output_id>.rows.parquet   chave + hash de cada linha do input da última execução
+      <output_id>.output.parquet linhas montadas (não formatadas) do output, com a chave
+      <output_id>.json           fingerprint da configuração que gerou o estado
+    Se input, output, processor ou tabelas de consulta mudarem, o estado é
+    descartado e o output é refeito do zero.
+    """
+    def __init__(self, state_dir: Path):
+        self.state_dir = state_dir
+
+    @staticmethod
+    def fingerprint(idef: InputDefinition, odef: OutputDefinition) -> str:
+        return "-".join([definition_digest(idef), definition_digest(odef), module_digest(odef.processor_module),
+                         tables_digest()])
+
+    def _paths(self, output_id: str) -> Tuple[Path, Path, Path]:
+        base = self.state_dir / output_id
+        return (base.with_name(f"{output_id}.rows.parquet"),
+                base.with_name(f"{output_id}.output.parquet"),
+                base.with_name(f"{output_id}.json"))
+
+    def load(self, output_id: str, fingerprint: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        rows_path, out_path, meta_path = self._paths(output_id)
+        if not (rows_path.exists() and out_path.exists() and meta_path.exists()):
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("fingerprint") != fingerprint:
+            return None
+        return pd.read_parquet(rows_path), pd.read_parquet(out_path)
+
+    def save(self, output_id: str, fingerprint: str, rows: pd.DataFrame, out: pd.DataFrame) -> None:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        rows_path, out_path, meta_path = self._paths(output_id)
+        for df, path in ((rows, rows_path), (out, out_path)):
+            tmp = path.with_suffix(".tmp")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        meta_path.write_text(json.dumps({"fingerprint": fingerprint}), encoding="utf-8")
+
+
+def build_incremental(builder: DatasetBuilder, idef: InputDefinition, df_in: pd.DataFrame,
+                      store: IncrementalStore) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Monta o output comparando o input com o snapshot da execução anterior pela
+    chave única do input: só linhas inseridas ou alteradas são recalculadas;
+    as demais vêm do output guardado e as removidas saem.
+
+    Regra das colunas dependentes da data (funções listadas em TIME_DEPENDENT
+    no processor, ex.: SITUACAO_SERIAL, e as colunas que dependem delas via
+    `depends_on`): são recalculadas para TODAS as linhas em toda execução, já que mudam com o passar dos dias mesmo sem a linha mudar.
+
+    Retorna o output na ordem do input e as contagens inserted/updated/deleted.
+    """
+    odef = builder.output_def
+    key = idef.unique_key()
+    fingerprint = store.fingerprint(idef, odef)
+    keys = df_in[key]
+    hashes = pd.util.hash_pandas_object(df_in, index=False).to_numpy()
+
+    prev = store.load(odef.id, fingerprint)
+    if prev is None:
+        filtered = builder.filter_rows(df_in)
+        merged = builder.build_columns(filtered)
+        merged.insert(0, KEY_COL, filtered[key].to_numpy())
+        stats = {"inserted": len(df_in), "updated": 0, "deleted": 0}
+    else:
+        prev_rows, prev_out = prev
+        prev_keys = prev_rows[KEY_COL]
+        # chaves por hash (UniqueIndex), conferidas pelo valor: posição da chave do outro lado ou -1
+        def in_keys(_, rows):
+            return keys.iloc[rows].tolist()
+
+        with UniqueIndex() as prev_index, UniqueIndex() as cur_index:
+            prev_index.add(prev_keys)
+            cur_index.add(keys)
+            pos = prev_index.lookup(keys, lambda _, rows: prev_keys.iloc[rows].tolist())[1]
+            inserted = pos < 0
+            prev_hashes = prev_rows[HASH_COL].to_numpy()
+            updated = np.zeros(len(df_in), dtype=bool)
+            if len(prev_hashes):
+                updated = ~inserted & (prev_hashes[np.where(inserted, 0, pos)] != hashes)
+            changed = inserted | updated
+
+            in_cur = cur_index.lookup(prev_out[KEY_COL], in_keys)[1]
+            kept = prev_out[(in_cur >= 0) & ~changed[np.maximum(in_cur, 0)]]
+            sub = builder.filter_rows(df_in[changed])
+            fresh = builder.build_columns(sub)
+            fresh.insert(0, KEY_COL, sub[key].to_numpy())
+            merged = pd.concat([kept, fresh], ignore_index=True)
+
+            # mesma ordem de linhas de uma reconstrução completa
+            order = cur_index.lookup(merged[KEY_COL], in_keys)[1]
+            sort = np.argsort(order, kind="stable")
+            merged = merged.iloc[sort].reset_index(drop=True)
+            deleted = int((~cur_index.contains(prev_keys, in_keys)).sum())
+
+        # colunas dependentes da data e, transitivamente, as que dependem delas
+        time_cols = []
+        for oc in odef.compute_order():
+            if oc.compute in builder.time_dependent or any(d in {t.name for t in time_cols} for d in oc.depends_on):
+                time_cols.append(oc)
+        if time_cols:
+            rows = df_in.iloc[order[sort]]
+            for oc in time_cols:
+                deps = {dep: merged[dep].to_numpy() for dep in oc.depends_on}
+                merged[oc.name] = builder.compute_column(rows, oc.compute, deps).to_numpy()
+
+        stats = {
+            "inserted": int(inserted.sum()),
+            "updated": int(updated.sum()),
+            "deleted": deleted,
+        }
+
+    store.save(odef.id, fingerprint, pd.DataFrame({KEY_COL: keys.to_numpy(), HASH_COL: hashes}), merged)
+    return merged.drop(columns=KEY_COL), stats
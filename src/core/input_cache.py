@@ -0,0 +1,115 @@
+import hashlib
+import importlib.util
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import pandas as pd
+from core.fingerprint import FileDigests, definition_digest
+from models.input_definition import InputDefinition
+
+class InputCache:
+    """
+    Cache em disco (Parquet) do DataFrame já lido, tipado e validado de cada
+    input. A chave combina o hash do conteúdo do CSV com o hash da
+    InputDefinition: mudar só um output não invalida o cache, mudar o arquivo
+    ou a definição do input sim. Cada arquivo guarda uma projeção (conjunto
+    de colunas); um acerto exige um arquivo com todas as colunas pedidas.
+    Acima de `max_bytes` os arquivos usados há mais tempo são removidos.
+    O hash do CSV é lembrado em `DIGESTS` (ver FileDigests): um arquivo que
+    não mudou não é relido a cada execução só para achar a chave.
+    """
+    SUFFIX = ".parquet"
+    # muda quando a forma como o CSVLoader tipa os dados muda (ex.: dtypes)
+    FORMAT_VERSION = 3
+    # memória dos hashes dos CSVs (compartilhada com o OutputState do main.py)
+    DIGESTS = "digests.json"
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 2 * 1024 ** 3, compact: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # frames do modo compacto voltam do Parquet com os tipos compactos: entradas separadas
+        self.compact = compact
+        self.digests = FileDigests(cache_dir / self.DIGESTS)
+
+    @staticmethod
+    def available() -> bool:
+        # to_parquet/read_parquet precisam do pyarrow
+        return importlib.util.find_spec("pyarrow") is not None
+
+    def key(self, csv_paths: Sequence[Path], definition: InputDefinition) -> str:
+        if len(csv_paths) == 1:
+            content = self.digests.digest(csv_paths[0])
+        else:
+            # input em várias partes: nome e conteúdo de cada uma
+            parts = "\n".join(f"{p.name}:{self.digests.digest(p)}" for p in csv_paths)
+            content = hashlib.sha256(parts.encode("utf-8")).hexdigest()
+        mode = "c" if self.compact else ""
+        return f"{content[:32]}-{definition_digest(definition)[:16]}-v{self.FORMAT_VERSION}{mode}"
+
+    def _path(self, definition: InputDefinition, key: str, columns: List[str]) -> Path:
+        cols = hashlib.sha256("\x1f".join(columns).encode("utf-8")).hexdigest()[:8]
+        return self.cache_dir / f"{definition.id}--{key}--{cols}{self.SUFFIX}"
+
+    def _entries(self, definition: InputDefinition, key: str = "*") -> List[Tuple[Path, List[str]]]:
+        if not self.cache_dir.exists():
+            return []
+        import pyarrow.parquet as pq  # opcional: só exigido com o cache ativo
+        paths = self.cache_dir.glob(f"{definition.id}--{key}--*{self.SUFFIX}")
+        return [(p, pq.read_schema(p).names) for p in paths]
+
+    def get(self, definition: InputDefinition, key: str,
+            columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        found = self._find(definition, key, columns)
+        if found is None:
+            return None
+        path, needed = found
+        df = pd.read_parquet(path, columns=needed)
+        path.touch()  # mtime = último uso, base da remoção por LRU
+        return df
+
+    def contains(self, definition: InputDefinition, key: str, columns: Optional[List[str]] = None) -> bool:
+        """Se `get` acertaria, sem ler o arquivo."""
+        return self._find(definition, key, columns) is not None
+
+    def _find(self, definition: InputDefinition, key: str,
+              columns: Optional[List[str]]) -> Optional[Tuple[Path, List[str]]]:
+        needed = columns if columns is not None else [c.name for c in definition.columns]
+        if definition.is_multi_file:
+            needed = list(needed) + [definition.source_file_column]
+        for path, names in self._entries(definition, key):
+            if set(needed) <= set(names):
+                return path, needed
+        return None
+
+    def put(self, definition: InputDefinition, key: str, df: pd.DataFrame) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        columns = list(df.columns)
+        for path, names in self._entries(definition):
+            # versões de outro arquivo/definição nunca mais serão lidas, e uma
+            # projeção contida na nova fica redundante
+            if not path.name.startswith(f"{definition.id}--{key}--") or set(names) <= set(columns):
+                path.unlink()
+        path = self._path(definition, key, columns)
+        tmp = path.with_suffix(".tmp")
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+        self._evict()
+
+    def invalidate(self, input_id: Optional[str] = None) -> int:
+        """Remove o cache de um input (ou de todos). Retorna quantos arquivos saíram."""
+        if not self.cache_dir.exists():
+            return 0
+        pattern = f"{input_id}--*{self.SUFFIX}" if input_id else f"*{self.SUFFIX}"
+        removed = 0
+        for path in self.cache_dir.glob(pattern):
+            path.unlink()
+            removed += 1
+        return removed
+
+    def _evict(self) -> None:
+        files = sorted(self.cache_dir.glob(f"*{self.SUFFIX}"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        while files and total > self.max_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
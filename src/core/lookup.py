@@ -0,0 +1,89 @@
+import hashlib
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from core.fingerprint import definition_digest
+from models.lookup_definition import LookupDefinition
+
+class LookupTable:
+    """
+    LookupDefinition indexada uma vez na carga: as linhas são agrupadas pelo
+    conjunto de chaves preenchidas (as `null` valem para qualquer valor) e
+    cada grupo vira um índice pandas. A consulta é um `get_indexer` por
+    grupo, do mais específico para o mais genérico, sem laço por linha.
+    """
+    def __init__(self, definition: LookupDefinition):
+        self.definition = definition
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in definition.rows:
+            concrete = tuple(k for k in definition.keys if row[k] is not None)
+            groups.setdefault(concrete, []).append(row)
+
+        # (chaves preenchidas, índice, valores), mais chaves primeiro
+        self._levels: List[Tuple[Tuple[str, ...], pd.Index, np.ndarray]] = []
+        for concrete in sorted(groups, key=len, reverse=True):
+            rows = groups[concrete]
+            if concrete:
+                index = self._index([[r[k] for r in rows] for k in concrete])
+            else:
+                index = pd.Index([()] * len(rows), dtype=object)  # só chaves null
+            if index.has_duplicates:
+                dup = index[index.duplicated()][0]
+                raise ValueError(f"Lookup '{definition.id}' has duplicate rows for key {dup}.")
+            values = np.empty(len(rows), dtype=object)
+            for i, r in enumerate(rows):
+                values[i] = r[definition.value]
+            self._levels.append((concrete, index, values))
+
+    @staticmethod
+    def _index(arrays: List[Any]) -> pd.Index:
+        if len(arrays) == 1:
+            return pd.Index(np.asarray(arrays[0], dtype=object))
+        return pd.MultiIndex.from_arrays([np.asarray(a, dtype=object) for a in arrays])
+
+    def lookup(self, **keys: Any) -> np.ndarray:
+        """
+        Valor de cada linha para as chaves informadas (arrays do mesmo
+        comprimento, uma por chave da definição); sem correspondência = `default`.
+        """
+        missing = set(self.definition.keys) - keys.keys()
+        if missing:
+            raise KeyError(f"Lookup '{self.definition.id}' needs keys {sorted(missing)}.")
+        arrays = {k: np.asarray(keys[k], dtype=object) for k in self.definition.keys}
+        n = len(next(iter(arrays.values())))
+        result = np.full(n, self.definition.default, dtype=object)
+        pending = np.arange(n)
+        for concrete, index, values in self._levels:
+            if not len(pending):
+                break
+            if not concrete:
+                # linha só com chaves null: vale para tudo que restou
+                result[pending] = values[0]
+                pending = pending[:0]
+                continue
+            pos = index.get_indexer(self._index([arrays[k][pending] for k in concrete]))
+            found = pos >= 0
+            result[pending[found]] = values[pos[found]]
+            pending = pending[~found]
+        return result
+
+    def get(self, **keys: Any) -> Any:
+        """Consulta de uma única combinação de chaves (escalares)."""
+        return self.lookup(**{k: [v] for k, v in keys.items()})[0]
+
+
+# Tabelas carregadas pelo FileManager, por id; processors consultam com get_table()
+_TABLES: Dict[str, LookupTable] = {}
+
+def register(table: LookupTable) -> None:
+    _TABLES[table.definition.id] = table
+
+def get_table(lookup_id: str) -> LookupTable:
+    if lookup_id not in _TABLES:
+        raise KeyError(f"Lookup table '{lookup_id}' is not loaded (is it active in manifest.json?).")
+    return _TABLES[lookup_id]
+
+def tables_digest() -> str:
+    """Hash de todas as tabelas carregadas: muda quando qualquer valor muda."""
+    payload = "".join(definition_digest(_TABLES[i].definition) for i in sorted(_TABLES))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
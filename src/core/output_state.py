@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from importlib import import_module
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from core.csv_loader import CSVLoader
+from core.fingerprint import FileDigests, definition_digest, module_digest
+from core.lookup import tables_digest
+from core.pipeline import InputPlan, OutputResult
+from models.output_definition import OutputDefinition
+
+# muda quando o que entra na fingerprint (ou a forma como o output é gerado) muda
+FORMAT_VERSION = 1
+
+
+class OutputState:
+    """
+    Evita refazer outputs que não mudariam. A fingerprint de cada output
+    combina o conteúdo dos arquivos do input, as definições do input e do
+    output, o código do processor, as tabelas de consulta e, se o output tem
+    colunas dependentes da data (TIME_DEPENDENT do processor), a data de
+    referência. Um output com a mesma fingerprint da última geração bem
+    sucedida e com o arquivo ainda no lugar é pulado.
+
+    Tudo fica em um JSON (`path`): por output, a fingerprint, o arquivo e as
+    linhas. O hash dos arquivos de input vem de `digests` (ver FileDigests;
+    o main.py usa a mesma memória do InputCache, então cada arquivo novo é
+    lido uma vez só para o hash).
+    """
+    def __init__(self, path: Path, digests: Optional[FileDigests] = None):
+        self.path = path
+        self.digests = digests or FileDigests()
+        data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        if data.get("version") != FORMAT_VERSION:
+            data = {}
+        self.outputs: Dict[str, dict] = data.get("outputs", {})
+
+    def fingerprint(self, plan: InputPlan, odef: OutputDefinition, loader: CSVLoader, as_of: str) -> str:
+        try:
+            time_dependent = set(getattr(import_module(odef.processor_module), "TIME_DEPENDENT", ()))
+            processor = module_digest(odef.processor_module)
+        except ImportError:
+            return ""  # o job falha e reporta o processor
+        parts = [str(FORMAT_VERSION), self._input_digest(loader.csv_paths(plan.input_def)),
+                 definition_digest(plan.input_def), definition_digest(odef), processor, tables_digest()]
+        if any(oc.compute in time_dependent for oc in odef.columns):
+            parts.append(as_of)
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def split(self, plan: InputPlan, loader: CSVLoader, out_dir: Path, as_of: str,
+              force: bool = False) -> Tuple[InputPlan, List[OutputResult], Dict[str, str]]:
+        """
+        Separa o plano em outputs a refazer (um plano só com eles) e outputs
+        pulados (já como resultado), com a fingerprint de cada output a refazer
+        (para `record`). `force`: nada é pulado, mas as fingerprints são
+        calculadas e gravadas. Input ausente: tudo é refeito (o job reporta o erro).
+        """
+        try:
+            prints = {odef.id: self.fingerprint(plan, odef, loader, as_of) for odef in plan.outputs}
+        except FileNotFoundError:
+            return plan, [], {}
+        todo, skipped = InputPlan(plan.input_def), []
+        for odef in plan.outputs:
+            saved = self.outputs.get(odef.id, {})
+            path = out_dir / odef.output_file_name
+            if not force and prints[odef.id] and saved.get("fingerprint") == prints[odef.id] and path.exists():
+                skipped.append(OutputResult(odef.id, plan.input_def.id, path, rows=saved.get("rows", 0),
+                                            skipped=True))
+            else:
+                todo.outputs.append(odef)
+        return todo, skipped, {odef.id: prints[odef.id] for odef in todo.outputs if prints[odef.id]}
+
+    def record(self, results: Sequence[OutputResult], fingerprints: Dict[str, str]) -> None:
+        """Guarda a fingerprint dos outputs gerados com sucesso (os que falharam são refeitos da próxima vez)."""
+        for res in results:
+            if res.skipped:
+                continue
+            if res.ok and res.output_id in fingerprints:
+                self.outputs[res.output_id] = {"fingerprint": fingerprints[res.output_id], "path": str(res.path),
+                                               "rows": res.rows}
+            else:
+                self.outputs.pop(res.output_id, None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": FORMAT_VERSION, "outputs": self.outputs},
+                                  indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _input_digest(self, paths: Sequence[Path]) -> str:
+        return hashlib.sha256("\n".join(f"{p.name}:{self.digests.digest(p)}" for p in paths).encode("utf-8")).hexdigest()
+
+
+def format_summary(results: Sequence[OutputResult]) -> Optional[str]:
+    """Linha final com quantos outputs foram refeitos e quantos pulados (None se nenhum foi pulado)."""
+    skipped = [r for r in results if r.skipped]
+    if not skipped:
+        return None
+    rebuilt = [r for r in results if not r.skipped]
+    return (f"[SKIP] {len(rebuilt)} output(s) rebuilt, {len(skipped)} skipped as unchanged "
+            f"({', '.join(r.output_id for r in skipped)}); use --force to rebuild them")
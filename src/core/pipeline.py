@@ -0,0 +1,268 @@
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+import pandas as pd
+from core import profiling
+from core.aggregate import Aggregator, host_output
+from core.compact import log_footprints
+from core.context import RunContext
+from core.csv_loader import CSVLoader
+from core.dataset_builder import DatasetBuilder
+from core.exporter import Exporter
+from core.incremental import IncrementalStore, build_incremental
+from core.input_cache import InputCache
+from models.input_definition import InputDefinition
+from models.output_definition import OutputDefinition
+from models.row_filter import RowFilter
+
+@dataclass
+class InputPlan:
+    """Um input e todos os outputs ativos que dependem dele."""
+    input_def: InputDefinition
+    outputs: List[OutputDefinition] = field(default_factory=list)
+
+    @property
+    def pushdown_filters(self) -> List[RowFilter]:
+        """
+        Filtros presentes em TODOS os outputs do input: podem ser aplicados já
+        na leitura, porque nenhum output precisa das linhas que eles descartam.
+        """
+        if not self.outputs:
+            return []
+        common = set(self.outputs[0].filters)
+        for odef in self.outputs[1:]:
+            common &= set(odef.filters)
+        return [f for f in self.outputs[0].filters if f in common]
+
+
+@dataclass
+class OutputResult:
+    """
+    Resultado de um output: linhas geradas, tempo de montagem+exportação e
+    erro, se falhou. `skipped`: não foi refeito (nada mudou desde a última
+    geração; as linhas são as daquela geração).
+    """
+    output_id: str
+    input_id: str
+    path: Path
+    rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class RunPlanner:
+    def plan(self, inputs_map: Dict[str, InputDefinition],
+             outputs: List[OutputDefinition]) -> List[InputPlan]:
+        """
+        Agrupa os outputs por input_id, mantendo a ordem do manifest, para que
+        cada CSV seja lido e validado uma única vez.
+        """
+        plans: Dict[str, InputPlan] = {}
+        for odef in outputs:
+            if odef.input_id not in plans:
+                plans[odef.input_id] = InputPlan(inputs_map[odef.input_id])
+            plans[odef.input_id].outputs.append(odef)
+        return list(plans.values())
+
+
+def required_columns(idef: InputDefinition, builders: List[DatasetBuilder]) -> Optional[List[str]]:
+    """
+    Projeção do input: união das colunas lidas pelos outputs do plano (na
+    ordem do input), mais a chave dos outputs incrementais. None = todas.
+    """
+    needed: Set[str] = set()
+    for builder in builders:
+        cols = builder.required_columns()
+        if cols is None:
+            return None
+        needed |= cols
+        if builder.output_def.incremental:
+            needed.add(idef.unique_key())
+    return [c.name for c in idef.columns if c.name in needed]
+
+
+def load_input(plan: InputPlan, loader: CSVLoader, cache: Optional[InputCache] = None,
+               columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Carrega o input do plano (só `columns`, se informado). Com cache, um
+    acerto pula a leitura do CSV e a validação; no cache fica o frame sem os
+    filtros do plano, já que cada builder aplica os filtros do seu output.
+    """
+    idef = plan.input_def
+    if cache is None:
+        return loader.load_csv(idef, plan.pushdown_filters, columns)
+
+    with profiling.stage("cache_read", input=idef.id) as st:
+        key = cache.key(loader.csv_paths(idef), idef)
+        df = cache.get(idef, key, columns)
+        st.rows = None if df is None else len(df)
+    if df is not None:
+        print(f"[CACHE] hit '{idef.id}'")
+        return df
+    df = loader.load_csv(idef, columns=columns)
+    with profiling.stage("cache_write", input=idef.id, rows=len(df)):
+        cache.put(idef, key, df)
+    return df
+
+
+def warm_cache(plan: InputPlan, loader: CSVLoader, cache: InputCache,
+               context: Optional[RunContext] = None, compact: bool = False) -> bool:
+    """
+    Deixa no cache o input do plano com as colunas de todos os seus outputs,
+    para que jobs com só parte dos outputs (ver Scheduler) leiam o Parquet
+    em vez de ler e validar o CSV cada um. Retorna False se o cache já
+    tinha essas colunas (ou se nenhum output tem builder).
+    """
+    idef = plan.input_def
+    builders = []
+    for odef in plan.outputs:
+        try:
+            builders.append(DatasetBuilder(odef, context=context or RunContext(), compact=compact))
+        except Exception:
+            continue  # o job do output reporta o erro
+    if not builders:
+        return False
+    columns = required_columns(idef, builders)
+    key = cache.key(loader.csv_paths(idef), idef)
+    if cache.contains(idef, key, columns):
+        print(f"[CACHE] hit '{idef.id}'")
+        return False
+    df = loader.load_csv(idef, columns=columns)
+    with profiling.stage("cache_write", input=idef.id, rows=len(df)):
+        cache.put(idef, key, df)
+    print(f"[CACHE] '{idef.id}' cached for {len(plan.outputs)} output(s)")
+    return True
+
+
+def run_input(plan: InputPlan, loader: CSVLoader, exporter: Exporter,
+              out_dir: Path, cache: Optional[InputCache] = None,
+              store: Optional[IncrementalStore] = None,
+              context: Optional[RunContext] = None, compact: bool = False) -> List[OutputResult]:
+    """
+    Lê o input uma vez e alimenta todos os outputs do plano com o mesmo frame
+    (ou com o mesmo bloco, no modo streaming). Outputs `incremental` usam o
+    `store` quando informado (fora do modo streaming). `context` fixa a data
+    de referência da execução para todos os outputs. `compact` liga o modo
+    compacto nos builders (no CSVLoader ele é configurado no próprio loader).
+    Um erro ao montar ou exportar um output fica no resultado dele e não
+    interrompe os demais; erros do input (leitura, validação) são levantados.
+    Outputs `aggregate` vêm depois dos de detalhe e são resumidos do frame
+    (ou bloco) montado para um output de detalhe com as mesmas colunas, quando
+    houver (ver `host_output`); senão, montam as próprias colunas.
+    """
+    idef = plan.input_def
+    context = context or RunContext()
+    results = {odef.id: OutputResult(odef.id, idef.id, out_dir / odef.output_file_name) for odef in plan.outputs}
+    builders = []
+    for odef in sorted(plan.outputs, key=lambda o: o.aggregate is not None):
+        # processor com erro (import, função compute ausente) derruba só o próprio output
+        with _output_step(results[odef.id]):
+            builders.append((odef, DatasetBuilder(odef, context=context, compact=compact), results[odef.id].path))
+    columns = required_columns(idef, [b for _, b, _ in builders])
+    hosts = {odef.id: host_output(odef, plan.outputs) for odef, _, _ in builders if odef.aggregate is not None}
+    aggregators = {odef.id: Aggregator(odef.aggregate, idef) for odef, _, _ in builders if odef.id in hosts}
+
+    def output_frame(odef: OutputDefinition, builder: DatasetBuilder, frames: Dict[str, pd.DataFrame],
+                     df_in: pd.DataFrame, build) -> pd.DataFrame:
+        """Linhas de detalhe do output; um resumo usa o frame do seu host, se ele foi montado."""
+        host = hosts.get(odef.id)
+        if host is not None and host.id in frames:
+            return frames[host.id][[oc.name for oc in odef.columns]]
+        return build(builder, df_in)
+
+    def summarize(odef: OutputDefinition, df_out: pd.DataFrame) -> None:
+        with profiling.stage("aggregate", output=odef.id, rows=len(df_out)):
+            aggregators[odef.id].add(df_out)
+
+    if idef.chunk_rows:
+        # modo streaming: memória proporcional ao bloco, não ao arquivo
+        # (o cache de input não se aplica: o frame inteiro nunca é montado)
+        writers = {}
+        for odef, _, out_path in builders:
+            with _output_step(results[odef.id]):
+                writers[odef.id] = exporter.open(odef, idef, out_path)
+        try:
+            for chunk in loader.iter_csv(idef, idef.chunk_rows, plan.pushdown_filters, columns):
+                frames: Dict[str, pd.DataFrame] = {}
+                for odef, builder, out_path in builders:
+                    res = results[odef.id]
+                    if not res.ok:
+                        continue
+                    with _output_step(res):
+                        df_out = output_frame(odef, builder, frames, chunk, DatasetBuilder.build)
+                        if odef.aggregate is not None:
+                            summarize(odef, df_out)
+                        else:
+                            writers[odef.id].write(df_out)
+                            res.rows += len(df_out)
+                            frames[odef.id] = df_out
+                    if not res.ok:
+                        # o output anterior continua no lugar
+                        writers.pop(odef.id).abort()
+            for odef_id, writer in list(writers.items()):
+                with _output_step(results[odef_id]):
+                    if odef_id in aggregators:
+                        summary = aggregators[odef_id].result()
+                        writer.write(summary)
+                        results[odef_id].rows = len(summary)
+                    writers.pop(odef_id).close()
+        finally:
+            # erro do input (ex.: validação no fim do arquivo): nenhum output é publicado
+            for writer in writers.values():
+                writer.abort()
+    else:
+        df_in = load_input(plan, loader, cache, columns)
+        hosted = {host.id for host in hosts.values() if host is not None}
+        frames = {}
+
+        def build(builder: DatasetBuilder, df: pd.DataFrame) -> pd.DataFrame:
+            odef = builder.output_def
+            if odef.incremental and store is not None:
+                df_out, stats = build_incremental(builder, idef, df, store)
+                print(f"[INCR] '{odef.id}': {stats['inserted']} inserted, "
+                      f"{stats['updated']} updated, {stats['deleted']} deleted")
+                return df_out
+            return builder.build(df)
+
+        for odef, builder, out_path in builders:
+            res = results[odef.id]
+            with _output_step(res):
+                df_out = output_frame(odef, builder, frames, df_in, build)
+                if odef.aggregate is not None:
+                    summarize(odef, df_out)
+                    df_out = aggregators[odef.id].result()
+                elif odef.id in hosted:
+                    frames[odef.id] = df_out
+                exporter.export(df_out, odef, idef, out_path)
+                res.rows = len(df_out)
+
+    for odef, builder, _ in builders:
+        for name, st in builder.memo_stats().items():
+            print(f"[MEMO] '{odef.id}' {name}: {st['rows']} rows, {st['calls']} calls "
+                  f"({st['hit_rate']:.1%} saved, {st['cache_hits']} cache hits)")
+        log_footprints(odef.id, builder.compact_footprints.values())
+
+    return list(results.values())
+
+
+class _output_step:
+    """Soma o tempo do trecho em `result.seconds` e guarda nele a exceção, se houver."""
+    def __init__(self, result: OutputResult):
+        self.result = result
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.result.seconds += time.perf_counter() - self._start
+        if exc_type is None or not issubclass(exc_type, Exception):
+            return False
+        self.result.error = f"{exc_type.__name__}: {exc}"
+        print(f"[ERROR] Output '{self.result.output_id}' failed: {self.result.error}")
+        return True
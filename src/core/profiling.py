@@ -0,0 +1,168 @@
+"""
+Instrumentação opcional da execução. Desligada (padrão), `stage()` devolve
+um objeto nulo compartilhado e o custo é uma chamada de função por etapa.
+Ligada (`enable()`), cada etapa registra tempo de parede, tempo de CPU,
+linhas, vazão e pico de memória residente:
+
+    with profiling.stage("read", input=definition.id) as st:
+        df = ...
+        st.rows = len(df)
+
+Etapas repetidas (blocos do modo streaming) são somadas na mesma entrada.
+"""
+from __future__ import annotations
+import importlib.util
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from core.rss import PeakRSS
+
+# chave de agregação: (etapa, input, output, coluna)
+_Key = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+
+class _NullStage:
+    rows: Optional[int] = None
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+_NULL = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler: "Profiler", key: _Key, function: Optional[str], rows: Optional[int]):
+        self.profiler = profiler
+        self.key = key
+        self.function = function
+        self.rows = rows
+        self._mem = PeakRSS()
+
+    def __enter__(self) -> "_Stage":
+        self._mem.__enter__()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self._mem.__exit__(*exc)
+        self.profiler._record(self.key, self.function, wall, cpu, self.rows, self._mem.peak_mb)
+
+
+class Profiler:
+    def __init__(self):
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self._records: Dict[_Key, Dict[str, Any]] = {}
+
+    def stage(self, name: str, rows: Optional[int] = None, input: Optional[str] = None,
+              output: Optional[str] = None, column: Optional[str] = None,
+              function: Optional[str] = None) -> _Stage:
+        return _Stage(self, (name, input, output, column), function, rows)
+
+    def _record(self, key: _Key, function: Optional[str], wall: float, cpu: float,
+                rows: Optional[int], peak_mb: Optional[float]) -> None:
+        rec = self._records.get(key)
+        if rec is None:
+            name, input_id, output_id, column = key
+            rec = self._records[key] = {
+                "stage": name, "input": input_id, "output": output_id, "column": column,
+                "function": function, "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": None,
+                "peak_rss_mb": None,
+            }
+        rec["calls"] += 1
+        rec["wall_s"] += wall
+        rec["cpu_s"] += cpu
+        if rows is not None:
+            rec["rows"] = (rec["rows"] or 0) + rows
+        if peak_mb is not None and (rec["peak_rss_mb"] is None or peak_mb > rec["peak_rss_mb"]):
+            rec["peak_rss_mb"] = peak_mb
+
+    @staticmethod
+    def _public(rec: Dict[str, Any]) -> Dict[str, Any]:
+        out = {k: v for k, v in rec.items() if v is not None and k not in ("input", "output")}
+        out["wall_s"] = round(rec["wall_s"], 4)
+        out["cpu_s"] = round(rec["cpu_s"], 4)
+        if rec["rows"] is not None and rec["wall_s"] > 0:
+            out["rows_per_s"] = round(rec["rows"] / rec["wall_s"])
+        return out
+
+    def report(self, output_id: str, input_id: str, **extra: Any) -> Dict[str, Any]:
+        """
+        Relatório de um output: etapas de execução (config), do input que o
+        alimenta (leitura/validação, compartilhadas com os outros outputs do
+        mesmo input), do próprio output e o tempo de cada coluna computada.
+        """
+        recs = list(self._records.values())
+        return {
+            "output_id": output_id,
+            "input_id": input_id,
+            "started": self.started,
+            **extra,
+            "run_stages": [self._public(r) for r in recs if r["input"] is None and r["output"] is None],
+            "input_stages": [self._public(r) for r in recs if r["input"] == input_id and r["output"] is None],
+            "output_stages": [self._public(r) for r in recs if r["output"] == output_id and r["column"] is None],
+            "compute_columns": sorted((self._public(r) for r in recs
+                                       if r["output"] == output_id and r["column"] is not None),
+                                      key=lambda r: r["wall_s"], reverse=True),
+        }
+
+
+_ACTIVE: Optional[Profiler] = None
+
+def enable() -> Profiler:
+    global _ACTIVE
+    _ACTIVE = Profiler()
+    return _ACTIVE
+
+def disable() -> None:
+    global _ACTIVE
+    _ACTIVE = None
+
+def active() -> Optional[Profiler]:
+    return _ACTIVE
+
+def stage(name: str, **tags: Any):
+    """Etapa medida pelo profiler ativo; sem profiler, um contexto nulo."""
+    return _NULL if _ACTIVE is None else _ACTIVE.stage(name, **tags)
+
+
+class SamplingDump:
+    """
+    Dump opcional de um profiler da execução inteira. Usa o pyinstrument
+    (amostragem, baixo custo) quando instalado e grava o relatório em HTML;
+    sem ele, cai no cProfile (determinístico, mais lento) e grava um .prof
+    legível com `python -m pstats` ou snakeviz.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.sampling = importlib.util.find_spec("pyinstrument") is not None
+        if self.sampling:
+            from pyinstrument import Profiler as _Sampler
+            self._impl = _Sampler()
+        else:
+            import cProfile
+            self._impl = cProfile.Profile()
+
+    def start(self) -> None:
+        if self.sampling:
+            self._impl.start()
+        else:
+            self._impl.enable()
+
+    def stop(self) -> Path:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.sampling:
+            self._impl.stop()
+            path = self.path.with_suffix(".html")
+            path.write_text(self._impl.output_html(), encoding="utf-8")
+        else:
+            self._impl.disable()
+            path = self.path.with_suffix(".prof")
+            self._impl.dump_stats(str(path))
+        return path
@@ -0,0 +1,44 @@
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from models.row_filter import RowFilter
+
+def filter_mask(df: pd.DataFrame, filters: Iterable[RowFilter]) -> np.ndarray:
+    """
+    Compila os filtros declarativos em um único predicado vetorizado.
+    Retorna a máscara booleana das linhas a MANTER.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    for f in filters:
+        if f.column not in df.columns:
+            raise KeyError(f"Row filter references unknown column '{f.column}'.")
+        keep &= _predicate(df[f.column], f)
+    return keep
+
+def _predicate(s: pd.Series, f: RowFilter) -> np.ndarray:
+    if f.op == "is_null":
+        m = s.isna()
+    elif f.op == "not_null":
+        m = s.notna()
+    elif f.op == "in":
+        m = s.isin(f.values)
+    elif f.op == "not_in":
+        m = ~s.isin(f.values)
+    else:
+        v = f.values[0]
+        if f.op == "eq":
+            m = s.eq(v)
+        elif f.op == "ne":
+            m = s.ne(v)
+        elif f.op == "gt":
+            m = s.gt(v)
+        elif f.op == "ge":
+            m = s.ge(v)
+        elif f.op == "lt":
+            m = s.lt(v)
+        elif f.op == "le":
+            m = s.le(v)
+        else:
+            raise ValueError(f"Invalid row filter `op`: {f.op}")
+    # dtypes nullable devolvem NA nas comparações: NA conta como "não satisfaz"
+    return m.fillna(False).to_numpy(dtype=bool)
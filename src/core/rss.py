@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import sys
+import threading
+from typing import Callable, Optional
+
+_MB = 1024 * 1024
+# resolvido uma vez por processo, não a cada amostra
+_HAS_PSUTIL = importlib.util.find_spec("psutil") is not None
+
+
+def rss_reader(children: bool = False) -> Optional[Callable[[], Optional[int]]]:
+    """
+    Função que mede a memória residente (bytes) do processo atual, com o
+    que for preciso já resolvido (o `psutil.Process`), para ser chamada a
+    cada amostra. Usa psutil quando instalado; sem ele, /proc/self/statm
+    (Linux). None quando não há como medir. Criar no próprio processo que
+    mede: um `psutil.Process` herdado num fork aponta para o processo pai.
+    `children`: soma os processos filhos (ex.: o pool que lê as partes de
+    um input); só com psutil, sem ele mede o processo atual.
+    """
+    if _HAS_PSUTIL:
+        import psutil
+        proc = psutil.Process()
+        if not children:
+            return lambda: proc.memory_info().rss
+
+        def read() -> int:
+            total = proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass  # terminou entre a listagem e a leitura
+            return total
+        return read
+    if sys.platform.startswith("linux"):
+        return _statm_rss
+    return None
+
+
+def _statm_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def current_rss() -> Optional[int]:
+    """Memória residente (bytes) do processo atual; None quando não há como medir (ver rss_reader)."""
+    read = rss_reader()
+    return None if read is None else read()
+
+
+def total_memory() -> Optional[int]:
+    """Memória física total (bytes): psutil, senão sysconf (Linux); None se não houver como saber."""
+    if _HAS_PSUTIL:
+        import psutil
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class PeakRSS:
+    """
+    Pico de memória residente durante um trecho, amostrado por uma thread a
+    cada `interval` segundos:
+
+        with PeakRSS() as mem:
+            ...
+        mem.peak_mb, mem.delta_mb
+
+    Sem como medir a memória (ver current_rss), os valores ficam None.
+    `children`: o pico inclui os processos filhos (ver rss_reader).
+    """
+    def __init__(self, interval: float = 0.01, children: bool = False):
+        self.interval = interval
+        self.start: Optional[int] = None
+        self.peak: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._read = rss_reader(children)
+
+    def _sample(self) -> None:
+        rss = self._read()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakRSS":
+        self.start = self._read() if self._read is not None else None
+        self.peak = self.start
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return None if self.peak is None else round(self.peak / _MB, 1)
+
+    @property
+    def delta_mb(self) -> Optional[float]:
+        if self.peak is None or self.start is None:
+            return None
+        return round((self.peak - self.start) / _MB, 1)
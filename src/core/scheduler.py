@@ -0,0 +1,368 @@
+import dataclasses
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from core import profiling
+from core.aggregate import host_output
+from core.context import RunContext
+from core.csv_loader import CSVLoader
+from core.exporter import Exporter
+from core.file_manager import FileManager
+from core.incremental import IncrementalStore
+from core.input_cache import InputCache
+from core.pipeline import InputPlan, OutputResult, run_input, warm_cache
+from core.rss import PeakRSS
+from core.validation import ValidationError
+from models.input_definition import InputDefinition
+from models.output_definition import OutputDefinition
+
+# estimativa de memória de um job sem histórico: processo + frame
+BASE_MB = 150.0
+MB_PER_CSV_MB = 6.0
+# no modo streaming só um bloco fica em memória; teto da estimativa
+STREAMING_MB = 512.0
+
+
+@dataclass(frozen=True)
+class RunSettings:
+    """
+    Tudo o que um job precisa para rodar em outro processo (precisa ser
+    serializável: o registro de tabelas de consulta é por processo, então
+    cada job carrega as definições de novo a partir de `config_dir`).
+    `cache_dir`/`state_dir` None desligam o cache de input e o modo incremental.
+    `part_workers`: processos que leem as partes de um input em vários
+    arquivos (1 = em sequência no processo do job; ver `default_part_workers`).
+    """
+    config_dir: Path
+    data_in: Path
+    data_out: Path
+    as_of: str
+    cache_dir: Optional[Path] = None
+    cache_max_bytes: int = 2048 * 1024 * 1024
+    state_dir: Optional[Path] = None
+    profile_dir: Optional[Path] = None
+    compact: bool = False
+    engine: str = "pandas"
+    part_workers: int = 1
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    Um input e os outputs que dependem dele: o input é lido uma vez por job.
+    Com o input dividido entre vários jobs (ver Scheduler), `part` diz qual
+    parte dos outputs o job monta, `cache_only` marca o job que só deixa o
+    input no cache para os demais e `after` é o nome do job que precisa
+    terminar antes deste.
+    """
+    input_id: str
+    output_ids: Tuple[str, ...]
+    estimate_mb: float = BASE_MB
+    input_bytes: int = 0
+    part: str = ""
+    cache_only: bool = False
+    after: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.input_id}:{self.part}" if self.part else self.input_id
+
+
+@dataclass
+class JobResult:
+    input_id: str
+    outputs: List[OutputResult] = field(default_factory=list)
+    seconds: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    error: Optional[str] = None
+
+
+def run_job(settings: RunSettings, job: Job,
+            definitions: Optional[Tuple[Dict[str, InputDefinition], List[OutputDefinition]]] = None) -> JobResult:
+    """
+    Executa um job (no processo atual ou num worker). Erros do input marcam
+    todos os outputs do job como falhos; erros de um output só afetam ele.
+    `definitions`: inputs e outputs já carregados (modo --watch); sem elas,
+    a config é lida de `settings.config_dir`.
+    """
+    start = time.perf_counter()
+    result = JobResult(job.input_id)
+    profiler = profiling.enable() if settings.profile_dir else None
+    try:
+        # inclui os processos que leem as partes do input
+        with PeakRSS(children=True) as mem:
+            inputs_map, outputs = definitions or FileManager(config_dir=settings.config_dir).load_all()
+            idef = inputs_map[job.input_id]
+            plan = InputPlan(idef, [o for o in outputs if o.id in job.output_ids])
+            cache = (InputCache(settings.cache_dir, max_bytes=settings.cache_max_bytes, compact=settings.compact)
+                     if settings.cache_dir else None)
+            store = IncrementalStore(settings.state_dir) if settings.state_dir else None
+            context = RunContext(settings.as_of)
+            try:
+                loader = CSVLoader(data_dir=settings.data_in, part_workers=settings.part_workers,
+                                   compact=settings.compact, engine=settings.engine)
+                if job.cache_only and cache is not None:
+                    warm_cache(plan, loader, cache, context, compact=settings.compact)
+                else:
+                    result.outputs = run_input(plan, loader, Exporter(engine=settings.engine), settings.data_out,
+                                               cache, store, context, compact=settings.compact)
+                for res in result.outputs:
+                    if res.ok:
+                        print(f"[OK] Saved -> {res.path} ({res.rows} rows)")
+            except ValidationError as e:
+                # relatório completo (todas as colunas/regras) para corrigir tudo de uma vez
+                report_path = settings.data_out / f"{idef.id}.validation.json"
+                report_path.write_text(json.dumps(e.report.to_dict(), indent=2, ensure_ascii=False),
+                                       encoding="utf-8")
+                print(f"[ERROR] {e}\n[ERROR] Validation report -> {report_path}")
+                result.error = f"validation failed, see {report_path.name}"
+        result.peak_rss_mb = mem.peak_mb
+        if profiler is not None:
+            _write_profiles(profiler, settings, idef.id, result.outputs)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        print(f"[ERROR] Input '{job.name}' failed: {result.error}")
+    finally:
+        if profiler is not None:
+            profiling.disable()
+    result.seconds = time.perf_counter() - start
+    if result.error is not None:
+        result.outputs = [OutputResult(oid, job.input_id, settings.data_out, error=result.error)
+                          for oid in job.output_ids]
+    return result
+
+
+def _write_profiles(profiler: profiling.Profiler, settings: RunSettings, input_id: str,
+                    outputs: List[OutputResult]) -> None:
+    settings.profile_dir.mkdir(parents=True, exist_ok=True)
+    for res in outputs:
+        report = profiler.report(res.output_id, input_id, as_of=settings.as_of, rows=res.rows,
+                                 output_file=str(res.path), error=res.error)
+        path = settings.profile_dir / f"{res.output_id}.profile.json"
+        path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[PROF] '{res.output_id}' -> {path}")
+
+
+class Scheduler:
+    """
+    Roda os jobs num pool de `workers` processos. Em geral um job é um input
+    com todos os seus outputs, montados em sequência no mesmo processo. Com
+    mais de um worker e o cache de input ligado, um input com vários outputs
+    (fora do modo streaming) vira vários jobs: um que lê e valida o CSV e
+    grava no cache as colunas de todos os outputs, e, depois dele, um job
+    por output (um resumo fica no job do seu host, ver `host_output`) que
+    lê só a sua projeção do Parquet. Assim os outputs de um mesmo input
+    rodam em paralelo; sem o cache (ou em streaming) cada job leria e
+    validaria o CSV de novo, então o input fica num job só. `run` devolve
+    um JobResult por input, com os tempos dos jobs somados e o maior pico.
+
+    Um job só começa se a soma das estimativas de memória dos jobs em
+    execução couber em `memory_mb`; um job maior que o teto roda sozinho.
+    As estimativas vêm do pico medido na última execução (em `history_path`,
+    escalado pelo tamanho atual do arquivo) ou, sem histórico, do tamanho
+    do CSV. Com `workers=1` os jobs rodam em sequência no próprio processo.
+    Com mais de um worker, as partes de um input em vários arquivos são
+    lidas em sequência dentro do job (`part_workers` 1): cada job é um
+    processo só, que o teto e o pico medido cobrem inteiro.
+
+    Se um worker morre (ex.: falta de memória) com um job só rodando, esse
+    job falha; com vários, o pool não diz de qual job foi a falha: eles
+    rodam de novo, um por vez, e só falha o que quebrar sozinho.
+    """
+    def __init__(self, settings: RunSettings, workers: int = 1, memory_mb: Optional[float] = None,
+                 history_path: Optional[Path] = None):
+        self.workers = max(1, workers)
+        if self.workers > 1 and settings.part_workers > 1:
+            settings = dataclasses.replace(settings, part_workers=1)
+        self.settings = settings
+        self.memory_mb = memory_mb
+        self.history_path = history_path
+        self.history: Dict[str, Dict[str, float]] = {}
+        if history_path is not None and history_path.exists():
+            self.history = json.loads(history_path.read_text(encoding="utf-8"))
+
+    def jobs(self, plans: List[InputPlan]) -> List[Job]:
+        jobs = []
+        loader = CSVLoader(data_dir=self.settings.data_in)
+        for p in plans:
+            idef = p.input_def
+            try:
+                size = sum(path.stat().st_size for path in loader.csv_paths(idef))
+            except FileNotFoundError:
+                size = 0  # o job falha e reporta o arquivo ausente
+            output_ids = tuple(o.id for o in p.outputs)
+            units = self._units(p)
+            if len(units) < 2:
+                jobs.append(Job(idef.id, output_ids, self.estimate_mb(idef, size), size))
+                continue
+            warm = Job(idef.id, output_ids, self.estimate_mb(idef, size, f"{idef.id}:cache"), size,
+                       part="cache", cache_only=True)
+            jobs.append(warm)
+            for ids in units:
+                part = "+".join(ids)
+                jobs.append(Job(idef.id, ids, self.estimate_mb(idef, size, f"{idef.id}:{part}"), size,
+                                part=part, after=warm.name))
+        return jobs
+
+    def _units(self, plan: InputPlan) -> List[Tuple[str, ...]]:
+        """Grupos de outputs do input que podem virar jobs separados (vazio: o input fica num job só)."""
+        if self.workers == 1 or self.settings.cache_dir is None or plan.input_def.chunk_rows:
+            return []
+        units: Dict[str, List[str]] = {}
+        for odef in plan.outputs:
+            host = host_output(odef, plan.outputs) if odef.aggregate is not None else None
+            units.setdefault((host or odef).id, []).append(odef.id)
+        return [tuple(ids) for ids in units.values()]
+
+    def estimate_mb(self, idef: InputDefinition, size: int, name: Optional[str] = None) -> float:
+        past = self.history.get(name or idef.id)
+        if past and past.get("input_bytes"):
+            return max(BASE_MB, past["peak_mb"] * size / past["input_bytes"])
+        mb = size / (1024 * 1024) * MB_PER_CSV_MB
+        if idef.chunk_rows:
+            mb = min(mb, STREAMING_MB)
+        return BASE_MB + mb
+
+    def run(self, jobs: List[Job]) -> List[JobResult]:
+        if self.workers == 1 or len(jobs) <= 1:
+            return self._merge(jobs, {job: run_job(self.settings, job) for job in jobs})
+
+        results: Dict[Job, JobResult] = {}
+        pending = list(jobs)
+        running: Dict[Future, Job] = {}
+        # jobs que estavam rodando quando um worker morreu: rodam de novo, um por vez
+        suspects: Set[Job] = set()
+        finished: Set[str] = set()
+
+        def ready(job: Job) -> bool:
+            return job.after is None or job.after in finished
+
+        def finish(job: Job, result: JobResult) -> None:
+            results[job] = result
+            finished.add(job.name)
+            if result.error is not None:
+                # os outputs dos jobs que dependiam deste já falharam junto com ele
+                pending[:] = [j for j in pending if j.after != job.name]
+
+        pool = self._pool()
+        try:
+            while pending or running:
+                for job in list(pending):
+                    if len(running) >= self.workers or any(j in suspects for j in running.values()):
+                        break
+                    if not ready(job):
+                        continue
+                    if job in suspects:
+                        if not running:
+                            pending.remove(job)
+                            running[pool.submit(run_job, self.settings, job)] = job
+                        break
+                    if self._fits(job, running.values()):
+                        pending.remove(job)
+                        running[pool.submit(run_job, self.settings, job)] = job
+                if not running:
+                    # nada cabe no teto: o próximo roda sozinho
+                    job = next(j for j in pending if ready(j))
+                    pending.remove(job)
+                    print(f"[WARN] '{job.name}' needs ~{job.estimate_mb:.0f} MB, "
+                          f"above the {self.memory_mb:.0f} MB budget: running it alone")
+                    running[pool.submit(run_job, self.settings, job)] = job
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                crashed: List[Job] = []
+                for fut in done:
+                    job = running.pop(fut)
+                    try:
+                        finish(job, fut.result())
+                        self._remember(job, results[job])
+                    except BrokenProcessPool:
+                        crashed.append(job)
+                if crashed:
+                    # o pool quebrado derruba todos os jobs em execução, sem dizer de qual
+                    # worker foi a falha: só um job rodando é o culpado; com vários, voltam
+                    # para a fila e rodam um por vez num pool novo, e falha quem quebrar sozinho
+                    crashed += running.values()
+                    running.clear()
+                    pool.shutdown(cancel_futures=True)
+                    pool = self._pool()
+                    if len(crashed) == 1:
+                        job = crashed[0]
+                        finish(job, self._failed(job, "worker process died (out of memory?)"))
+                    else:
+                        print(f"[WARN] A worker process died (out of memory?) with {len(crashed)} job(s) "
+                              f"running: running {', '.join(repr(j.name) for j in crashed)} again, "
+                              f"one at a time")
+                        suspects.update(crashed)
+                        pending[:0] = crashed
+        finally:
+            pool.shutdown()
+            self._save_history()
+        return self._merge(jobs, results)
+
+    @staticmethod
+    def _merge(jobs: List[Job], results: Dict[Job, JobResult]) -> List[JobResult]:
+        """Junta os resultados dos jobs de um mesmo input (na ordem dos jobs)."""
+        merged: Dict[str, JobResult] = {}
+        for job in jobs:
+            res = results.get(job)
+            if res is None:
+                continue  # dependia de um job que falhou
+            into = merged.setdefault(job.input_id, JobResult(job.input_id))
+            into.outputs += res.outputs
+            into.seconds += res.seconds
+            peaks = [p for p in (into.peak_rss_mb, res.peak_rss_mb) if p is not None]
+            into.peak_rss_mb = max(peaks) if peaks else None
+            into.error = into.error or res.error
+        return list(merged.values())
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # um processo novo por job: o pico medido é do job e a memória volta ao sistema
+        return ProcessPoolExecutor(max_workers=self.workers, max_tasks_per_child=1)
+
+    def _fits(self, job: Job, running) -> bool:
+        if self.memory_mb is None:
+            return True
+        return sum(j.estimate_mb for j in running) + job.estimate_mb <= self.memory_mb
+
+    def _failed(self, job: Job, error: str) -> JobResult:
+        print(f"[ERROR] Input '{job.name}' failed: {error}")
+        return JobResult(job.input_id, [OutputResult(oid, job.input_id, self.settings.data_out, error=error)
+                                        for oid in job.output_ids], error=error)
+
+    def _remember(self, job: Job, result: JobResult) -> None:
+        # só o pico de um worker dedicado (processo novo) representa o job inteiro
+        if result.peak_rss_mb is None or result.error is not None or not job.input_bytes:
+            return
+        self.history[job.name] = {"peak_mb": result.peak_rss_mb, "input_bytes": job.input_bytes}
+
+    def _save_history(self) -> None:
+        if self.history_path is None or not self.history:
+            return
+        self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        self.history_path.write_text(json.dumps(self.history, indent=2), encoding="utf-8")
+
+
+def default_workers(jobs: int) -> int:
+    return max(1, min(jobs, os.cpu_count() or 1))
+
+
+def default_part_workers(workers: int) -> int:
+    """Processos para as partes de um input: os núcleos se os jobs rodam um por vez, senão 1."""
+    return (os.cpu_count() or 1) if workers == 1 else 1
+
+
+def format_report(results: List[JobResult]) -> str:
+    """Tabela final: status, linhas e tempos de cada output e o total de cada input."""
+    lines = [f"{'output':<40} {'input':<24} {'status':<7} {'rows':>10} {'seconds':>9}"]
+    for job in results:
+        for res in job.outputs:
+            status = "skipped" if res.skipped else "ok" if res.ok else "FAILED"
+            lines.append(f"{res.output_id:<40} {res.input_id:<24} {status:<7} "
+                         f"{res.rows:>10} {res.seconds:>9.2f}")
+        peak = "-" if job.peak_rss_mb is None else f"{job.peak_rss_mb:.0f} MB"
+        lines.append(f"{'  (input total)':<40} {job.input_id:<24} {'':<7} {'':>10} {job.seconds:>9.2f}  peak {peak}")
+    return "\n".join(lines)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# memória padrão de um índice antes de descarregar em disco
+DEFAULT_MEMORY_BYTES = 256 * 1024 * 1024
+# arquivos de partição no disco (potência de 2: a partição são os bits altos do hash)
+PARTITIONS = 64
+# um registro por linha: hash da chave, parte (arquivo) e linha, 20 bytes
+RECORD = np.dtype([("hash", "<u8"), ("part", "<i4"), ("row", "<i8")])
+
+
+def hash_keys(s: pd.Series) -> np.ndarray:
+    """
+    Hash de 64 bits de cada valor. Depende só do valor: o mesmo texto dá o
+    mesmo hash em object, str, string ou category, e o mesmo número em
+    qualquer largura (Int8..Int64, float32/float64), porque inteiros e
+    floats são alargados para 64 bits antes do hash (partes e blocos com
+    dtypes compactos diferentes se comparam). Nulos têm um hash próprio
+    (como no `duplicated`, nulos repetidos contam).
+    """
+    return pd.util.hash_pandas_object(_widened(s), index=False).to_numpy()
+
+
+def _widened(s: pd.Series) -> pd.Series:
+    """`s` com inteiros e floats em 64 bits (o hash do pandas depende da largura: -1 em Int8 != -1 em Int64)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        categories = s.cat.categories
+        wide = _wide_dtype(categories.dtype)
+        if wide is None:
+            return s
+        return pd.Series(pd.Categorical.from_codes(s.cat.codes, categories=categories.astype(wide)),
+                         index=s.index)
+    wide = _wide_dtype(s.dtype)
+    return s if wide is None else s.astype(wide)
+
+
+def _wide_dtype(dtype) -> Optional[object]:
+    """O dtype de 64 bits equivalente (nulável se `dtype` for), ou None se já for ou não for numérico."""
+    if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+        return None
+    nullable = isinstance(dtype, pd.api.extensions.ExtensionDtype)
+    if pd.api.types.is_signed_integer_dtype(dtype):
+        wide = "Int64" if nullable else np.dtype(np.int64)
+    elif pd.api.types.is_unsigned_integer_dtype(dtype):
+        wide = "UInt64" if nullable else np.dtype(np.uint64)
+    elif pd.api.types.is_float_dtype(dtype):
+        wide = "Float64" if nullable else np.dtype(np.float64)
+    else:
+        return None
+    return None if dtype == wide else wide
+
+
+@dataclass
+class DuplicateKey:
+    """Um valor repetido e todas as linhas em que aparece (em ordem de parte e linha)."""
+    value: object
+    parts: np.ndarray
+    rows: np.ndarray
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+
+class UniqueIndex:
+    """
+    Índice das chaves de uma coluna, por hash de 64 bits (20 bytes por linha,
+    seja qual for o tamanho do valor). Cada linha é identificada por `part`
+    (ex.: o arquivo de um input em várias partes) e `row` (ex.: a linha no
+    arquivo), definidos por quem chama. Acima de `memory_bytes` os registros
+    vão para arquivos de partição por hash em `spill_dir` (ou no diretório
+    temporário do sistema); cada consulta carrega uma partição por vez.
+
+    Serve para a unicidade (`duplicates`: valores repetidos com todas as
+    linhas; a igualdade é conferida nos valores, então colisões de hash não
+    viram falsas duplicatas) e como consulta de chaves (`lookup`/`contains`)
+    para junções e detecção de mudanças.
+    """
+    def __init__(self, memory_bytes: int = DEFAULT_MEMORY_BYTES, spill_dir: Optional[Path] = None,
+                 partitions: int = PARTITIONS):
+        if partitions < 1 or partitions & (partitions - 1):
+            raise ValueError("`partitions` must be a power of 2.")
+        self.memory_bytes = memory_bytes
+        self.spill_dir = spill_dir
+        self.partitions = partitions
+        self._bits = partitions.bit_length() - 1
+        self._buffers: List[np.ndarray] = []
+        self._buffered = 0
+        self._dir: Optional[Path] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __enter__(self) -> "UniqueIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def spilled(self) -> bool:
+        return self._dir is not None
+
+    def add(self, s: pd.Series, rows: Union[np.ndarray, Sequence[int], None] = None,
+            part: Union[int, np.ndarray] = 0) -> None:
+        """Registra as chaves de `s`; `rows` padrão: as posições 0..n-1 a partir do total já indexado."""
+        records = np.empty(len(s), dtype=RECORD)
+        records["hash"] = hash_keys(s)
+        records["part"] = part
+        records["row"] = np.arange(self._size, self._size + len(s)) if rows is None else rows
+        self._size += len(s)
+        self._buffers.append(records)
+        self._buffered += records.nbytes
+        if self._buffered > self.memory_bytes:
+            self._spill()
+
+    def duplicates(self, fetch: Callable[[np.ndarray, np.ndarray], Sequence]) -> List[DuplicateKey]:
+        """
+        Valores que aparecem em mais de uma linha. `fetch(parts, rows)` devolve
+        os valores dessas linhas (só as candidatas: hashes repetidos), na
+        mesma ordem; linhas com o mesmo hash e valores diferentes (colisão)
+        são separadas. Ordem: pela primeira linha de cada valor.
+        """
+        candidates = [self._repeated(records) for records in self._partitions()]
+        candidates = [c for c in candidates if len(c)]
+        if not candidates:
+            return []
+        records = np.concatenate(candidates)
+        records = records[np.lexsort((records["row"], records["part"]))]
+        frame = pd.DataFrame({"hash": records["hash"], "value": list(fetch(records["part"], records["row"]))})
+        groups = frame.groupby(["hash", "value"], sort=False, dropna=False).indices
+        found = []
+        for (_, value), positions in groups.items():
+            if len(positions) > 1:
+                found.append(DuplicateKey(value, records["part"][positions], records["row"][positions]))
+        found.sort(key=lambda d: (d.parts[0], d.rows[0]))
+        return found
+
+    def lookup(self, s: pd.Series, verify: Optional[Callable[[np.ndarray, np.ndarray], Sequence]] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Para cada valor de `s`, a parte e a linha da primeira ocorrência da
+        chave no índice (-1 e -1 se ausente). Com `verify(parts, rows)` (os
+        valores indexados dessas linhas), um hash igual com valor diferente
+        conta como ausente: a consulta fica exata.
+        """
+        hashes = hash_keys(s)
+        parts = np.full(len(s), -1, dtype=np.int32)
+        rows = np.full(len(s), -1, dtype=np.int64)
+        for p, records in enumerate(self._partitions()):
+            query = np.flatnonzero(self._partition_of(hashes) == p) if self.spilled else np.arange(len(s))
+            if not len(query) or not len(records):
+                continue
+            # estável: entre hashes iguais, a primeira ocorrência vem antes
+            records = records[np.argsort(records["hash"], kind="stable")]
+            at = np.searchsorted(records["hash"], hashes[query])
+            hit = at < len(records)
+            hit[hit] = records["hash"][at[hit]] == hashes[query][hit]
+            parts[query[hit]] = records["part"][at[hit]]
+            rows[query[hit]] = records["row"][at[hit]]
+        if verify is not None:
+            found = np.flatnonzero(rows >= 0)
+            if len(found):
+                indexed = np.asarray(list(verify(parts[found], rows[found])), dtype=object)
+                queried = np.asarray(s.iloc[found].tolist(), dtype=object)
+                na_indexed, na_queried = pd.isna(indexed), pd.isna(queried)
+                same = na_indexed & na_queried
+                valid = ~na_indexed & ~na_queried
+                same[valid] = indexed[valid] == queried[valid]
+                parts[found[~same]] = -1
+                rows[found[~same]] = -1
+        return parts, rows
+
+    def contains(self, s: pd.Series, verify: Optional[Callable[[np.ndarray, np.ndarray], Sequence]] = None
+                 ) -> np.ndarray:
+        return self.lookup(s, verify)[1] >= 0
+
+    def close(self) -> None:
+        """Apaga as partições em disco (o índice fica vazio)."""
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+        self._buffers, self._buffered, self._size = [], 0, 0
+
+    def _partition_of(self, hashes: np.ndarray) -> np.ndarray:
+        if not self._bits:
+            return np.zeros(len(hashes), dtype=np.int64)
+        return (hashes >> np.uint64(64 - self._bits)).astype(np.int64)
+
+    def _spill(self) -> None:
+        if not self._buffers:
+            return
+        if self._dir is None:
+            if self.spill_dir is not None:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._dir = Path(tempfile.mkdtemp(prefix="unique-", dir=self.spill_dir))
+        records = np.concatenate(self._buffers)
+        self._buffers, self._buffered = [], 0
+        part = self._partition_of(records["hash"])
+        order = np.argsort(part, kind="stable")
+        records, part = records[order], part[order]
+        bounds = np.searchsorted(part, np.arange(self.partitions + 1))
+        for p in range(self.partitions):
+            if bounds[p] < bounds[p + 1]:
+                with open(self._dir / f"part-{p:03d}.bin", "ab") as fh:
+                    records[bounds[p]:bounds[p + 1]].tofile(fh)
+
+    def _partitions(self) -> Iterator[np.ndarray]:
+        """Os registros partição a partição (em memória, uma partição só), na ordem de inserção."""
+        if not self.spilled:
+            yield np.concatenate(self._buffers) if self._buffers else np.empty(0, dtype=RECORD)
+            return
+        self._spill()
+        for p in range(self.partitions):
+            path = self._dir / f"part-{p:03d}.bin"
+            yield np.fromfile(path, dtype=RECORD) if path.exists() else np.empty(0, dtype=RECORD)
+
+    @staticmethod
+    def _repeated(records: np.ndarray) -> np.ndarray:
+        """Registros cujo hash aparece mais de uma vez."""
+        if len(records) < 2:
+            return records[:0]
+        _, inverse, counts = np.unique(records["hash"], return_inverse=True, return_counts=True)
+        return records[counts[inverse] > 1]
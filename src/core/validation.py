@@ -0,0 +1,285 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import unicodedata
+import numpy as np
+import pandas as pd
+from core.unique_index import DEFAULT_MEMORY_BYTES, UniqueIndex
+from models.column_definition import ColumnDefinition
+from models.input_definition import InputDefinition
+
+# quantas linhas de exemplo guardar por violação
+SAMPLE_SIZE = 10
+
+# Regra `alphabetic`: texto legível (letras, números, marcas/acentos,
+# pontuação comum, símbolos e espaços), o mesmo conjunto da regex
+# ^[\p{L}\p{N}\p{M}\p{Po}\p{Pd}\p{Pc}\p{Sk}\p{Sm}\p{Sc}\s]+$ de config/csv_loader.py
+_READABLE_CATEGORIES = {"Po", "Pd", "Pc", "Sk", "Sm", "Sc"}
+# a mesma regra como regex RE2 (pyarrow.compute, motor arrow): o \s do RE2 é só
+# ASCII, então os espaços do str.isspace entram explícitos (\p{Z} e controles)
+_READABLE_PATTERN = (r"^[\p{L}\p{N}\p{M}\p{Po}\p{Pd}\p{Pc}\p{Sk}\p{Sm}\p{Sc}"
+                     r"\p{Z}\t\n\x0b\x0c\r\x1c-\x1f\x85]+$")
+
+
+@lru_cache(maxsize=None)
+def _readable_char(ch: str) -> bool:
+    cat = unicodedata.category(ch)
+    return cat[0] in "LNM" or cat in _READABLE_CATEGORIES or ch.isspace()
+
+def _readable(text: str) -> bool:
+    return bool(text) and all(_readable_char(ch) for ch in text)
+
+def _text(v) -> str:
+    return "" if pd.isna(v) else str(v)
+
+def _arrow_strings(s: pd.Series):
+    """O array Arrow de uma coluna de texto apoiada em Arrow (sem cópia); None para as demais."""
+    if not isinstance(s.array, pd.arrays.ArrowStringArray):
+        return None
+    import pyarrow as pa
+    return pa.array(s.array)
+
+
+@dataclass
+class ColumnViolation:
+    column: str
+    rule: str  # "nullable" | "unique" | "type" | "alphabetic"
+    message: str
+    count: int
+    sample_lines: List[int] = field(default_factory=list)  # linha no arquivo (1-based, conta o cabeçalho)
+    sample_values: List[str] = field(default_factory=list)
+    # inputs em várias partes: arquivo de cada linha de `sample_lines`
+    sample_files: List[str] = field(default_factory=list)
+    # regra "unique": cada valor repetido, com o total de linhas e onde aparece
+    duplicates: List[dict] = field(default_factory=list)
+
+    def merge(self, other: "ColumnViolation") -> None:
+        self.count += other.count
+        self.sample_lines = (self.sample_lines + other.sample_lines)[:SAMPLE_SIZE]
+        self.sample_values = (self.sample_values + other.sample_values)[:SAMPLE_SIZE]
+        self.sample_files = (self.sample_files + other.sample_files)[:SAMPLE_SIZE]
+        self.duplicates = (self.duplicates + other.duplicates)[:SAMPLE_SIZE]
+
+    @property
+    def locations(self) -> List:
+        if not self.sample_files:
+            return self.sample_lines
+        return [f"{f}:{line}" for f, line in zip(self.sample_files, self.sample_lines)]
+
+
+@dataclass
+class ValidationReport:
+    input_id: str
+    rows_checked: int = 0
+    violations: List[ColumnViolation] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    def merge(self, other: "ValidationReport") -> None:
+        """Soma o relatório de outro bloco do mesmo input."""
+        self.rows_checked += other.rows_checked
+        index = {(v.column, v.rule): v for v in self.violations}
+        for v in other.violations:
+            if (v.column, v.rule) in index:
+                index[(v.column, v.rule)].merge(v)
+            else:
+                self.violations.append(v)
+                index[(v.column, v.rule)] = v
+
+    def set_file(self, file_name: str) -> None:
+        """Marca as amostras ainda sem arquivo como vindas de `file_name` (parte de um input)."""
+        for v in self.violations:
+            if not v.sample_files:
+                v.sample_files = [file_name] * len(v.sample_lines)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        lines = [f"Input '{self.input_id}': {len(self.violations)} violation(s) in {self.rows_checked} rows"]
+        for v in self.violations:
+            lines.append(f"  - {v.message} [{v.count} row(s); lines {v.locations}]")
+        return "\n".join(lines)
+
+
+class ValidationError(ValueError):
+    def __init__(self, report: ValidationReport):
+        super().__init__(report.summary())
+        self.report = report
+
+
+# (partes, linhas) do índice -> (linhas no arquivo, arquivos ou None)
+Locate = Callable[[np.ndarray, np.ndarray], Tuple[Sequence[int], Optional[Sequence[str]]]]
+
+
+class Validator:
+    """
+    Valida todas as colunas de uma vez (nulidade, unicidade, tipo e a regra
+    `alphabetic`) e acumula todas as violações em um ValidationReport, em vez
+    de parar na primeira. Colunas são independentes e checadas em paralelo.
+    A unicidade usa um UniqueIndex por coluna, com até `unique_memory_bytes`
+    em memória (o resto em `spill_dir`, ou no diretório temporário).
+    Com o motor arrow, nulidade e a regra `alphabetic` das colunas de texto
+    apoiadas em Arrow rodam nos kernels do pyarrow.compute (is_null e regex
+    RE2, sem passar valor a valor pelo Python); as demais colunas, e tudo no
+    motor pandas, usam pandas. A tabela Unicode do RE2 pode ser mais nova
+    que a do Python: só difere em caracteres que o Python ainda não conhece.
+    """
+    def __init__(self, max_workers: int = 4, unique_memory_bytes: int = DEFAULT_MEMORY_BYTES,
+                 spill_dir: Optional[Path] = None):
+        self.max_workers = max_workers
+        self.unique_memory_bytes = unique_memory_bytes
+        self.spill_dir = spill_dir
+
+    def unique_index(self) -> UniqueIndex:
+        return UniqueIndex(self.unique_memory_bytes, self.spill_dir)
+
+    def validate(self, df: pd.DataFrame, definition: InputDefinition,
+                 invalid: Dict[str, pd.Series], unique: bool = True, engine: str = "pandas") -> ValidationReport:
+        """
+        `invalid`: por coluna, os valores brutos (indexados pela linha) que não
+        converteram para o tipo declarado (ver CSVLoader._apply_types).
+        `unique=False` pula a unicidade (checada depois entre blocos ou partes,
+        ver `unique_violation`). `engine`: motor que leu o frame ("arrow" liga
+        os kernels do pyarrow.compute).
+        """
+        line_offset = 2 if definition.has_headers else 1
+        report = ValidationReport(definition.id, rows_checked=len(df))
+
+        def check(col_def: ColumnDefinition) -> List[ColumnViolation]:
+            return self._check_column(df[col_def.name], col_def, definition, invalid.get(col_def.name),
+                                      line_offset, unique, arrow=engine == "arrow")
+
+        # só as colunas lidas (projeção) são validadas
+        col_defs = [c for c in definition.columns if c.name in df.columns]
+        if self.max_workers > 1 and len(col_defs) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(check, col_defs))
+        else:
+            results = [check(c) for c in col_defs]
+        for violations in results:
+            report.violations.extend(violations)
+        return report
+
+    def validate_unique(self, df: pd.DataFrame, definition: InputDefinition, lines: np.ndarray,
+                        files: pd.Series) -> ValidationReport:
+        """
+        Unicidade das colunas `allow_duplicates: false` no input já concatenado
+        a partir das partes: `lines` e `files` dão, por posição, a linha e o
+        arquivo de origem de cada linha. O relatório traz só as violações (as
+        linhas já foram contadas na validação de cada parte).
+        """
+        report = ValidationReport(definition.id)
+        for col_def in definition.columns:
+            if col_def.allow_duplicates or col_def.name not in df.columns:
+                continue
+            violation = self._frame_unique(df[col_def.name], col_def,
+                                           lambda _, rows: (lines[rows], files.iloc[rows].tolist()))
+            if violation is not None:
+                report.violations.append(violation)
+        return report
+
+    def unique_violation(self, col_def: ColumnDefinition, index: UniqueIndex,
+                         fetch: Callable[[np.ndarray, np.ndarray], Sequence],
+                         locate: Locate) -> Optional[ColumnViolation]:
+        """
+        Violação de unicidade a partir do índice da coluna. `fetch` devolve os
+        valores das linhas candidatas (ver UniqueIndex.duplicates) e `locate`
+        a linha no arquivo e o arquivo de cada uma. Todas as ocorrências de um
+        valor repetido contam, inclusive a primeira.
+        """
+        dups = index.duplicates(fetch)
+        if not dups:
+            return None
+        parts = np.concatenate([d.parts for d in dups])
+        rows = np.concatenate([d.rows for d in dups])
+        values = np.concatenate([np.full(d.count, i) for i, d in enumerate(dups)])
+        sample = np.lexsort((rows, parts))[:SAMPLE_SIZE]
+        lines, files = locate(parts[sample], rows[sample])
+        duplicates = []
+        for d in dups[:SAMPLE_SIZE]:
+            d_lines, d_files = locate(d.parts[:SAMPLE_SIZE], d.rows[:SAMPLE_SIZE])
+            duplicates.append({
+                "value": _text(d.value), "count": d.count,
+                "lines": [f"{f}:{line}" for f, line in zip(d_files, d_lines)] if d_files is not None
+                         else [int(line) for line in d_lines],
+            })
+        return ColumnViolation(
+            column=col_def.name, rule="unique",
+            message=f"Column '{col_def.name}' contains duplicates and does not allow them.",
+            count=len(rows),
+            sample_lines=[int(line) for line in lines],
+            sample_values=[_text(dups[i].value) for i in values[sample]],
+            sample_files=[str(f) for f in files] if files is not None else [],
+            duplicates=duplicates,
+        )
+
+    def _frame_unique(self, s: pd.Series, col_def: ColumnDefinition, locate: Locate) -> Optional[ColumnViolation]:
+        """Unicidade de uma coluna inteira em memória (linhas do índice = posições em `s`)."""
+        with self.unique_index() as index:
+            index.add(s)
+            return self.unique_violation(col_def, index, lambda _, rows: s.iloc[rows].tolist(), locate)
+
+    @staticmethod
+    def _violation(col_def: ColumnDefinition, rule: str, message: str, hits: pd.Series,
+                   line_offset: int) -> Optional[ColumnViolation]:
+        """`hits`: os valores (brutos) das linhas que violam a regra."""
+        if hits.empty:
+            return None
+        sample = hits.head(SAMPLE_SIZE)
+        return ColumnViolation(
+            column=col_def.name, rule=rule, message=message, count=len(hits),
+            sample_lines=[int(i) + line_offset for i in sample.index],
+            sample_values=[_text(v) for v in sample],
+        )
+
+    def _check_column(self, s: pd.Series, col_def: ColumnDefinition, definition: InputDefinition,
+                      bad: Optional[pd.Series], line_offset: int,
+                      unique: bool = True, arrow: bool = False) -> List[ColumnViolation]:
+        found: List[Optional[ColumnViolation]] = []
+        arr = _arrow_strings(s) if arrow else None
+
+        if not col_def.nullable:
+            nulls = s.isna().to_numpy() if arr is None else arr.is_null().to_numpy(zero_copy_only=False)
+            if bad is not None:
+                # valor inválido também vira nulo ao tipar: ele é reportado como tipo, não nulidade
+                nulls = nulls & ~s.index.isin(bad.index)
+            found.append(self._violation(col_def, "nullable", f"Column '{col_def.name}' contains nulls but is not nullable.",
+                                         s[nulls], line_offset))
+
+        if unique and not col_def.allow_duplicates:
+            found.append(self._frame_unique(s, col_def,
+                                            lambda _, rows: (s.index[rows] + line_offset, None)))
+
+        if col_def.type in ("integer", "numeric", "date"):
+            if bad is not None:
+                message = {
+                    "integer": f"Column '{col_def.name}' must contain only integers.",
+                    "numeric": f"Column '{col_def.name}' must be numeric.",
+                    "date": f"Column '{col_def.name}' must follow date format {definition.date_format}.",
+                }[col_def.type]
+                found.append(self._violation(col_def, "type", message, bad, line_offset))
+        elif col_def.type == "alphabetic":
+            if arr is not None:
+                import pyarrow.compute as pc
+                readable = pc.fill_null(pc.match_substring_regex(arr, _READABLE_PATTERN), True)
+                unreadable = pc.invert(readable).to_numpy(zero_copy_only=False)
+            else:
+                # a regra roda uma vez por valor distinto e o resultado volta para as linhas
+                codes, uniques = pd.factorize(s)
+                readable = np.array([_readable(str(u)) for u in uniques], dtype=bool)
+                unreadable = ((codes >= 0) & ~readable[np.maximum(codes, 0)] if len(uniques)
+                              else np.zeros(len(s), bool))
+            found.append(self._violation(col_def, "alphabetic",
+                                         f"Column '{col_def.name}' must contain readable text "
+                                         "(letters, numbers, accents, spaces, symbols).",
+                                         s[unreadable], line_offset))
+        else:
+            raise ValueError(f"Unknown column type '{col_def.type}' for column '{col_def.name}'.")
+
+        return [v for v in found if v is not None]
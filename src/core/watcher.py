@@ -0,0 +1,263 @@
+import dataclasses
+import importlib
+import importlib.util
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from threading import Event
+from typing import Deque, Dict, List, Optional, Tuple
+from core.csv_loader import CSVLoader
+from core.file_manager import FileManager
+from core.fingerprint import definition_digest, module_digest
+from core.lookup import tables_digest
+from core.output_state import OutputState
+from core.pipeline import InputPlan, OutputResult, RunPlanner
+from core.scheduler import Job, JobResult, RunSettings, format_report, run_job
+from models.input_definition import InputDefinition
+from models.output_definition import OutputDefinition
+
+# intervalo entre varreduras de data/incoming e da config
+POLL_SECONDS = 2.0
+# um arquivo está completo quando tamanho e data de modificação não mudam por este tempo
+STABLE_SECONDS = 5.0
+
+# (caminho, tamanho, mtime) de cada arquivo
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+class Watcher:
+    """
+    Modo contínuo (--watch): um processo que fica de pé, com definições,
+    processors e tabelas de consulta carregados, e vigia `data_in` por
+    varredura a cada `poll_seconds`. Quando os arquivos de um input mudam e
+    ficam estáveis por `stable_seconds` (e podem ser abertos), um job roda só
+    os outputs daquele input. Os jobs vão para uma fila e até `workers` rodam
+    ao mesmo tempo (em threads do próprio processo: nada é recarregado);
+    o mesmo input nunca roda duas vezes ao mesmo tempo.
+
+    Mudanças na config (manifest, definições, processors) são recarregadas
+    quando nenhum job está rodando; os inputs cujo plano mudou (definição do
+    input, dos outputs, processor ou tabelas de consulta) entram na fila.
+    Na partida, os inputs presentes são processados uma vez. Sem `as_of`,
+    cada job usa a data do dia em que roda. Com `state`, outputs sem mudança
+    desde a última geração são pulados (ex.: na partida), salvo com `force`.
+    """
+    def __init__(self, settings: RunSettings, workers: int = 1, as_of: Optional[str] = None,
+                 poll_seconds: float = POLL_SECONDS, stable_seconds: float = STABLE_SECONDS,
+                 state: Optional[OutputState] = None, force: bool = False):
+        self.settings = settings
+        self.workers = max(1, workers)
+        self.as_of = as_of
+        self.poll_seconds = poll_seconds
+        self.stable_seconds = stable_seconds
+        self.state = state
+        self.force = force
+        self.loader = CSVLoader(data_dir=settings.data_in)
+        self.inputs_map: Dict[str, InputDefinition] = {}
+        self.outputs: List[OutputDefinition] = []
+        self.plans: Dict[str, InputPlan] = {}
+        self._digests: Dict[str, str] = {}
+        self._modules: Dict[str, str] = {}
+        self._config_signature: Optional[Signature] = None
+        self._reload_pending = False
+        # último estado processado, estado em observação (desde quando) e fila
+        self._done: Dict[str, Signature] = {}
+        self._changing: Dict[str, Tuple[Signature, float]] = {}
+        self._queue: Deque[str] = deque()
+        self._running: Dict[str, Future] = {}
+        # por input em execução: ordem dos outputs, outputs pulados e fingerprints dos que rodam
+        self._skipped: Dict[str, Tuple[List[str], List[OutputResult], Dict[str, str]]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.results: List[JobResult] = []
+
+    def run(self, stop: Optional[Event] = None) -> None:
+        """Vigia até `stop` (ou Ctrl+C); espera os jobs em execução antes de sair."""
+        stop = stop or Event()
+        self._load_config()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch")
+        print(f"[WATCH] Watching {self.settings.data_in} ({len(self.plans)} input(s), "
+              f"{self.workers} worker(s)); Ctrl+C to stop")
+        try:
+            while not stop.is_set():
+                self.poll()
+                stop.wait(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("[WATCH] Stopping: waiting for running jobs")
+        finally:
+            self._pool.shutdown(wait=True)
+            self._collect()
+
+    def poll(self) -> None:
+        """Uma varredura: recolhe jobs terminados, confere a config e os inputs, dispara a fila."""
+        self._collect()
+        signature = self._config_files_signature()
+        if signature != self._config_signature:
+            self._config_signature = signature
+            self._reload_pending = True
+        if self._reload_pending:
+            if self._running:
+                return  # recarrega com a fila parada, sem job usando as definições antigas
+            self._reload()
+        now = time.monotonic()
+        for input_id, idef in self.inputs_map.items():
+            if input_id not in self.plans:
+                continue  # input sem outputs
+            current = self._input_signature(idef)
+            if current is None or current == self._done.get(input_id):
+                self._changing.pop(input_id, None)
+                continue
+            seen = self._changing.get(input_id)
+            if seen is None or seen[0] != current:
+                self._changing[input_id] = (current, now)
+            elif now - seen[1] >= self.stable_seconds and self._openable(current):
+                del self._changing[input_id]
+                self._done[input_id] = current
+                self._enqueue(input_id, f"{len(current)} file(s) changed")
+        self._dispatch()
+
+    def _enqueue(self, input_id: str, reason: str) -> None:
+        if input_id not in self._queue:
+            self._queue.append(input_id)
+            print(f"[WATCH] Queued '{input_id}' ({reason})")
+
+    def _dispatch(self) -> None:
+        for input_id in list(self._queue):
+            if len(self._running) >= self.workers:
+                break
+            if input_id in self._running:
+                continue  # roda de novo quando o job atual terminar
+            self._queue.remove(input_id)
+            plan = self.plans.get(input_id)
+            if plan is None:
+                continue  # removido da config
+            settings = dataclasses.replace(self.settings, as_of=self.as_of or str(date.today()))
+            order, skipped, prints = [o.id for o in plan.outputs], [], {}
+            if self.state is not None:
+                plan, skipped, prints = self.state.split(plan, self.loader, settings.data_out, settings.as_of,
+                                                         force=self.force)
+                if not plan.outputs:
+                    print(f"[SKIP] '{input_id}': outputs unchanged")
+                    self.results.append(JobResult(input_id, skipped))
+                    self.state.save()  # digests dos arquivos novos
+                    continue
+            self._skipped[input_id] = (order, skipped, prints)
+            job = Job(input_id, tuple(o.id for o in plan.outputs))
+            definitions = (self.inputs_map, self.outputs)
+            self._running[input_id] = self._pool.submit(run_job, settings, job, definitions)
+
+    def _collect(self) -> None:
+        for input_id, future in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[input_id]
+            result = future.result()
+            order, skipped, prints = self._skipped.pop(input_id, ([], [], {}))
+            if self.state is not None:
+                self.state.record(result.outputs, prints)
+                self.state.save()
+            if skipped:
+                result.outputs = sorted(skipped + result.outputs, key=lambda res: order.index(res.output_id))
+            self.results.append(result)
+            print(format_report([result]))
+
+    def _load_config(self) -> None:
+        self.inputs_map, self.outputs = FileManager(config_dir=self.settings.config_dir).load_all()
+        self._config_signature = self._config_files_signature()
+        self.plans = {p.input_def.id: p for p in RunPlanner().plan(self.inputs_map, self.outputs)}
+        self._digests = {input_id: self._plan_digest(plan) for input_id, plan in self.plans.items()}
+        self._modules = {}
+        for odef in self.outputs:
+            try:
+                self._modules[odef.processor_module] = module_digest(odef.processor_module)
+            except ModuleNotFoundError:
+                pass
+
+    def _reload(self) -> None:
+        self._reload_pending = False
+        old = self._digests
+        reloaded = self._reload_processors()
+        try:
+            self._load_config()
+        except Exception as e:
+            # config com erro: segue com a anterior até o próximo salvamento
+            print(f"[ERROR] Config reload failed, keeping the previous one: {type(e).__name__}: {e}")
+            return
+        print(f"[WATCH] Config reloaded ({len(self.plans)} input(s)"
+              + (f"; processors: {', '.join(reloaded)}" if reloaded else "") + ")")
+        for input_id, digest in self._digests.items():
+            if input_id in old and old[input_id] != digest and input_id in self._done:
+                self._enqueue(input_id, "definitions changed")
+
+    def _reload_processors(self) -> List[str]:
+        """Recarrega os processors já importados cujo código mudou."""
+        reloaded = []
+        for name, digest in self._modules.items():
+            module = sys.modules.get(name)
+            if module is None:
+                continue  # ainda não importado: o próximo job importa a versão nova
+            try:
+                if module_digest(name) != digest:
+                    importlib.reload(module)
+                    reloaded.append(name)
+            except Exception as e:
+                print(f"[ERROR] Reloading processor '{name}' failed: {type(e).__name__}: {e}")
+        return reloaded
+
+    def _plan_digest(self, plan: InputPlan) -> str:
+        parts = [definition_digest(plan.input_def), tables_digest()]
+        for odef in plan.outputs:
+            parts.append(definition_digest(odef))
+            try:
+                parts.append(module_digest(odef.processor_module))
+            except ModuleNotFoundError:
+                parts.append("")  # o job falha e reporta o processor ausente
+        return "-".join(parts)
+
+    def _config_files_signature(self) -> Signature:
+        config_dir = self.settings.config_dir
+        paths = [config_dir / "manifest.json"]
+        try:
+            manifest = json.loads(paths[0].read_text(encoding="utf-8"))
+            for section in ("inputs", "lookups", "outputs"):
+                paths += [config_dir / item["description_file"] for item in manifest.get(section, [])]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # manifest ausente ou sendo salvo: entra só ele na assinatura
+        for odef in self.outputs:
+            spec = importlib.util.find_spec(odef.processor_module)
+            if spec is not None and spec.origin:
+                paths.append(Path(spec.origin))
+        return _signature(paths)
+
+    def _input_signature(self, idef: InputDefinition) -> Optional[Signature]:
+        try:
+            return _signature(self.loader.csv_paths(idef), missing_ok=False)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _openable(signature: Signature) -> bool:
+        """No Windows, um arquivo ainda sendo copiado não abre para leitura."""
+        for path, _, _ in signature:
+            try:
+                with open(path, "rb"):
+                    pass
+            except OSError:
+                return False
+        return True
+
+
+def _signature(paths: List[Path], missing_ok: bool = True) -> Signature:
+    items = []
+    for path in paths:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            if not missing_ok:
+                raise
+            continue
+        items.append((str(path), st.st_size, st.st_mtime_ns))
+    return tuple(items)
@@ -1,15 +1,21 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 import json
 
 from .column_definition import ColumnDefinition
 
+_GLOB_CHARS = set("*?[")
+
+def is_glob(pattern: str) -> bool:
+    return any(ch in _GLOB_CHARS for ch in pattern)
+
 @dataclass(frozen=True)
 class InputDefinition:
     id: str
-    file_name: str
+    # um arquivo, um padrão glob ("serial_*.csv") ou uma lista deles
+    file_name: Union[str, Tuple[str, ...]]
     delimiter: str
     encoding: str
     has_headers: bool
@@ -17,6 +23,12 @@ class InputDefinition:
     thousands_separator: str
     date_format: str
     columns: List[ColumnDefinition] = field(default_factory=list)
+    # modo streaming: lê/valida/monta/exporta em blocos deste tamanho
+    chunk_rows: Optional[int] = None
+    # inputs em várias partes: coluna com o arquivo de origem de cada linha
+    source_file_column: str = "SOURCE_FILE"
+    # motor de leitura/escrita deste input ("pandas" | "arrow"); None = o da execução
+    engine: Optional[str] = None
 
     @staticmethod
     def _validate_payload(p: Dict[str, Any]) -> None:
@@ -25,6 +37,22 @@ class InputDefinition:
         miss = req - p.keys()
         if miss:
             raise ValueError(f"Missing keys in input definition: {sorted(miss)}")
+        file_name = p["file_name"]
+        if isinstance(file_name, list):
+            if not file_name or not all(isinstance(f, str) and f.strip() for f in file_name):
+                raise ValueError("`file_name` must be a file name, a glob pattern or a non-empty list of them.")
+        elif not isinstance(file_name, str) or not file_name.strip():
+            raise ValueError("`file_name` must be a file name, a glob pattern or a non-empty list of them.")
+        source_col = p.get("source_file_column", "SOURCE_FILE")
+        if not isinstance(source_col, str) or not source_col.strip():
+            raise ValueError("`source_file_column` must be a non-empty string.")
+        if source_col.lower() in {str(c.get("name", "")).lower() for c in p["columns"]}:
+            raise ValueError(f"`source_file_column` '{source_col}' clashes with a declared column.")
+        if p.get("engine") not in (None, "pandas", "arrow"):
+            raise ValueError("`engine` must be 'pandas' or 'arrow'.")
+        chunk_rows = p.get("chunk_rows")
+        if chunk_rows is not None and (not isinstance(chunk_rows, int) or chunk_rows < 1):
+            raise ValueError("`chunk_rows` must be a positive integer.")
 
     @staticmethod
     def _validate_columns(columns: List[ColumnDefinition]) -> None:
@@ -35,6 +63,20 @@ class InputDefinition:
         if len(set(names)) != len(names):
             raise ValueError("Duplicate column names (case-insensitive).")
 
+    @property
+    def file_patterns(self) -> Tuple[str, ...]:
+        return self.file_name if isinstance(self.file_name, tuple) else (self.file_name,)
+
+    @property
+    def is_multi_file(self) -> bool:
+        """Lista de arquivos ou padrão glob: o input é lido em partes e ganha `source_file_column`."""
+        return isinstance(self.file_name, tuple) or is_glob(self.file_name)
+
+    def unique_key(self) -> Optional[str]:
+        """Nome da única coluna não nula e sem duplicatas, se houver exatamente uma."""
+        keys = [c.name for c in self.columns if not c.allow_duplicates and not c.nullable]
+        return keys[0] if len(keys) == 1 else None
+
     @classmethod
     def from_dict(cls, p: Dict[str, Any]) -> "InputDefinition":
         cls._validate_payload(p)
@@ -42,14 +84,18 @@ class InputDefinition:
         cls._validate_columns(cols)
         return cls(
             id=p["id"].strip(),
-            file_name=p["file_name"].strip(),
+            file_name=(tuple(f.strip() for f in p["file_name"]) if isinstance(p["file_name"], list)
+                       else p["file_name"].strip()),
             delimiter=p["delimiter"],
             encoding=p["encoding"].strip(),
             has_headers=bool(p["has_headers"]),
             decimal_separator=p["decimal_separator"],
             thousands_separator=p["thousands_separator"],
             date_format=p["date_format"],
-            columns=cols
+            columns=cols,
+            chunk_rows=p.get("chunk_rows"),
+            source_file_column=p.get("source_file_column", "SOURCE_FILE").strip(),
+            engine=p.get("engine")
         )
 
     @classmethod
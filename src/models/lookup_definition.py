@@ -0,0 +1,57 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import List, Dict, Any
+from pathlib import Path
+import json
+
+@dataclass(frozen=True)
+class LookupDefinition:
+    """
+    Tabela de consulta declarada em config (ex.: preços). Cada linha traz um
+    valor para cada chave em `keys` e o valor da coluna `value`; chave `null`
+    numa linha vale para qualquer valor daquela chave. Combinações sem linha
+    correspondente resultam em `default`.
+    """
+    id: str
+    keys: List[str]
+    value: str
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    default: Any = None
+    description: str = ""
+
+    @staticmethod
+    def _validate_payload(p: Dict[str, Any]) -> None:
+        req = {"id", "keys", "value", "rows"}
+        miss = req - p.keys()
+        if miss:
+            raise ValueError(f"Missing keys in lookup definition: {sorted(miss)}")
+        keys = p["keys"]
+        if not isinstance(keys, list) or not keys or len(set(keys)) != len(keys):
+            raise ValueError("Lookup `keys` must be a non-empty list of distinct column names.")
+        if p["value"] in keys:
+            raise ValueError("Lookup `value` cannot also be a key.")
+        if not isinstance(p["rows"], list):
+            raise ValueError("Lookup `rows` must be a list.")
+        for i, row in enumerate(p["rows"], start=1):
+            miss = set(keys) | {p["value"]}
+            miss -= row.keys()
+            if miss:
+                raise ValueError(f"Lookup '{p['id']}' row {i} is missing {sorted(miss)}.")
+
+    @classmethod
+    def from_dict(cls, p: Dict[str, Any]) -> "LookupDefinition":
+        cls._validate_payload(p)
+        return cls(
+            id=p["id"].strip(),
+            keys=list(p["keys"]),
+            value=p["value"],
+            rows=[dict(r) for r in p["rows"]],
+            default=p.get("default"),
+            description=p.get("description", "").strip()
+        )
+
+    @classmethod
+    def from_json_file(cls, path: str | Path) -> "LookupDefinition":
+        path = Path(path)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls.from_dict(data)
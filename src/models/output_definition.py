@@ -1,14 +1,31 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, Any, Optional, List
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 import json
 
+from .row_filter import RowFilter
+
+# formatos de saída, pela extensão reconhecida no nome do arquivo
+FORMATS = {"csv": ".csv", "csv.gz": ".csv.gz", "csv.zst": ".csv.zst", "parquet": ".parquet", "arrow": ".arrow"}
+TEXT_FORMATS = ("csv", "csv.gz", "csv.zst")
+# funções de agregação de um output `aggregate`
+AGGREGATE_FUNCTIONS = ("count", "sum", "min", "max", "distinct_count")
+
+def format_from_file_name(file_name: str) -> str:
+    """Formato implícito no nome do arquivo (o sufixo mais longo que casar); "csv" se nenhum casar."""
+    lower = file_name.lower()
+    matches = [fmt for fmt, ext in FORMATS.items() if lower.endswith(ext)]
+    return max(matches, key=len) if matches else "csv"
+
 @dataclass(frozen=True)
 class OutputColumn:
     name: str
     source: Optional[str] = None
     compute: Optional[str] = None
+    # colunas computadas (nomes do output) que esta usa: são calculadas antes
+    # e entregues à função compute como colunas extras do frame/linha
+    depends_on: Tuple[str, ...] = ()
 
     @classmethod
     def from_dict(cls, d: Dict[str, Any]) -> "OutputColumn":
@@ -18,7 +35,56 @@ class OutputColumn:
             raise ValueError("Output column must have either `source` or `compute`, not both.")
         if ("source" not in d) and ("compute" not in d):
             raise ValueError("Output column needs one of `source` or `compute`.")
-        return cls(name=d["name"], source=d.get("source"), compute=d.get("compute"))
+        deps = d.get("depends_on", [])
+        if deps and "compute" not in d:
+            raise ValueError(f"Output column '{d['name']}': `depends_on` requires `compute`.")
+        if not isinstance(deps, list) or not all(isinstance(x, str) for x in deps):
+            raise ValueError(f"Output column '{d['name']}': `depends_on` must be a list of column names.")
+        return cls(name=d["name"], source=d.get("source"), compute=d.get("compute"), depends_on=tuple(deps))
+
+@dataclass(frozen=True)
+class Measure:
+    """Uma coluna do resumo: `function` sobre `column` (count sem `column` conta as linhas)."""
+    name: str
+    function: str
+    column: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Measure":
+        if "name" not in d or "function" not in d:
+            raise ValueError("Aggregate measure requires `name` and `function`.")
+        if d["function"] not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Aggregate measure '{d['name']}': unknown function '{d['function']}' "
+                             f"(expected one of {', '.join(AGGREGATE_FUNCTIONS)}).")
+        if d["function"] != "count" and not d.get("column"):
+            raise ValueError(f"Aggregate measure '{d['name']}': function '{d['function']}' requires `column`.")
+        return cls(name=d["name"], function=d["function"], column=d.get("column"))
+
+@dataclass(frozen=True)
+class Aggregate:
+    """
+    Output de resumo: uma linha por combinação de `group_by` (nenhuma chave =
+    uma linha de totais) com as `measures`. Chaves e colunas das medidas são
+    colunas do próprio output (source ou compute).
+    """
+    group_by: Tuple[str, ...]
+    measures: Tuple[Measure, ...]
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], output_id: str, column_names: List[str]) -> "Aggregate":
+        group_by = d.get("group_by", [])
+        if not isinstance(group_by, list) or not all(isinstance(x, str) for x in group_by):
+            raise ValueError(f"Output '{output_id}': aggregate `group_by` must be a list of column names.")
+        if not isinstance(d.get("measures"), list) or not d["measures"]:
+            raise ValueError(f"Output '{output_id}': aggregate needs a non-empty `measures` list.")
+        measures = [Measure.from_dict(m) for m in d["measures"]]
+        for name in group_by + [m.column for m in measures if m.column]:
+            if name not in column_names:
+                raise ValueError(f"Output '{output_id}': aggregate uses unknown output column '{name}'.")
+        names = group_by + [m.name for m in measures]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Output '{output_id}': aggregate key and measure names must be distinct.")
+        return cls(group_by=tuple(group_by), measures=tuple(measures))
 
 @dataclass(frozen=True)
 class OutputDefinition:
@@ -29,6 +95,19 @@ class OutputDefinition:
     columns: List[OutputColumn]
     omit_unmapped: bool = True
     delimiter: str = ","
+    filters: List[RowFilter] = field(default_factory=list)
+    # reprocessa só as linhas inseridas/alteradas desde a última execução,
+    # usando como chave a coluna `allow_duplicates: false` do input
+    incremental: bool = False
+    # csv | csv.gz | csv.zst (texto formatado pelo tipo do input) ou
+    # parquet | arrow (colunares, tipos nativos); padrão: pela extensão do arquivo
+    format: str = "csv"
+    # output de resumo (group by + medidas) sobre as colunas montadas; None = linhas de detalhe
+    aggregate: Optional[Aggregate] = None
+
+    @property
+    def is_text(self) -> bool:
+        return self.format in TEXT_FORMATS
 
     @classmethod
     def from_dict(cls, d: Dict[str, Any]) -> "OutputDefinition":
@@ -37,6 +116,13 @@ class OutputDefinition:
         if miss:
             raise ValueError(f"Missing keys in output definition: {sorted(miss)}")
         cols = [OutputColumn.from_dict(c) for c in d["columns"]]
+        filters = [RowFilter.from_dict(f) for f in d.get("filters", [])]
+        fmt = d.get("format") or format_from_file_name(d["output_file_name"])
+        if fmt not in FORMATS:
+            raise ValueError(f"Output '{d['id']}': unknown format '{fmt}' (expected one of {', '.join(FORMATS)}).")
+        aggregate = d.get("aggregate")
+        if aggregate is not None:
+            aggregate = Aggregate.from_dict(aggregate, d["id"], [c.name for c in cols])
         return cls(
             id=d["id"].strip(),
             input_id=d["input_id"].strip(),
@@ -44,9 +130,41 @@ class OutputDefinition:
             processor_module=d["processor_module"],
             columns=cols,
             delimiter=d.get("delimiter", ",") ,
-            omit_unmapped=bool(d.get("omit_unmapped", True))
+            omit_unmapped=bool(d.get("omit_unmapped", True)),
+            filters=filters,
+            incremental=bool(d.get("incremental", False)),
+            format=fmt,
+            aggregate=aggregate
         )
 
+    def compute_order(self) -> List[OutputColumn]:
+        """
+        Colunas computadas em ordem de avaliação: cada uma depois das que
+        aparecem no seu `depends_on` (mantendo a ordem do arquivo entre as
+        independentes). Levanta ValueError para dependência desconhecida ou ciclo.
+        """
+        computed = {oc.name: oc for oc in self.columns if oc.compute}
+        for oc in computed.values():
+            for dep in oc.depends_on:
+                if dep not in computed:
+                    raise ValueError(
+                        f"Output '{self.id}': column '{oc.name}' depends on '{dep}', which is not a computed column."
+                    )
+
+        order: List[OutputColumn] = []
+        done: set = set()
+        pending = list(computed.values())
+        while pending:
+            ready = [oc for oc in pending if all(dep in done for dep in oc.depends_on)]
+            if not ready:
+                cycle = ", ".join(oc.name for oc in pending)
+                raise ValueError(f"Output '{self.id}': dependency cycle among computed columns: {cycle}")
+            for oc in ready:
+                order.append(oc)
+                done.add(oc.name)
+            pending = [oc for oc in pending if oc.name not in done]
+        return order
+
     @classmethod
     def from_json_file(cls, path: str | Path) -> "OutputDefinition":
         path = Path(path)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Literal, Dict, Any, Tuple
+
+FilterOp = Literal["eq", "ne", "in", "not_in", "is_null", "not_null", "gt", "ge", "lt", "le"]
+
+_VALUE_OPS = {"eq", "ne", "gt", "ge", "lt", "le"}
+_LIST_OPS = {"in", "not_in"}
+_NULL_OPS = {"is_null", "not_null"}
+
+@dataclass(frozen=True)
+class RowFilter:
+    """
+    Filtro declarativo de linhas de um output. A linha é mantida quando
+    satisfaz todos os filtros do output.
+    """
+    column: str
+    op: FilterOp
+    values: Tuple[Any, ...] = ()
+
+    @staticmethod
+    def _validate_payload(p: Dict[str, Any]) -> None:
+        if "column" not in p or "op" not in p:
+            raise ValueError("Row filter requires `column` and `op`.")
+        op = p["op"]
+        if op in _LIST_OPS:
+            if not isinstance(p.get("values"), list):
+                raise ValueError(f"Row filter op '{op}' requires a `values` list.")
+        elif op in _VALUE_OPS:
+            if "value" not in p:
+                raise ValueError(f"Row filter op '{op}' requires `value`.")
+        elif op not in _NULL_OPS:
+            raise ValueError(f"Invalid row filter `op`: {op}")
+
+    @classmethod
+    def from_dict(cls, p: Dict[str, Any]) -> "RowFilter":
+        cls._validate_payload(p)
+        op = p["op"]
+        if op in _LIST_OPS:
+            values = tuple(p["values"])
+        elif op in _VALUE_OPS:
+            values = (p["value"],)
+        else:
+            values = ()
+        return cls(column=p["column"].strip(), op=op, values=values)
@@ -1,10 +1,18 @@
 from __future__ import annotations
-from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Optional
 import unicodedata
 
+import numpy as np
 import pandas as pd
 
+from core.compute import pure, reads, uses_context
+from core.lookup import get_table
+
+
+# Funções cujo resultado depende da data da execução: no modo incremental são
+# recalculadas para todas as linhas em toda execução.
+TIME_DEPENDENT = {"compute_situacao_serial"}
+
 
 # =============================================================================
 # Helpers gerais
@@ -33,21 +41,54 @@ def _norm_desc(val: Any) -> str:
     s = _strip_accents(s)  # "fácil" -> "facil"
     return f" {s} "  # bordas para facilitar match de ' pro '
 
+def _col(df: pd.DataFrame, *names: str) -> pd.Series:
+    # equivalente vetorizado de row.get(): primeira coluna existente ou tudo NaN
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return pd.Series(np.nan, index=df.index, dtype=object)
+
+def _dep(df: pd.DataFrame, name: str, fallback) -> np.ndarray:
+    # coluna computada recebida via `depends_on` (nome da coluna no output);
+    # sem ela (output que não declara a dependência), calcula de novo
+    return df[name].to_numpy() if name in df.columns else np.asarray(fallback(df))
+
+def _dep_row(row, name: str, fallback) -> Any:
+    # versão linha a linha de _dep
+    value = row.get(name)
+    return fallback(row) if value is None else value
+
+def _map_unique(s: pd.Series, fn) -> np.ndarray:
+    """
+    Aplica `fn` (regra escalar) uma vez por valor distinto de `s` e espalha o
+    resultado de volta para todas as linhas. NaN entra como um único valor.
+    """
+    codes, uniques = pd.factorize(s)
+    values = np.array([fn(u) for u in uniques] + [fn(np.nan)], dtype=object)
+    return values[codes]  # código -1 (NaN) aponta para o último elemento
+
 
 # =============================================================================
 # 1) TIPO_USUARIO
 # =============================================================================
+def _user_type(v: Any) -> str:
+    return "USUARIO FINAL" if pd.isna(v) or str(v).strip() == "" else "USUARIO DE REVENDA"
+
+@reads("RAZAO_SOCIAL_REVENDA")
 def compute_user_type(row) -> str:
     """
     USUARIO FINAL se RAZAO_SOCIAL_REVENDA estiver vazia/NaN; caso contrário USUARIO DE REVENDA.
     """
-    v = row.get("RAZAO_SOCIAL_REVENDA")
-    return "USUARIO FINAL" if pd.isna(v) or str(v).strip() == "" else "USUARIO DE REVENDA"
+    return _user_type(row.get("RAZAO_SOCIAL_REVENDA"))
+
+def compute_user_type_vec(df: pd.DataFrame) -> np.ndarray:
+    return _map_unique(_col(df, "RAZAO_SOCIAL_REVENDA"), _user_type)
 
 
 # =============================================================================
 # 2) ANO_MES_VCTO (YYYY/MM a partir de DATA_VENCIMENTO_SERIAL)
 # =============================================================================
+@reads("DATA_VENCIMENTO_SERIAL")
 def compute_ano_mes_vcto(row) -> Optional[str]:
     val = row.get("DATA_VENCIMENTO_SERIAL")
     if pd.isna(val) or str(val).strip() == "":
@@ -57,6 +98,12 @@ def compute_ano_mes_vcto(row) -> Optional[str]:
         return None
     return f"{ts.year:04d}/{ts.month:02d}"
 
+@uses_context
+def compute_ano_mes_vcto_vec(df: pd.DataFrame, ctx) -> np.ndarray:
+    ts = ctx.date("DATA_VENCIMENTO_SERIAL")
+    # formata cada mês distinto uma vez
+    return _map_unique(ts.dt.to_period("M"), lambda p: None if pd.isna(p) else p.strftime("%Y/%m"))
+
 
 # =============================================================================
 # 3) PRODUTO_CALCULADO (pela descrição)
@@ -101,6 +148,7 @@ def calcular_produto(desc: Any) -> str:
     else:
         return "Produto não encontrado"
 
+@pure("DESCRICAO_DO_PRODUTO", "Product description")
 def compute_produto(row) -> str:
     # O input traz "Product description"; o output renomeia para DESCRICAO_DO_PRODUTO.
     desc = row.get("Product description")
@@ -112,28 +160,41 @@ def compute_produto(row) -> str:
 # =============================================================================
 # 4) BRINDE: 'Sim' se DESCRICAO_DO_PRODUTO contiver 'brinde' (case-insensitive)
 # =============================================================================
+def _brinde(desc: Any) -> str:
+    if pd.isna(desc):
+        return "Não"
+    return "Sim" if "brinde" in str(desc).lower() else "Não"
+
+@pure("DESCRICAO_DO_PRODUTO", "Product description")
 def compute_brinde(row) -> str:
     desc = row.get("DESCRICAO_DO_PRODUTO")
     if desc is None:
         desc = row.get("Product description")
-    if pd.isna(desc):
-        return "Não"
-    return "Sim" if "brinde" in str(desc).lower() else "Não"
+    return _brinde(desc)
 
 
 # =============================================================================
 # 5) MENSAL: 'Sim' se PERIODICIDADE_DO_PRODUTO == '1'
 # =============================================================================
-def compute_mensal(row) -> str:
-    val = row.get("PERIODICIDADE_DO_PRODUTO")
+def _mensal(val: Any) -> str:
     return "Sim" if str(val).strip() == "1" else "Não"
 
+@reads("PERIODICIDADE_DO_PRODUTO")
+def compute_mensal(row) -> str:
+    return _mensal(row.get("PERIODICIDADE_DO_PRODUTO"))
+
+def compute_mensal_vec(df: pd.DataFrame) -> np.ndarray:
+    return _map_unique(_col(df, "PERIODICIDADE_DO_PRODUTO"), _mensal)
+
 
 # =============================================================================
 # 6) SITUACAO_SERIAL: ESTOQUE/ATIVO/VENCIDO
 # =============================================================================
-def compute_situacao_serial(row) -> str:
-    today = pd.to_datetime(datetime.today().strftime('%Y-%m-%d'))
+@reads("DATA_ATIVACAO_SERIAL", "DATA_VENCIMENTO_SERIAL")
+@uses_context
+def compute_situacao_serial(row, ctx) -> str:
+    # ctx.as_of: data de referência da execução (hoje, ou --as-of)
+    today = ctx.as_of
 
     ativ = row.get("DATA_ATIVACAO_SERIAL")
     if pd.isna(ativ):
@@ -145,57 +206,34 @@ def compute_situacao_serial(row) -> str:
         return "VENCIDO"
     return "ATIVO" if venc_dt > today else "VENCIDO"
 
+@uses_context
+def compute_situacao_serial_vec(df: pd.DataFrame, ctx) -> np.ndarray:
+    ativ = _col(df, "DATA_ATIVACAO_SERIAL")
+    venc_dt = ctx.date("DATA_VENCIMENTO_SERIAL")
+    return np.select(
+        [ativ.isna().to_numpy(), (venc_dt > ctx.as_of).to_numpy()],
+        ["ESTOQUE", "ATIVO"],
+        default="VENCIDO",
+    ).astype(object)
+
 
 # =============================================================================
 # 7) DELIVERY (mantido para o seu layout)
 # =============================================================================
+@reads("RAZAO_SOCIAL_REVENDA")
 def compute_delivery(row) -> str:
-    return "REVENDA" if compute_user_type(row) == "USUARIO DE REVENDA" else "DIRETO"
+    # depends_on: TIPO_USUARIO
+    return "REVENDA" if _dep_row(row, "TIPO_USUARIO", compute_user_type) == "USUARIO DE REVENDA" else "DIRETO"
+
+def compute_delivery_vec(df: pd.DataFrame) -> np.ndarray:
+    user_type = _dep(df, "TIPO_USUARIO", compute_user_type_vec)
+    return np.where(user_type == "USUARIO DE REVENDA", "REVENDA", "DIRETO").astype(object)
 
 
 # =============================================================================
-# 8) PREÇOS embutidos e cálculo (mensal divide por 10)
+# 8) PREÇOS: tabela config/lookups/precos_c4.json (mensal = anual / 10)
 # =============================================================================
-precos_final_c4: Dict[str, float] = {
-    'ClippPRO': 1669.00,
-    'Clipp MEI': 679.00,
-    'Clipp MEI CPF': 949.00,
-    'Clipp360': 949.00,
-    'ClippFacil': 679.00,
-    'ZWeb Essencial': 599.80,
-    'ZWeb Standard': 859.80,
-    'ZWeb Premium': 1319.80,
-    'Small Commerce': 0.0,
-    'Small Go': 0.0,
-}
-precos_revenda_c4: Dict[str, Dict[str, float]] = {
-    'ClippPRO':      {'bronze': 759.00, 'prata': 759.00, 'ouro': 659.00, 'ouro duplo': 639.00, 'diamante': 579.00, 'black': 569.00},
-    'Clipp MEI':     {'bronze': 349.00, 'prata': 349.00, 'ouro': 349.00, 'ouro duplo': 349.00, 'diamante': 349.00, 'black': 349.00},
-    'Clipp MEI CPF': {'bronze': 499.00, 'prata': 499.00, 'ouro': 499.00, 'ouro duplo': 499.00, 'diamante': 499.00, 'black': 499.00},
-    'Clipp360':      {'bronze': 539.00, 'prata': 539.00, 'ouro': 539.00, 'ouro duplo': 539.00, 'diamante': 539.00, 'black': 539.00},
-    'ClippFacil':    {'bronze': 409.00, 'prata': 409.00, 'ouro': 409.00, 'ouro duplo': 409.00, 'diamante': 409.00, 'black': 409.00},
-    'ZWeb Essencial':{'bronze': 299.90, 'prata': 299.90, 'ouro': 299.90, 'ouro duplo': 299.90, 'diamante': 299.90, 'black': 299.90},
-    'ZWeb Standard': {'bronze': 429.90, 'prata': 429.90, 'ouro': 429.90, 'ouro duplo': 429.90, 'diamante': 429.90, 'black': 429.90},
-    'ZWeb Premium':  {'bronze': 659.90, 'prata': 659.90, 'ouro': 659.90, 'ouro duplo': 659.90, 'diamante': 659.90, 'black': 659.90},
-    'Small Commerce':{'bronze': 0.0, 'prata': 0.0, 'ouro': 0.0, 'ouro duplo': 0.0, 'diamante': 0.0, 'black': 0.0},
-    'Small Go':      {'bronze': 0.0, 'prata': 0.0, 'ouro': 0.0, 'ouro duplo': 0.0, 'diamante': 0.0, 'black': 0.0},
-}
-# Cópias para "small" (como você pediu)
-precos_final_small = precos_final_c4.copy()
-precos_revenda_small = {k: v.copy() for k, v in precos_revenda_c4.items()}
-
-# Tabelas "mensais" (preço dividido por 10)
-def _divide_dict_values(d: Dict[str, float], div: float) -> Dict[str, float]:
-    return {k: (float(v) / div) for k, v in d.items()}
-
-def _divide_nested_dict_values(d: Dict[str, Dict[str, float]], div: float) -> Dict[str, Dict[str, float]]:
-    return {k: {kk: (float(vv) / div) for kk, vv in inner.items()} for k, inner in d.items()}
-
-precos_final_c4_mensal   = _divide_dict_values(precos_final_c4, 10.0)
-precos_revenda_c4_mensal = _divide_nested_dict_values(precos_revenda_c4, 10.0)
-
-precos_final_small_mensal   = _divide_dict_values(precos_final_small, 10.0)
-precos_revenda_small_mensal = _divide_nested_dict_values(precos_revenda_small, 10.0)
+PRICE_TABLE = "precos_c4"
 
 
 def _format_price_brl(value: float) -> str:
@@ -206,51 +244,36 @@ def _format_price_brl(value: float) -> str:
         return "0,00"
 
 
+@reads("DESCRICAO_DO_PRODUTO", "Product description", "PERIODICIDADE_DO_PRODUTO",
+       "RAZAO_SOCIAL_REVENDA", "CATEGORIA_REVENDA")
 def compute_preco(row) -> str:
     """
-    Regra:
-      - Produto calculado via compute_produto.
-      - MENSAL = 'Sim' => usar tabelas *_mensal (preço/10).
-      - TIPO_USUARIO:
-          * 'USUARIO FINAL'      => usar precos_final_*
-          * 'USUARIO DE REVENDA' => usar precos_revenda_* pela CATEGORIA_REVENDA
-      - Caso produto não exista na tabela => 0,00
-      - Caso categoria não exista => tenta match por lowercase; se não achar => 0,00
+    Regra (depends_on: PRODUTO_CALCULADO, MENSAL, TIPO_USUARIO):
+      - Preço na tabela PRICE_TABLE por (produto, tipo de usuário, categoria, mensal).
+      - 'USUARIO FINAL' tem um preço por produto (categoria não importa);
+        'USUARIO DE REVENDA' tem um preço por CATEGORIA_REVENDA (em minúsculas).
+      - Produto ou categoria fora da tabela => 0,00
     """
-    produto   = compute_produto(row)
-    mensal    = compute_mensal(row) == "Sim"
-    user_type = compute_user_type(row)
+    produto   = _dep_row(row, "PRODUTO_CALCULADO", compute_produto)
+    mensal    = _dep_row(row, "MENSAL", compute_mensal) == "Sim"
+    user_type = _dep_row(row, "TIPO_USUARIO", compute_user_type)
     categoria = _norm_cat(row.get("CATEGORIA_REVENDA"))
-
-    # Escolha da família de tabelas (c4 vs small)
-    # -> Pelo nome do produto: se começar com 'Small ' usa small, senão c4
-    is_small = produto.startswith("Small ")
-    if user_type == "USUARIO FINAL":
-        if mensal:
-            tabela = precos_final_small_mensal if is_small else precos_final_c4_mensal
-        else:
-            tabela = precos_final_small if is_small else precos_final_c4
-        preco = tabela.get(produto, 0.0)
-        return _format_price_brl(preco)
-
-    # USUARIO DE REVENDA
-    if mensal:
-        tabela = precos_revenda_small_mensal if is_small else precos_revenda_c4_mensal
-    else:
-        tabela = precos_revenda_small if is_small else precos_revenda_c4
-
-    cat_table = tabela.get(produto, {})
-    if not isinstance(cat_table, dict):
-        # caso algum produto seja número direto (não esperado aqui)
-        return _format_price_brl(cat_table)
-
-    # tenta categoria exata (lower)
-    if categoria in cat_table:
-        return _format_price_brl(cat_table[categoria])
-
-    # fallback: tenta por igualdade case-insensitive “solta”
-    for k, v in cat_table.items():
-        if _norm_cat(k) == categoria:
-            return _format_price_brl(v)
-
-    return _format_price_brl(0.0)
+    preco = get_table(PRICE_TABLE).get(produto=produto, tipo_usuario=user_type, categoria=categoria, mensal=mensal)
+    return _format_price_brl(preco)
+
+
+def compute_preco_vec(df: pd.DataFrame) -> np.ndarray:
+    # o preço só depende de (produto, mensal, tipo de usuário, categoria):
+    # uma consulta indexada por combinação distinta, espalhada pelas linhas
+    names = ["produto", "mensal", "tipo_usuario", "categoria"]
+    keys = pd.MultiIndex.from_arrays([
+        _dep(df, "PRODUTO_CALCULADO",
+             lambda d: _map_unique(_col(d, "Product description", "DESCRICAO_DO_PRODUTO"), calcular_produto)),
+        _dep(df, "MENSAL", compute_mensal_vec) == "Sim",
+        _dep(df, "TIPO_USUARIO", compute_user_type_vec),
+        _map_unique(_col(df, "CATEGORIA_REVENDA"), _norm_cat),
+    ])
+    codes, uniques = pd.factorize(keys)
+    precos = get_table(PRICE_TABLE).lookup(**{name: uniques.get_level_values(i) for i, name in enumerate(names)})
+    values = np.array([_format_price_brl(v) for v in precos], dtype=object)
+    return values[codes]
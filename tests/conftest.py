@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# os testes importam o projeto como o main.py: <raiz>/src no sys.path
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
@@ -0,0 +1,128 @@
+"""
+Formatação em bloco do Exporter (`_fmt_series` / `_fmt_*_block`) contra as
+regras escalares `_fmt_*_value`, que eram o formatador antes da versão
+vetorizada. A única diferença intencional: nulos de dtypes de extensão
+(pd.NA, NaT) viram "" em vez de "<NA>"/"NaT".
+"""
+import dataclasses
+import math
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.generator import SyntheticGenerator
+from core.exporter import Exporter, _fmt_date_value, _fmt_integer_value, _fmt_numeric_value
+from core.scheduler import Job, RunSettings, run_job
+from models.input_definition import InputDefinition
+
+ROOT = Path(__file__).resolve().parents[1]
+CONFIG = ROOT / "config"
+
+
+def _idef(**changes) -> InputDefinition:
+    idef = InputDefinition.from_json_file(CONFIG / "inputs" / "serial_number_c4.json")
+    return dataclasses.replace(idef, **changes)
+
+
+def _reference(self, s: pd.Series, col_type, idef: InputDefinition, passthrough: bool = False) -> pd.Series:
+    """
+    O formatador anterior: regra escalar valor a valor, com os nulos de
+    extensão vazios. Cada valor vai como objeto Python (`astype(object)`):
+    `Series.map` passaria os inteiros de um Int64 como float.
+    """
+    if col_type == "alphabetic":
+        return s.astype("string[python]").fillna("")
+    if col_type == "integer":
+        fn, args = _fmt_integer_value, ()
+    elif col_type == "numeric":
+        fn, args = _fmt_numeric_value, (idef.decimal_separator or ".", idef.thousands_separator or "")
+    elif col_type == "date":
+        fn, args = _fmt_date_value, (idef.date_format or "%Y-%m-%d",)
+    else:
+        return s
+    values = ["" if v is pd.NA or v is pd.NaT else fn(v, *args) for v in s.astype(object)]
+    return pd.Series(values, index=s.index, dtype="string[python]")
+
+
+COLUMNS = {
+    "int": pd.Series([0, 7, -3, 123456789, 7, 2 ** 53 + 1, -(2 ** 62)], dtype="int64"),
+    "float": pd.Series([1.0, 2.5, -0.125, np.nan, 1e21, 1234567.891, 2.5, -0.0, 0.005, np.inf]),
+    "Int64": pd.Series([1, None, -40, 1, 99999999999, None], dtype="Int64"),
+    "object": pd.Series(["12", "1.234,50", None, 3, 4.0, "abc", " 7.0 ", math.nan, "12"], dtype=object),
+    "datetime64": pd.Series(pd.to_datetime(["2024-01-31", None, "1999-12-01 13:45:00", "2024-01-31"], format="ISO8601")),
+    "object dates": pd.Series(["2024-02-29", "", None, datetime(2020, 5, 6), "not a date"], dtype=object),
+}
+SETTINGS = [
+    {"decimal_separator": ",", "thousands_separator": ".", "date_format": "%Y-%m-%d"},
+    {"decimal_separator": ".", "thousands_separator": ",", "date_format": "%d/%m/%Y"},
+    {"decimal_separator": ".", "thousands_separator": "", "date_format": "%Y%m%d %H:%M"},
+    {"decimal_separator": ",", "thousands_separator": " ", "date_format": "%d.%m.%y"},
+    {"decimal_separator": "", "thousands_separator": "e", "date_format": ""},
+]
+
+
+@pytest.mark.parametrize("settings", SETTINGS, ids=lambda s: "dec={decimal_separator!r} thou={thousands_separator!r} "
+                                                             "date={date_format!r}".format(**s))
+@pytest.mark.parametrize("col_type", ["integer", "numeric", "date", "alphabetic"])
+@pytest.mark.parametrize("column", list(COLUMNS))
+def test_block_matches_scalar_rules(column, col_type, settings):
+    s = COLUMNS[column]
+    if col_type == "date" and column in ("int", "float", "Int64"):
+        pytest.skip("números não são datas no input")
+    idef = _idef(**settings)
+    got = Exporter()._fmt_series(s, col_type, idef)
+    expected = _reference(None, s, col_type, idef)
+    assert got.dtype == "string[python]"
+    assert got.tolist() == expected.tolist()
+
+
+def test_extension_nulls_are_empty():
+    idef = _idef(thousands_separator="")
+    exporter = Exporter()
+    assert exporter._fmt_series(pd.Series([1, None], dtype="Int64"), "integer", idef).tolist() == ["1", ""]
+    assert exporter._fmt_series(pd.Series([1.5, None], dtype="Float64"), "numeric", idef).tolist() == ["1,50", ""]
+    assert exporter._fmt_series(pd.Series(pd.to_datetime(["2024-01-02", None])), "date", idef).tolist() == [
+        "2024-01-02", ""]
+
+
+def test_serial_number_c4_report_is_byte_identical(tmp_path, monkeypatch):
+    """O relatório completo, formatado em bloco e pelas regras escalares, sai idêntico byte a byte."""
+    idef = _idef()
+    data_in = tmp_path / "incoming"
+    SyntheticGenerator(idef, seed=7).write(data_in / idef.file_name, rows=5_000)
+    job = Job(idef.id, ("serial_number_c4_report_main",))
+
+    def run(out_dir: Path) -> bytes:
+        settings = RunSettings(config_dir=CONFIG, data_in=data_in, data_out=out_dir, as_of="2025-01-01")
+        result = run_job(settings, job)
+        assert result.error is None and all(res.ok for res in result.outputs)
+        return (out_dir / result.outputs[0].path.name).read_bytes()
+
+    block = run(tmp_path / "block")
+    monkeypatch.setattr(Exporter, "_fmt_series", _reference)
+    scalar = run(tmp_path / "scalar")
+    assert block.count(b"\n") == 5_001
+    assert block == scalar
+
+
+# modo compacto (--compact): os mesmos valores chegam como categoria ou em tipos menores
+COMPACT = {
+    "Int8": (pd.Series([1, None, -40, 1], dtype="Int8"), "integer"),
+    "Int32": (pd.Series([7, 123456, None], dtype="Int32"), "integer"),
+    "Float32": (pd.Series([1.5, None, -0.25, 1234.5], dtype="Float32"), "numeric"),
+    "float32": (pd.Series([1.5, np.nan, 2.25], dtype="float32"), "numeric"),
+    "category int": (pd.Series([3, 1, 3, None], dtype="Int64").astype("category"), "integer"),
+    "category text": (pd.Series(["b", None, "a", "b"], dtype=object).astype("category"), "alphabetic"),
+    "category date": (pd.Series(pd.to_datetime(["2024-01-31", None, "2024-01-31"])).astype("category"), "date"),
+}
+
+
+@pytest.mark.parametrize("settings", SETTINGS[:2], ids=["br", "us"])
+@pytest.mark.parametrize("column", list(COMPACT))
+def test_compact_dtypes_match_scalar_rules(column, settings):
+    s, col_type = COMPACT[column]
+    idef = _idef(**settings)
+    assert Exporter()._fmt_series(s, col_type, idef).tolist() == _reference(None, s, col_type, idef).tolist()
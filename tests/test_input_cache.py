@@ -0,0 +1,69 @@
+"""InputCache: acerto por projeção, invalidação quando o CSV ou a definição mudam e memória dos hashes."""
+import dataclasses
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from core import fingerprint
+from core.input_cache import InputCache
+from models.input_definition import InputDefinition
+
+ROOT = Path(__file__).resolve().parents[1]
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def idef():
+    return InputDefinition.from_json_file(ROOT / "config" / "inputs" / "serial_number_c4.json")
+
+
+def _csv(path: Path, text: str, mtime_ns: int) -> Path:
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def _frame(idef) -> pd.DataFrame:
+    return pd.DataFrame({c.name: ["x", "y"] for c in idef.columns})
+
+
+def test_hit_needs_all_requested_columns(tmp_path, idef):
+    cache = InputCache(tmp_path / "cache")
+    key = cache.key([_csv(tmp_path / "a.csv", "1;2\n", 10**18)], idef)
+    names = [c.name for c in idef.columns]
+    cache.put(idef, key, _frame(idef)[names[:2]])
+
+    assert cache.get(idef, key, names[:1]).columns.tolist() == names[:1]
+    assert cache.get(idef, key, names[:3]) is None
+
+
+def test_content_and_definition_change_the_key(tmp_path, idef):
+    cache = InputCache(tmp_path / "cache")
+    csv = _csv(tmp_path / "a.csv", "1;2\n", 10**18)
+    key = cache.key([csv], idef)
+    cache.put(idef, key, _frame(idef))
+
+    # mesmo tamanho, outro conteúdo: a data de modificação muda e o arquivo é relido
+    changed = cache.key([_csv(csv, "3;4\n", 10**18 + 1)], idef)
+    assert changed != key and cache.get(idef, changed) is None
+    other_def = dataclasses.replace(idef, delimiter=",")
+    assert cache.key([csv], other_def) != changed
+
+    # gravar a nova versão descarta a antiga
+    cache.put(idef, changed, _frame(idef))
+    assert cache.get(idef, key) is None and cache.get(idef, changed) is not None
+    assert cache.invalidate(idef.id) == 1 and cache.get(idef, changed) is None
+
+
+def test_unchanged_file_is_not_rehashed(tmp_path, idef, monkeypatch):
+    csv = _csv(tmp_path / "a.csv", "1;2\n", 10**18)
+    key = InputCache(tmp_path / "cache").key([csv], idef)
+
+    # outro processo (nova instância) reaproveita o hash gravado em DIGESTS
+    def rehash(path):
+        raise AssertionError(f"{path} hashed again")
+    monkeypatch.setattr(fingerprint, "file_digest", rehash)
+    assert InputCache(tmp_path / "cache").key([csv], idef) == key
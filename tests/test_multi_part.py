@@ -0,0 +1,56 @@
+"""Inputs em várias partes: coluna de origem e unicidade checada entre as partes."""
+import dataclasses
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from bench.generator import SyntheticGenerator
+from core.csv_loader import CSVLoader
+from core.validation import ValidationError
+from models.input_definition import InputDefinition
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def parts(tmp_path):
+    """O mesmo input sintético dividido em três arquivos de 10 linhas (cada um com cabeçalho)."""
+    base = InputDefinition.from_json_file(ROOT / "config" / "inputs" / "serial_number_c4.json")
+    single = SyntheticGenerator(base, seed=13).write(tmp_path / "single.csv", rows=30)
+    header, *rows = single.read_text(encoding=base.encoding).splitlines()
+    (tmp_path / "parts").mkdir()
+    for i in range(3):
+        (tmp_path / "parts" / f"c4_{i}.csv").write_text("\n".join([header] + rows[i * 10:(i + 1) * 10]) + "\n",
+                                                        encoding=base.encoding)
+    return tmp_path, dataclasses.replace(base, file_name="parts/c4_*.csv"), rows
+
+
+def _load(loader: CSVLoader, idef: InputDefinition, chunk_rows):
+    if not chunk_rows:
+        return loader.load_csv(idef)
+    return [chunk for chunk in loader.iter_csv(dataclasses.replace(idef, chunk_rows=chunk_rows), chunk_rows)]
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 4], ids=["frame", "streaming"])
+def test_parts_carry_their_source_file(parts, chunk_rows):
+    data_dir, idef, _ = parts
+    loaded = _load(CSVLoader(data_dir), idef, chunk_rows)
+    files = (pd.concat(loaded) if chunk_rows else loaded)[idef.source_file_column]
+    assert files.astype(str).value_counts().sort_index().to_dict() == {
+        "parts/c4_0.csv": 10, "parts/c4_1.csv": 10, "parts/c4_2.csv": 10}
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 4], ids=["frame", "streaming"])
+def test_duplicate_key_across_parts(parts, chunk_rows):
+    data_dir, idef, rows = parts
+    # a linha 3 da primeira parte (2ª de dados) repetida no fim da última parte (linha 12)
+    last = data_dir / "parts" / "c4_2.csv"
+    last.write_text(last.read_text(encoding=idef.encoding) + rows[1] + "\n", encoding=idef.encoding)
+
+    with pytest.raises(ValidationError) as exc:
+        _load(CSVLoader(data_dir), idef, chunk_rows)
+    [violation] = exc.value.report.violations
+    assert (violation.column, violation.rule, violation.count) == (idef.unique_key(), "unique", 2)
+    assert violation.duplicates == [{"value": rows[1].split(idef.delimiter)[1], "count": 2,
+                                     "lines": ["parts/c4_0.csv:3", "parts/c4_2.csv:12"]}]
@@ -0,0 +1,89 @@
+"""Funções @pure: uma chamada por combinação distinta, com o mesmo resultado da chamada por linha."""
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.compute import pure
+from core.dataset_builder import DatasetBuilder
+from core.file_manager import FileManager
+from models.output_definition import OutputColumn, OutputDefinition
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def toy(monkeypatch):
+    """Processor com uma função @pure que conta as próprias chamadas."""
+    proc = types.ModuleType("toy_pure")
+    proc.calls = []
+
+    @pure("A", "B", "MISSING")
+    def compute_ab(row):
+        proc.calls.append((row["A"], row["B"]))
+        return f"{row['A']}-{row['B']}-{row.get('MISSING')}"
+
+    proc.compute_ab = compute_ab
+    monkeypatch.setitem(sys.modules, "toy_pure", proc)
+    odef = OutputDefinition(id="toy", input_id="toy", output_file_name="toy.csv", processor_module="toy_pure",
+                            columns=[OutputColumn(name="AB", compute="compute_ab")])
+    return proc, odef
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({"A": ["x", "y", "x", None, "x", None],
+                         "B": pd.array([1, 1, 1, 2, 2, 2], dtype="Int64")}, index=[5, 4, 3, 2, 1, 0])
+
+
+def test_one_call_per_distinct_combination(toy):
+    proc, odef = toy
+    builder = DatasetBuilder(odef)
+    res = builder.compute_column(_frame(), "compute_ab")
+
+    assert res.index.tolist() == [5, 4, 3, 2, 1, 0]
+    # o nulo é uma combinação como outra qualquer; a coluna ausente fica fora de `row`
+    assert res.tolist() == ["x-1-None", "y-1-None", "x-1-None", "nan-2-None", "x-2-None", "nan-2-None"]
+    assert len(proc.calls) == 4
+    stats = builder.memo_stats()["compute_ab"]
+    assert stats["rows"] == 6 and stats["calls"] == 4
+
+
+def test_memo_is_reused_across_chunks(toy):
+    proc, odef = toy
+    builder = DatasetBuilder(odef)
+    df = _frame()
+    builder.compute_column(df.iloc[:3], "compute_ab")
+    builder.compute_column(df.iloc[3:], "compute_ab")
+    # a segunda parte só traz ("x", 2) e (None, 2) de novo
+    assert len(proc.calls) == 4
+    assert builder.memo_stats()["compute_ab"]["cache_hits"] == 0
+    builder.compute_column(df, "compute_ab")
+    assert len(proc.calls) == 4 and builder.memo_stats()["compute_ab"]["cache_hits"] == 4
+
+
+def test_memo_size_bounds_the_cache(toy):
+    proc, odef = toy
+    builder = DatasetBuilder(odef, memo_size=1)
+    df = _frame()
+    builder.compute_column(df, "compute_ab")
+    builder.compute_column(df, "compute_ab")
+    # só a última combinação fica guardada e cada nova a descarta: tudo é recalculado
+    assert len(proc.calls) == 4 + 4
+    assert builder.memo_stats()["compute_ab"]["cache_hits"] == 0
+
+
+def test_processor_pure_functions_match_row_calls():
+    _, outputs = FileManager(config_dir=ROOT / "config").load_all()
+    odef = next(o for o in outputs if o.id == "serial_number_c4_report_main")
+    builder = DatasetBuilder(odef)
+    rng = np.random.default_rng(1)
+    descriptions = ["Certificado A1 Mensal", "e-CPF A3 3 anos", "Cartão  cnpj a3", None, "Token", "ÇÃO brinde"]
+    df = pd.DataFrame({"DESCRICAO_DO_PRODUTO": rng.choice(np.array(descriptions, dtype=object), 500)})
+    for name in ("compute_produto", "compute_brinde"):
+        fn = getattr(builder.proc, name)
+        assert getattr(fn, "pure", False)
+        expected = [fn(row) for _, row in df.iterrows()]
+        assert builder.compute_column(df, name).tolist() == expected, name
@@ -0,0 +1,66 @@
+"""Scheduler: os outputs de um mesmo input viram jobs paralelos que leem o input do cache."""
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from bench.generator import SyntheticGenerator
+from core.file_manager import FileManager
+from core.pipeline import RunPlanner
+from core.scheduler import RunSettings, Scheduler
+
+ROOT = Path(__file__).resolve().parents[1]
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Config do repositório com um segundo output (colunas e arquivo próprios) para o mesmo input."""
+    config = tmp_path / "config"
+    shutil.copytree(ROOT / "config", config, ignore=shutil.ignore_patterns("__pycache__"))
+    main = json.loads((config / "outputs" / "serial_number_c4_report_main.json").read_text(encoding="utf-8"))
+    second = dict(main, id="second", output_file_name="second.csv", incremental=False,
+                  columns=[c for c in main["columns"] if c["name"] in ("NUMERO_DO_SERIAL", "MENSAL")])
+    (config / "outputs" / "second.json").write_text(json.dumps(second), encoding="utf-8")
+    manifest = json.loads((config / "manifest.json").read_text(encoding="utf-8"))
+    manifest["outputs"] = [{"description_file": "outputs/serial_number_c4_report_main.json", "active": True},
+                           {"description_file": "outputs/second.json", "active": True}]
+    (config / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    inputs_map, outputs = FileManager(config_dir=config).load_all()
+    plans = RunPlanner().plan(inputs_map, outputs)
+    idef = plans[0].input_def
+    SyntheticGenerator(idef, seed=11).write(tmp_path / "incoming" / idef.file_name, rows=2_000)
+    return tmp_path, plans
+
+
+def _settings(root: Path, out: str, cache: bool) -> RunSettings:
+    return RunSettings(config_dir=root / "config", data_in=root / "incoming", data_out=root / out,
+                       as_of="2025-01-01", cache_dir=root / "cache" if cache else None)
+
+
+def test_outputs_of_one_input_split_after_cache_job(project):
+    root, plans = project
+    jobs = Scheduler(_settings(root, "out", cache=True), workers=2).jobs(plans)
+    assert [(j.part, j.cache_only, j.after) for j in jobs] == [
+        ("cache", True, None),
+        ("serial_number_c4_report_main", False, "serial_number_c4:cache"),
+        ("second", False, "serial_number_c4:cache")]
+    # sem cache cada job leria e validaria o CSV de novo: o input fica num job só
+    assert len(Scheduler(_settings(root, "out", cache=False), workers=2).jobs(plans)) == 1
+    assert len(Scheduler(_settings(root, "out", cache=True), workers=1).jobs(plans)) == 1
+
+
+def test_split_run_matches_single_job(project):
+    root, plans = project
+    single = Scheduler(_settings(root, "single", cache=False), workers=1)
+    split = Scheduler(_settings(root, "split", cache=True), workers=2)
+    [expected] = single.run(single.jobs(plans))
+    [got] = split.run(split.jobs(plans))
+
+    assert got.error is None
+    assert sorted(res.output_id for res in got.outputs) == ["second", "serial_number_c4_report_main"]
+    for res in expected.outputs:
+        assert (root / "split" / res.path.name).read_bytes() == res.path.read_bytes()
@@ -0,0 +1,31 @@
+"""Hash das chaves do UniqueIndex: o mesmo valor casa entre dtypes compactos e não compactos."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.unique_index import UniqueIndex, hash_keys
+
+@pytest.mark.parametrize("dtype, wide", [("Int8", "Int64"), ("Int16", "Int64"), ("Int32", "Int64"),
+                                         ("Float32", "Float64")])
+def test_nullable_widths_hash_alike(dtype, wide):
+    values = [-1, 5, -100, None]
+    assert hash_keys(pd.Series(values, dtype=dtype)).tolist() == hash_keys(pd.Series(values, dtype=wide)).tolist()
+
+
+@pytest.mark.parametrize("dtype, wide", [(np.int8, np.int64), (np.int16, np.int64), (np.int32, np.int64),
+                                         (np.float32, np.float64)])
+def test_numpy_widths_hash_alike(dtype, wide):
+    values = [-1, 5, -100]
+    assert hash_keys(pd.Series(values, dtype=dtype)).tolist() == hash_keys(pd.Series(values, dtype=wide)).tolist()
+
+
+def test_integer_categories_hash_like_values():
+    s = pd.Series([-1, 5, -1], dtype=np.int8).astype("category")
+    assert hash_keys(s).tolist() == hash_keys(pd.Series([-1, 5, -1], dtype=np.int64)).tolist()
+
+
+def test_compact_keys_found_in_wide_index():
+    with UniqueIndex() as index:
+        index.add(pd.Series([-1, -2, 7], dtype="Int8"))
+        found = index.contains(pd.Series([-2, 7, -1, 3], dtype=np.int64))
+    assert found.tolist() == [True, True, True, False]
@@ -0,0 +1,86 @@
+"""
+Validação com o motor arrow (kernels do pyarrow.compute) contra o motor
+pandas: as mesmas violações de nulidade e da regra `alphabetic`.
+"""
+import dataclasses
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from core.validation import Validator, _readable
+from models.input_definition import InputDefinition
+
+ROOT = Path(__file__).resolve().parents[1]
+
+VALUES = ["Usuário 1", None, "", "Clipp PRO – Renovação", "a\x00b", "emoji 🙂", "R$ 10,00", "tab\there",
+          "nbsp x", "  ", "ZWeb​Standard", "50%", "x y", "Usuário 1", None, "<b>", "ok_1-2"]
+
+
+def _idef() -> InputDefinition:
+    idef = InputDefinition.from_json_file(ROOT / "config" / "inputs" / "serial_number_c4.json")
+    columns = [dataclasses.replace(c, nullable=False, allow_duplicates=True) if c.type == "alphabetic" else c
+               for c in idef.columns]
+    return dataclasses.replace(idef, columns=columns)
+
+
+def _report(engine: str):
+    idef = _idef()
+    names = [c.name for c in idef.columns if c.type == "alphabetic"][:3]
+    df = pd.DataFrame({name: pd.Series(VALUES, dtype="str") for name in names})
+    return Validator(max_workers=1).validate(df, dataclasses.replace(idef, columns=[
+        c for c in idef.columns if c.name in names]), {}, engine=engine)
+
+
+def test_arrow_kernels_match_pandas():
+    arrow, pandas = _report("arrow"), _report("pandas")
+    assert [v.rule for v in arrow.violations] == ["nullable", "alphabetic"] * 3
+    assert [dataclasses.asdict(v) for v in arrow.violations] == [dataclasses.asdict(v) for v in pandas.violations]
+
+
+def test_readable_pattern_matches_python_rule():
+    """A regex RE2 e a regra do Python concordam em todo caractere que o Python conhece."""
+    import pyarrow.compute as pc
+    from core.validation import _READABLE_PATTERN
+    chars = [chr(c) for c in range(0x110000)
+             if not 0xD800 <= c <= 0xDFFF and unicodedata.category(chr(c)) != "Cn"]
+    got = pc.match_substring_regex(pa.array(chars), _READABLE_PATTERN).to_pylist()
+    assert [c for c, ok in zip(chars, got) if ok != _readable(c)] == []
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 7], ids=["frame", "streaming"])
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_bad_value_in_typed_non_nullable_column(tmp_path, engine, chunk_rows):
+    """Valor que não converte numa coluna tipada e não nula: violação de tipo na linha certa, sem nulidade."""
+    from bench.generator import SyntheticGenerator
+    from core.csv_loader import CSVLoader
+    from core.validation import ValidationError
+
+    base = InputDefinition.from_json_file(ROOT / "config" / "inputs" / "serial_number_c4.json")
+    columns = [dataclasses.replace(c, nullable=False) if c.name == "DATA_VENCIMENTO_SERIAL" else c
+               for c in base.columns]
+    idef = dataclasses.replace(base, columns=columns, chunk_rows=chunk_rows)
+    path = SyntheticGenerator(idef, seed=3).write(tmp_path / idef.file_name, rows=20)
+    names = [c.name for c in idef.columns]
+    lines = path.read_text(encoding=idef.encoding).splitlines()
+    for line_no, column, value in ((4, "PERIODICIDADE_DO_PRODUTO", "mensal"), (12, "DATA_VENCIMENTO_SERIAL", "31/02")):
+        fields = lines[line_no - 1].split(idef.delimiter)
+        fields[names.index(column)] = value
+        lines[line_no - 1] = idef.delimiter.join(fields)
+    path.write_text("\n".join(lines) + "\n", encoding=idef.encoding)
+
+    loader = CSVLoader(tmp_path, engine=engine)
+    with pytest.raises(ValidationError) as exc:
+        if chunk_rows:
+            for _ in loader.iter_csv(idef, chunk_rows):
+                pass
+        else:
+            loader.load_csv(idef)
+    found = {(v.column, v.rule): v for v in exc.value.report.violations}
+    assert set(found) == {("PERIODICIDADE_DO_PRODUTO", "type"), ("DATA_VENCIMENTO_SERIAL", "type")}
+    assert found["PERIODICIDADE_DO_PRODUTO", "type"].sample_lines == [4]
+    assert found["PERIODICIDADE_DO_PRODUTO", "type"].sample_values == ["mensal"]
+    assert found["DATA_VENCIMENTO_SERIAL", "type"].sample_lines == [12]
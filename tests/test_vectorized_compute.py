@@ -0,0 +1,80 @@
+"""Funções compute vetorizadas (`compute_x_vec`): mesmo resultado da versão linha a linha."""
+import dataclasses
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.generator import SyntheticGenerator
+from core.context import RunContext
+from core.csv_loader import CSVLoader
+from core.dataset_builder import VECTORIZED_SUFFIX, DatasetBuilder
+from core.file_manager import FileManager
+from models.output_definition import OutputColumn, OutputDefinition
+
+ROOT = Path(__file__).resolve().parents[1]
+PROCESSOR = "processors.serial_number_c4_report_main"
+
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory):
+    """Output principal e o input tipado pelo CSVLoader (as tabelas de consulta ficam registradas)."""
+    inputs_map, outputs = FileManager(config_dir=ROOT / "config").load_all()
+    odef = next(o for o in outputs if o.id == "serial_number_c4_report_main")
+    idef = inputs_map[odef.input_id]
+    data_in = tmp_path_factory.mktemp("incoming")
+    SyntheticGenerator(idef, seed=5).write(data_in / idef.file_name, rows=3_000)
+    return odef, CSVLoader(data_dir=data_in).load_csv(idef)
+
+
+def _row_module(monkeypatch, name: str) -> str:
+    """Cópia do processor sem as versões vetorizadas: o builder cai nas funções linha a linha."""
+    proc = sys.modules[PROCESSOR]
+    rows = types.ModuleType(name)
+    rows.__dict__.update({k: v for k, v in vars(proc).items() if not k.endswith(VECTORIZED_SUFFIX)})
+    monkeypatch.setitem(sys.modules, name, rows)
+    return name
+
+
+def _values(s: pd.Series) -> list:
+    return [None if pd.isna(v) else v for v in s.astype(object)]
+
+
+def test_vectorized_columns_match_row_functions(report, monkeypatch):
+    odef, df = report
+    context = RunContext("2025-01-01")
+    vec = DatasetBuilder(odef, context=context).build(df)
+    row_def = dataclasses.replace(odef, processor_module=_row_module(monkeypatch, "rows_proc"))
+    row = DatasetBuilder(row_def, context=context).build(df)
+
+    assert list(vec.columns) == list(row.columns)
+    for name in vec.columns:
+        assert _values(vec[name]) == _values(row[name]), name
+
+
+@pytest.fixture
+def toy(monkeypatch):
+    proc = types.ModuleType("toy_proc")
+    proc.compute_x = lambda row: row["A"] * 2
+    proc.compute_x_vec = lambda df: df["A"].to_numpy() * 2
+    monkeypatch.setitem(sys.modules, "toy_proc", proc)
+    odef = OutputDefinition(id="toy", input_id="toy", output_file_name="toy.csv", processor_module="toy_proc",
+                            columns=[OutputColumn(name="X", compute="compute_x")])
+    return proc, odef
+
+
+def test_vectorized_result_keeps_the_frame_index(toy):
+    _, odef = toy
+    df = pd.DataFrame({"A": [1, 2, 3]}, index=[10, 20, 30])
+    res = DatasetBuilder(odef).compute_column(df, "compute_x")
+    assert res.index.tolist() == [10, 20, 30] and res.tolist() == [2, 4, 6]
+
+
+def test_vectorized_result_with_wrong_length_fails(toy):
+    proc, odef = toy
+    proc.compute_x_vec = lambda df: np.zeros(len(df) - 1)
+    with pytest.raises(ValueError, match="returned 2 values for 3 rows"):
+        DatasetBuilder(odef).compute_column(pd.DataFrame({"A": [1, 2, 3]}), "compute_x")